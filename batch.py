@@ -0,0 +1,93 @@
+import argparse
+import warnings
+
+from wgtda.batch import load_manifest, run_batch
+from wgtda.interactions import OUTPUT_FORMATS
+
+warnings.simplefilter(action="ignore", category=FutureWarning)
+
+
+def parse_args():
+    """
+    Function to parse the arguments for a WGTDA batch run
+    """
+    parser = argparse.ArgumentParser(
+        description="Run a manifest of WGTDA jobs (cohort x gene list x method x dimensions)"
+    )
+
+    parser.add_argument(
+        "--manifest",
+        "-m",
+        type=str,
+        required=True,
+        help="The path to a JSON manifest, see wgtda.batch.load_manifest",
+    )
+
+    parser.add_argument(
+        "--outputdir",
+        "-o",
+        type=str,
+        default="./output/batch/",
+        help="The directory for the per-job outputs and summary.csv",
+    )
+
+    parser.add_argument(
+        "--n_jobs",
+        "-j",
+        type=int,
+        default=1,
+        help="Number of worker processes (-1 uses every core)",
+    )
+
+    parser.add_argument(
+        "--memory_budget_gb",
+        type=float,
+        default=16.0,
+        help="Memory budget of the concurrently running tasks in GB",
+    )
+
+    parser.add_argument(
+        "--output_format",
+        "--output-format",
+        type=str,
+        default="csv",
+        choices=list(OUTPUT_FORMATS),
+        help="Format of the per-job interactions output",
+    )
+
+    parser.add_argument(
+        "--cache_dir",
+        "--cache-dir",
+        type=str,
+        default=None,
+        help="Directory of the on-disk correlation matrix cache (disabled if not given)",
+    )
+
+    return parser.parse_args()
+
+
+def main():
+    """
+    Function to execute a WGTDA batch run
+    """
+    args = parse_args()
+
+    jobs = load_manifest(args.manifest)
+    print("Running {} jobs".format(len(jobs)))
+
+    summary = run_batch(
+        jobs,
+        args.outputdir,
+        n_jobs=args.n_jobs,
+        memory_budget_gb=args.memory_budget_gb,
+        output_format=args.output_format,
+        cache_dir=args.cache_dir,
+    )
+
+    # An empty manifest gives an empty summary without a status column
+    failed = summary[summary["status"] != "ok"] if len(summary) else summary
+    print("Finished {} jobs, {} failed".format(len(summary), len(failed)))
+
+
+if __name__ == "__main__":
+    main()
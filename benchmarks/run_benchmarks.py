@@ -0,0 +1,252 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+import numpy as np
+from stages import COMPLEX_STAGES, STAGES, measure
+from wgtda.correlation.parallel import pool_context
+
+# Parameters that identify one measurement; results with equal keys are compared
+KEY_PARAMS = ["stage", "genes", "samples", "dimensions"]
+
+
+def parse_args():
+    """
+    Function to parse the arguments for the WGTDA benchmarks
+    """
+    parser = argparse.ArgumentParser(
+        description="Time and memory-profile the WGTDA stages on synthetic expression data"
+    )
+
+    parser.add_argument(
+        "--genes", "-g", type=int, nargs="+", default=[20, 40, 80],
+        help="Gene counts to sweep",
+    )
+    parser.add_argument(
+        "--samples", "-s", type=int, nargs="+", default=[100, 200, 400],
+        help="Sample counts to sweep (the complex stages use the smallest one)",
+    )
+    parser.add_argument(
+        "--dimensions", "-d", type=int, nargs="+", default=[1, 2],
+        help="Complex dimensions to sweep for the complex stages",
+    )
+    parser.add_argument(
+        "--stages", type=str, nargs="+", default=list(STAGES), choices=list(STAGES),
+        help="Stages to benchmark",
+    )
+    parser.add_argument(
+        "--max_radius", "-r", type=float, default=None,
+        help="Radius bound of the Vietoris-Rips complex (unbounded by default)",
+    )
+    parser.add_argument(
+        "--repeats", type=int, default=3, help="Timed runs per measurement",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="Seed of the synthetic data",
+    )
+    parser.add_argument(
+        "--output", "-o", type=str, default="output/benchmarks.json",
+        help="Path of the JSON results",
+    )
+    parser.add_argument(
+        "--baseline", "-b", type=str, default=None,
+        help="JSON results of an earlier run to compare against",
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=0.25,
+        help="Relative slowdown against the baseline reported as a regression",
+    )
+    parser.add_argument(
+        "--extrapolate_genes", type=int, default=None,
+        help="Also print each stage's time extrapolated to this many genes",
+    )
+
+    return parser.parse_args()
+
+
+def sweep(args) -> List[dict]:
+    """
+    The params of every measurement: genes x samples for the correlation stages and
+    genes x dimensions (at the smallest sample count) for the complex stages.
+    """
+    grid = []
+    for stage in args.stages:
+        if stage in COMPLEX_STAGES:
+            sizes = itertools.product(args.genes, [min(args.samples)], args.dimensions)
+        else:
+            sizes = itertools.product(args.genes, args.samples, [None])
+        for genes, samples, dimensions in sizes:
+            params = {"genes": genes, "samples": samples, "dimensions": dimensions, "seed": args.seed}
+            if args.max_radius is not None:
+                params["max_radius"] = args.max_radius
+            grid.append((stage, params))
+    return grid
+
+
+def run_in_fresh_process(stage: str, params: dict, repeats: int) -> dict:
+    """
+    Run one measurement in its own process so that its peak RSS is not inherited from earlier ones.
+    """
+    with ProcessPoolExecutor(max_workers=1, mp_context=pool_context()) as executor:
+        return executor.submit(measure, stage, params, repeats).result()
+
+
+def fit_scaling(results: List[dict]) -> List[dict]:
+    """
+    Fit time = coefficient * size^exponent along every axis (genes, samples,
+    dimensions) with the other parameters held fixed.
+
+    Parameters:
+    - results : List[dict]
+        The measurements.
+
+    Returns:
+    - List[dict]
+        One fit per stage, axis and combination of the fixed parameters, with
+        "exponent" and "coefficient" of the least-squares line in log-log space.
+    """
+    fits = []
+    for axis in ["genes", "samples", "dimensions"]:
+        fixed = [param for param in KEY_PARAMS if param not in ("stage", axis)]
+        groups: Dict[tuple, list] = {}
+        for result in results:
+            if result.get(axis) is None:
+                continue
+            key = (result["stage"],) + tuple(result.get(param) for param in fixed)
+            groups.setdefault(key, []).append(result)
+        for key, group in groups.items():
+            sizes = np.array([result[axis] for result in group], dtype=float)
+            seconds = np.array([result["min_seconds"] for result in group])
+            if len(np.unique(sizes)) < 2 or np.any(seconds <= 0):
+                continue
+            exponent, intercept = np.polyfit(np.log(sizes), np.log(seconds), 1)
+            fits.append({
+                "stage": key[0],
+                "axis": axis,
+                **dict(zip(fixed, key[1:], strict=True)),
+                "exponent": float(exponent),
+                "coefficient": float(np.exp(intercept)),
+            })
+    return fits
+
+
+def compare(results: List[dict], baseline: List[dict], tolerance: float) -> List[dict]:
+    """
+    Compare the minimum times against a baseline run.
+
+    Parameters:
+    - results : List[dict]
+        The measurements of this run.
+    - baseline : List[dict]
+        The measurements of the baseline run.
+    - tolerance : float
+        Relative slowdown reported as a regression.
+
+    Returns:
+    - List[dict]
+        One row per measurement present in both runs, with the time "ratio"
+        (this run / baseline) and whether it is a "regression".
+    """
+    previous = {tuple(result.get(param) for param in KEY_PARAMS): result for result in baseline}
+    rows = []
+    for result in results:
+        key = tuple(result.get(param) for param in KEY_PARAMS)
+        if key not in previous:
+            continue
+        ratio = result["min_seconds"] / max(previous[key]["min_seconds"], 1e-12)
+        rows.append({
+            **dict(zip(KEY_PARAMS, key, strict=True)),
+            "baseline_seconds": previous[key]["min_seconds"],
+            "seconds": result["min_seconds"],
+            "ratio": ratio,
+            "regression": ratio > 1 + tolerance,
+        })
+    return rows
+
+
+def environment() -> dict:
+    """
+    The machine and versions the benchmarks ran on.
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "commit": commit,
+    }
+
+
+def _describe(row: dict) -> str:
+    return "{:<24} genes={:<6} samples={:<6} dimensions={}".format(
+        row["stage"], row["genes"], row["samples"], row["dimensions"]
+    )
+
+
+def main():
+    """
+    Function to run the WGTDA benchmarks
+    """
+    args = parse_args()
+
+    results = []
+    for stage, params in sweep(args):
+        result = run_in_fresh_process(stage, params, args.repeats)
+        results.append(result)
+        print("{}  {:9.4f} s  {:9.1f} MB traced  {:9.1f} MB peak RSS".format(
+            _describe(result), result["min_seconds"], result["traced_peak_mb"], result["peak_rss_mb"]
+        ))
+
+    fits = fit_scaling(results)
+    print("\nScaling exponents (time ~ size^exponent)")
+    for fit in fits:
+        print("{:<24} {:<10} {:6.2f}  ({})".format(
+            fit["stage"], fit["axis"], fit["exponent"],
+            ", ".join("{}={}".format(param, fit[param]) for param in KEY_PARAMS
+                      if param in fit and param != "stage"),
+        ))
+        if args.extrapolate_genes is not None and fit["axis"] == "genes":
+            print("{:<24} {:.1f} s at {} genes".format(
+                "", fit["coefficient"] * args.extrapolate_genes ** fit["exponent"],
+                args.extrapolate_genes,
+            ))
+
+    report = {"environment": environment(), "arguments": vars(args), "results": results, "scaling": fits}
+
+    regressions = []
+    if args.baseline is not None:
+        with open(args.baseline, "r") as file:
+            baseline = json.load(file)["results"]
+        comparison = compare(results, baseline, args.tolerance)
+        report["comparison"] = comparison
+        print("\nComparison with " + args.baseline)
+        for row in comparison:
+            print("{}  {:6.2f}x{}".format(
+                _describe(row), row["ratio"], "  REGRESSION" if row["regression"] else ""
+            ))
+        regressions = [row for row in comparison if row["regression"]]
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+    print("\nSaved to " + args.output)
+
+    if regressions:
+        print("{} regression(s) beyond {:.0%}".format(len(regressions), args.tolerance))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict
+
+import numpy as np
+from synthetic import generate_expression
+
+from wgtda import (construct_vr_complex_rna_matrix,
+                   convert_gene_exp_to_array_and_dict, flatten_gene_list,
+                   interactions_dataframe)
+from wgtda.correlation import (compute_distance_correlation_matrix,
+                               compute_wto_matrix)
+from wgtda.filters import extract_top_n_persistent_holes
+from wgtda.h0 import h0_persistence
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Stages whose cost depends on the dimension of the complex
+COMPLEX_STAGES = ["vr_complex", "interactions_dataframe", "top_n_filter", "network_graph"]
+
+
+def _expression(params: dict):
+    df, _ = generate_expression(
+        num_samples=params["samples"], num_genes=params["genes"], seed=params["seed"]
+    )
+    return convert_gene_exp_to_array_and_dict(df)
+
+
+def _complex(params: dict):
+    gene_exp_arr, gene_dict = _expression(params)
+    dist_matrix = compute_distance_correlation_matrix(gene_exp_arr)
+    max_radius = params.get("max_radius")
+    persistence, rips_complex = construct_vr_complex_rna_matrix(
+        dist_matrix, params["dimensions"], max_radius=max_radius
+    )
+    return dist_matrix, gene_dict, persistence, rips_complex
+
+
+def _interactions(params: dict):
+    _, gene_dict, persistence, rips_complex = _complex(params)
+    interactions = interactions_dataframe(persistence, rips_complex, gene_dict)
+    interactions["gene_set"] = interactions["vertices_set"].apply(flatten_gene_list)
+    return interactions
+
+
+def _setup_distance_correlation(params: dict) -> Callable:
+    gene_exp_arr, _ = _expression(params)
+    return lambda: compute_distance_correlation_matrix(gene_exp_arr)
+
+
+def _setup_wto(params: dict) -> Callable:
+    gene_exp_arr, _ = _expression(params)
+    return lambda: compute_wto_matrix(gene_exp_arr)
+
+
+def _setup_vr_complex(params: dict) -> Callable:
+    dist_matrix, _, _, _ = _complex(params)
+    max_radius = params.get("max_radius")
+    return lambda: construct_vr_complex_rna_matrix(
+        dist_matrix, params["dimensions"], max_radius=max_radius
+    )
+
+
+def _setup_h0_mst(params: dict) -> Callable:
+    gene_exp_arr, _ = _expression(params)
+    dist_matrix = compute_distance_correlation_matrix(gene_exp_arr)
+    return lambda: h0_persistence(dist_matrix, params.get("max_radius"))
+
+
+def _setup_interactions_dataframe(params: dict) -> Callable:
+    _, gene_dict, persistence, rips_complex = _complex(params)
+    return lambda: interactions_dataframe(persistence, rips_complex, gene_dict)
+
+
+def _setup_top_n_filter(params: dict) -> Callable:
+    interactions = _interactions(params)
+    return lambda: extract_top_n_persistent_holes(interactions, 10)
+
+
+def _setup_network_graph(params: dict) -> Callable:
+    import matplotlib
+
+    matplotlib.use("Agg")
+    from wgtda.networks import clear_layout_cache, create_network_graphs
+
+    interactions = extract_top_n_persistent_holes(_interactions(params), 10)
+    output_dir = tempfile.mkdtemp(prefix="wgtda-bench-")
+
+    def run():
+        # Time the layout too rather than the layout cache
+        clear_layout_cache()
+        return create_network_graphs(interactions, output_dir)
+
+    return run
+
+
+# Stage name -> setup(params) returning the zero-argument callable that is timed
+STAGES: Dict[str, Callable[[dict], Callable]] = {
+    "distance_correlation": _setup_distance_correlation,
+    "wto": _setup_wto,
+    "vr_complex": _setup_vr_complex,
+    "h0_mst": _setup_h0_mst,
+    "interactions_dataframe": _setup_interactions_dataframe,
+    "top_n_filter": _setup_top_n_filter,
+    "network_graph": _setup_network_graph,
+}
+
+
+def _peak_rss_mb() -> float:
+    if resource is None:
+        return float("nan")
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024**2 if os.uname().sysname == "Darwin" else peak / 1024
+
+
+def measure(stage: str, params: dict, repeats: int = 3) -> dict:
+    """
+    Time and memory-profile one stage at one problem size.
+
+    Meant to run in a fresh process: inputs are built (untimed) by the stage's
+    setup, then the stage is timed `repeats` times, and run once more under
+    tracemalloc for the peak of the memory it allocates through Python and NumPy.
+    The process' peak RSS is reported as well, which also covers native
+    allocations (e.g. matilda's complex) but includes the setup.
+
+    Parameters:
+    - stage : str
+        A key of STAGES.
+    - params : dict
+        The problem size: genes, samples, dimensions and seed (and optionally max_radius).
+    - repeats : int, default = 3
+        Number of timed runs.
+
+    Returns:
+    - dict
+        The params plus the stage name, all timed runs and their minimum and median,
+        traced_peak_mb, setup_peak_rss_mb (peak RSS before the timed runs) and peak_rss_mb.
+    """
+    run = STAGES[stage](params)
+    baseline_rss = _peak_rss_mb()
+
+    seconds = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        seconds.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    run()
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "stage": stage,
+        **params,
+        "seconds": seconds,
+        "min_seconds": float(np.min(seconds)),
+        "median_seconds": float(np.median(seconds)),
+        "traced_peak_mb": traced_peak / 1024**2,
+        "setup_peak_rss_mb": baseline_rss,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
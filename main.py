@@ -2,13 +2,16 @@ import argparse
 import os
 import warnings
 
-from wgtda import (construct_vr_complex_rna_matrix,
-                   convert_gene_exp_to_array_and_dict, filter_genes,
-                   flatten_gene_list, interactions_dataframe,
-                   load_gene_expression_data)
-from wgtda.correlation import (compute_distance_correlation_matrix,
-                               compute_wto_matrix)
-from wgtda.filters import extract_top_n_persistent_holes, remove_infinite_holes
+import numpy as np
+
+from wgtda import (convert_gene_exp_to_array_and_dict, filter_genes,
+                   load_gene_expression_data, read_gene_list)
+from wgtda.correlation import (get_preprocessor, preprocessor_names,
+                               significance_filter)
+from wgtda.interactions import OUTPUT_FORMATS, write_interactions
+from wgtda.pipeline import compute_interactions, compute_relationship_matrix
+from wgtda.profiling import RunReport, record, stage
+from wgtda.stability import feature_stability
 
 warnings.simplefilter(action="ignore", category=FutureWarning)
 
@@ -26,7 +29,22 @@ def parse_args():
         type=str,
         default="data/TCGA/BRCA.pkl",
         help="The path to the data file. Supported file types are CSV (.csv), Excel (.xls, .xlsx, .xlsm, "
-        ".xlsb), Pickle (.pkl, .pickle), and TSV/Text (.tsv, .txt).",
+        ".xlsb), Pickle (.pkl, .pickle), TSV/Text (.tsv, .txt), Parquet (.parquet) and Feather (.feather).",
+    )
+
+    parser.add_argument(
+        "--dtype",
+        type=str,
+        default="float64",
+        choices=["float32", "float64"],
+        help="Floating point type the expression values are loaded as",
+    )
+
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=None,
+        help="Read CSV/TSV files this many rows at a time",
     )
 
     parser.add_argument(
@@ -37,14 +55,25 @@ def parse_args():
         help="The path to a txt file containing selected genes to use in WGTDA.",
     )
 
+    parser.add_argument(
+        "--max_genes",
+        "-mg",
+        type=int,
+        default=50,
+        help="Use only the first n genes of the gene list (0 uses all of them)",
+    )
+
     parser.add_argument(
         "--preprocessing",
         "-pp",
         type=str,
         default="dc",
-        help="The path to select which method to use for "
-        "preprocessing of gene expression data"
-        "('dc' for distance correlation or 'stom' for signed TOMs",
+        choices=preprocessor_names(),
+        help="The method used to turn the gene expression data into gene distances: "
+        + "; ".join(
+            "'{}' {}".format(name, get_preprocessor(name).description)
+            for name in preprocessor_names()
+        ),
     )
 
     parser.add_argument(
@@ -55,6 +84,25 @@ def parse_args():
         help="The path for the output interactions.csv",
     )
 
+    parser.add_argument(
+        "--persistence_dir",
+        "-pd",
+        type=str,
+        default=None,
+        help="Where the unfiltered persistence is saved for `wgtda refilter` "
+        "(default: <outputdir>/persistence)",
+    )
+
+    parser.add_argument(
+        "--output_format",
+        "--output-format",
+        type=str,
+        default="csv",
+        choices=list(OUTPUT_FORMATS),
+        help="Format of the interactions output: 'csv' (list columns as text), "
+        "'parquet' (native list columns) or 'npz' (list columns as offsets plus values)",
+    )
+
     parser.add_argument(
         "--dimensions",
         "-d",
@@ -63,6 +111,142 @@ def parse_args():
         help="specify how many dimensions that user wants to input",
     )
 
+    parser.add_argument(
+        "--max_radius",
+        "-r",
+        type=float,
+        default=None,
+        help="Largest filtration value of the Vietoris-Rips complex (default: no bound)",
+    )
+
+    parser.add_argument(
+        "--radius_quantile",
+        type=float,
+        default=None,
+        help="Pick the radius as this quantile (0-1) of the pairwise distances",
+    )
+
+    parser.add_argument(
+        "--max_simplices",
+        type=int,
+        default=None,
+        help="Pick the largest radius whose estimated number of simplices fits this budget",
+    )
+
+    parser.add_argument(
+        "--h0_engine",
+        type=str,
+        default="matilda",
+        choices=["matilda", "mst"],
+        help="Compute Betti 0 with matilda's reduction (default) or from the minimum spanning tree (mst)",
+    )
+
+    parser.add_argument(
+        "--edge_collapse",
+        "-ec",
+        action="store_true",
+        help="Remove dominated edges before building the complex (same bars, smaller complex)",
+    )
+
+    parser.add_argument(
+        "--by_component",
+        "-bc",
+        action="store_true",
+        help="With a radius bound, compute persistent homology of every connected component in parallel (--n_jobs)",
+    )
+
+    parser.add_argument(
+        "--landmarks",
+        "-l",
+        type=int,
+        default=None,
+        help="Build a lazy witness complex on this many max-min landmark genes instead of a complex on every gene",
+    )
+
+    parser.add_argument(
+        "--two_pass",
+        action="store_true",
+        help="Compute bars first and representative cycles only for the features kept by the filters",
+    )
+
+    parser.add_argument(
+        "--verbose",
+        "-v",
+        action="store_true",
+        help="Report the progress of the persistent homology computation",
+    )
+
+    parser.add_argument(
+        "--n_jobs",
+        "-j",
+        type=int,
+        default=1,
+        help="Number of worker processes for the correlation stage (-1 uses every core)",
+    )
+
+    parser.add_argument(
+        "--cache_dir",
+        "--cache-dir",
+        type=str,
+        default=None,
+        help="Directory of the on-disk correlation matrix cache (disabled if not given)",
+    )
+
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Also write cProfile dumps of the correlation, complex, homology and dataframe stages "
+        "to <outputdir>/profiles",
+    )
+
+    parser.add_argument(
+        "--memmap_dir",
+        type=str,
+        default=None,
+        help="Compute the correlation matrix into a float32 memory-mapped file in this directory "
+        "instead of memory, for genome-scale gene sets",
+    )
+
+    parser.add_argument(
+        "--store_dir",
+        type=str,
+        default=None,
+        help="Keep distance correlations of every gene seen in a store in this directory and "
+        "only compute the genes a panel adds (dc only)",
+    )
+
+    parser.add_argument(
+        "--cache_size_gb",
+        type=float,
+        default=8.0,
+        help="Size limit of the correlation matrix cache in GB, least recently used matrices are evicted",
+    )
+
+    # Significance of the gene pairs
+    parser.add_argument(
+        "--fdr",
+        type=float,
+        default=None,
+        help="Keep only the gene pairs whose distance correlation is significant at this false "
+        "discovery rate (permutation test with Benjamini-Hochberg control, dc only)",
+    )
+
+    parser.add_argument(
+        "--permutations",
+        type=int,
+        default=1000,
+        help="Number of permutations of the significance test",
+    )
+
+    parser.add_argument(
+        "--nonsignificant",
+        type=str,
+        default="max",
+        choices=["max", "drop"],
+        help="Set non-significant pairs to the largest distance ('max') or leave them out of "
+        "the complex ('drop')",
+    )
+
     # Topological Filters
     parser.add_argument(
         "--remove_inf_values",
@@ -77,10 +261,46 @@ def parse_args():
         "-fp",
         type=int,
         default=10,
-        help="Filter top n% of persistent features",
+        help="Filter top n%% of persistent features",
     )
 
-    return parser.parse_args()
+    # Stability of the features
+    parser.add_argument(
+        "--bootstrap_replicates",
+        "-br",
+        type=int,
+        default=0,
+        help="Resample the patients this many times and add a stability column: the fraction of "
+        "resamples in which each feature reappears (0 disables it)",
+    )
+
+    parser.add_argument(
+        "--sample_fraction",
+        type=float,
+        default=None,
+        help="Subsample this fraction of the patients without replacement instead of bootstrapping",
+    )
+
+    parser.add_argument(
+        "--min_jaccard",
+        type=float,
+        default=0.5,
+        help="Jaccard index of the gene sets from which a feature counts as reappearing in a resample",
+    )
+
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Seed of the resampling and of the permutations",
+    )
+
+    args = parser.parse_args()
+    if args.bootstrap_replicates > 0 and args.landmarks is not None:
+        parser.error("--bootstrap_replicates does not support --landmarks")
+    if args.fdr is not None and args.preprocessing != "dc":
+        parser.error("--fdr tests distance correlations and requires --preprocessing dc")
+    return args
 
 
 def main():
@@ -92,47 +312,102 @@ def main():
     remove_inf_values = args.remove_inf_values
     dimensions = args.dimensions
 
-    # Check args
-    preprocessing_funcs = ["dc", "stom"]
-    if args.preprocessing not in preprocessing_funcs:
-        return
-
-    print("Loading Gene Expression Data")
-
-    df = load_gene_expression_data(args.file_path)
-    print("Preselecting Genes from " + args.filter_genes_path)
-    gene_exp_df = filter_genes(df, args.filter_genes_path)
-    gene_exp_arr, gene_dict = convert_gene_exp_to_array_and_dict(gene_exp_df)
+    profile_dir = os.path.join(output, "profiles") if args.profile else None
+    with RunReport(profile_dir=profile_dir) as report:
+        print("Loading Gene Expression Data")
 
-    if args.preprocessing == "dc":
-        print("Computing the distance correlation matrix")
-        dist_matrix = compute_distance_correlation_matrix(gene_exp_arr=gene_exp_arr)
-    elif args.preprocessing == "stom":
-        print("Computing the weighted signed topological overlapping matrix")
-        dist_matrix = compute_wto_matrix(gene_exp_arr=gene_exp_arr)
-    else:
-        raise ValueError("Unsupported or Unknown preprocessing method.")
+        max_genes = args.max_genes if args.max_genes > 0 else None
+        with stage("load"):
+            # Only the preselected genes are read from the data file
+            genes = read_gene_list(args.filter_genes_path, max_genes)
+            df = load_gene_expression_data(
+                args.file_path, genes=genes, dtype=np.dtype(args.dtype), chunksize=args.chunksize
+            )
+        print("Preselecting Genes from " + args.filter_genes_path)
+        with stage("filter"):
+            gene_exp_df = filter_genes(df, args.filter_genes_path, max_genes)
+            gene_exp_arr, gene_dict = convert_gene_exp_to_array_and_dict(gene_exp_df)
+        record(
+            file_path=args.file_path,
+            preprocessing=args.preprocessing,
+            dimensions=dimensions,
+            num_samples=gene_exp_arr.shape[0],
+            num_genes=gene_exp_arr.shape[1],
+        )
 
-    print("Constructing the Vietoris Rips Complex")
-    persistence, rips_complex = construct_vr_complex_rna_matrix(dist_matrix, dimensions)
-    interactions = interactions_dataframe(persistence, rips_complex, gene_dict)
+        dist_matrix = compute_relationship_matrix(
+            gene_exp_arr,
+            gene_dict,
+            args.preprocessing,
+            cache_dir=args.cache_dir,
+            max_cache_bytes=int(args.cache_size_gb * 1024**3),
+            n_jobs=args.n_jobs,
+            memmap_dir=args.memmap_dir,
+            store_dir=args.store_dir,
+        )
 
-    if remove_inf_values:
-        print("Filtering  Holes")
-        interactions = remove_infinite_holes(interactions)
+        if args.fdr is not None:
+            print("Testing the significance of the gene pairs")
+            with stage("significance"):
+                dist_matrix = significance_filter(
+                    gene_exp_arr,
+                    dist_matrix,
+                    alpha=args.fdr,
+                    num_permutations=args.permutations,
+                    mode=args.nonsignificant,
+                    seed=args.seed,
+                    n_jobs=args.n_jobs,
+                )
 
-    interactions = extract_top_n_persistent_holes(interactions, args.filter_persistence)
+        interactions, max_radius = compute_interactions(
+            dist_matrix,
+            gene_dict,
+            dimensions,
+            max_radius=args.max_radius,
+            radius_quantile=args.radius_quantile,
+            max_simplices=args.max_simplices,
+            remove_inf_values=remove_inf_values,
+            filter_persistence=args.filter_persistence,
+            two_pass=args.two_pass,
+            verbose=args.verbose,
+            h0_engine=args.h0_engine,
+            edge_collapse=args.edge_collapse,
+            landmarks=args.landmarks,
+            by_component=args.by_component,
+            n_jobs=args.n_jobs,
+            persistence_dir=args.persistence_dir or os.path.join(output, "persistence"),
+        )
 
-    if not os.path.exists(output):
-        # If the directory does not exist, create it
-        os.makedirs(output)
+        if args.bootstrap_replicates > 0:
+            print("Scoring the stability of the features over {} resamples".format(
+                args.bootstrap_replicates
+            ))
+            interactions["stability"] = feature_stability(
+                gene_exp_arr,
+                interactions,
+                gene_dict,
+                dimensions,
+                max_radius=max_radius,
+                method=args.preprocessing,
+                num_replicates=args.bootstrap_replicates,
+                sample_fraction=args.sample_fraction,
+                min_jaccard=args.min_jaccard,
+                seed=args.seed,
+                h0_engine=args.h0_engine,
+                edge_collapse=args.edge_collapse,
+                n_jobs=args.n_jobs,
+            )
 
-    # Apply the function to the 'gene_interactions' column
-    interactions["gene_set"] = interactions["vertices_set"].apply(flatten_gene_list)
+        if not os.path.exists(output):
+            # If the directory does not exist, create it
+            os.makedirs(output)
 
-    interactions.to_csv(output + "interactions.csv", index=True)
+        with stage("write"):
+            path = write_interactions(interactions, output, args.output_format)
 
-    print("Saved to " + output + "interactions.csv")
+    print("Saved to " + path)
+    report_path = report.write(os.path.join(output, "run_report.json"))
+    print("Run report saved to " + report_path)
 
 
 if __name__ == "__main__":
@@ -11,13 +11,13 @@ setup(
     author_email=["n.nyase@gmail.com", "lebohang.mashatola@ibm.com"],
     package_dir={"": "src"},
     packages=find_packages(where="src"),
+    entry_points={"console_scripts": ["wgtda=wgtda.cli:main"]},
     long_description=open("README.md").read(),
     long_description_content_type="text/markdown",
     url="https://github.com/IBM/wgtda",
     install_requires=[
         "numpy>=1.21.0",
         "pandas>=1.3.0",
-        "dcor>=0.6",
         "scipy>=1.7.0",
         "matilda @ git+https://github.com/IBM/matilda.git",
     ],
@@ -25,5 +25,5 @@ setup(
         "Programming Language :: Python :: 3",
         "Operating System :: OS Independent",
     ],
-    python_requires=">=3.9",
+    python_requires=">=3.10",
 )
@@ -1,12 +1,36 @@
-from .complex import construct_vr_complex_rna_matrix, interactions_dataframe
-from .preprocessing import (convert_gene_exp_to_array_and_dict, filter_genes,
-                            flatten_gene_list, load_gene_expression_data)
-
-__all__ = [
-    "convert_gene_exp_to_array_and_dict",
-    "construct_vr_complex_rna_matrix",
-    "interactions_dataframe",
-    "load_gene_expression_data",
-    "filter_genes",
-    "flatten_gene_list",
-]
+import importlib
+
+# Public names and the submodule defining each. They are imported on first
+# access, so `import wgtda` (e.g. by the wgtda command's client) does not load
+# numpy, pandas or matilda.
+_LAZY_ATTRIBUTES = {
+    "InteractionTable": "interactions",
+    "build_interaction_table": "interactions",
+    "convert_gene_exp_to_array_and_dict": "preprocessing",
+    "construct_vr_complex_rna_matrix": "complex",
+    "estimate_vr_simplices": "complex",
+    "extract_representatives": "complex",
+    "interactions_dataframe": "complex",
+    "load_gene_expression_data": "preprocessing",
+    "read_gene_list": "preprocessing",
+    "read_interactions": "interactions",
+    "filter_genes": "preprocessing",
+    "flatten_gene_list": "preprocessing",
+    "select_vr_radius": "complex",
+    "write_interactions": "interactions",
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name: str):
+    if name in _LAZY_ATTRIBUTES:
+        value = getattr(importlib.import_module("." + _LAZY_ATTRIBUTES[name], __name__), name)
+        # Later lookups find it directly
+        globals()[name] = value
+        return value
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,348 @@
+import itertools
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, Dict, List, Tuple
+
+import pandas as pd
+from scipy.special import comb
+
+from .correlation.computation import FAST_DCOR_MIN_SAMPLES
+from .correlation.parallel import pool_context, resolve_n_jobs
+from .interactions import write_interactions
+from .pipeline import compute_interactions, compute_relationship_matrix
+from .preprocessing import (convert_gene_exp_to_array_and_dict, filter_genes,
+                            load_gene_expression_data, read_gene_list)
+
+# Options a job inherits from the manifest unless it overrides them
+DEFAULT_JOB_OPTIONS = {
+    "filter_persistence": 10,
+    "remove_inf_values": True,
+    "max_radius": None,
+    "radius_quantile": None,
+    "max_simplices": None,
+    "two_pass": False,
+    "max_genes": 50,
+    "edge_collapse": False,
+    "landmarks": None,
+    "by_component": False,
+    "h0_engine": "matilda",
+}
+
+# Rough size of one simplex in matilda's complex, including its share of the reduction
+_BYTES_PER_SIMPLEX = 200
+
+
+def _stem(path: str) -> str:
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def load_manifest(path: str) -> List[dict]:
+    """
+    Read a batch manifest and expand it into one dict per job.
+
+    The manifest is a JSON file. Either list the jobs explicitly:
+        {"jobs": [{"file_path": ..., "filter_genes_path": ..., "preprocessing": "dc", "dimensions": 2}, ...]}
+    or give the axes of a grid, which is expanded to every combination:
+        {"cohorts": [...], "gene_lists": [...], "methods": ["dc", "stom"], "dimensions": [2, 3]}
+    An optional "options" object sets defaults for every job (filter_persistence,
+    remove_inf_values, max_radius, radius_quantile, max_simplices, two_pass, max_genes,
+    edge_collapse, landmarks, by_component, h0_engine), and each job may override them.
+    Relative paths are resolved against the manifest's directory.
+
+    Parameters:
+    - path : str
+        Path to the manifest.
+
+    Returns:
+    - List[dict]
+        The jobs, each with a unique "name".
+    """
+    with open(path, "r") as file:
+        manifest = json.load(file)
+
+    if "jobs" in manifest:
+        jobs = [dict(job) for job in manifest["jobs"]]
+    else:
+        jobs = [
+            {
+                "file_path": cohort,
+                "filter_genes_path": gene_list,
+                "preprocessing": method,
+                "dimensions": dimensions,
+            }
+            for cohort, gene_list, method, dimensions in itertools.product(
+                manifest["cohorts"],
+                manifest["gene_lists"],
+                manifest.get("methods", ["dc"]),
+                manifest.get("dimensions", [3]),
+            )
+        ]
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    options = {**DEFAULT_JOB_OPTIONS, **manifest.get("options", {})}
+    names = set()
+    for job in jobs:
+        for key, value in options.items():
+            job.setdefault(key, value)
+        job.setdefault("preprocessing", "dc")
+        job.setdefault("dimensions", 3)
+        for key in ["file_path", "filter_genes_path"]:
+            job[key] = os.path.join(base_dir, job[key])
+        job.setdefault(
+            "name",
+            "{}_{}_{}_d{}".format(
+                _stem(job["file_path"]),
+                _stem(job["filter_genes_path"]),
+                job["preprocessing"],
+                job["dimensions"],
+            ),
+        )
+        if job["name"] in names:
+            raise ValueError("Duplicate job name in manifest: " + job["name"])
+        names.add(job["name"])
+
+    return jobs
+
+
+def _load_cohort(
+    file_path: str, gene_lists: List[Tuple[str, int]]
+) -> Dict[Tuple[str, int], tuple]:
+    """
+    Task: load one cohort once, reading only the genes of its jobs' (gene list, max_genes)
+    pairs, and filter it by each of them.
+    """
+    genes = list(dict.fromkeys(
+        gene
+        for gene_list_path, max_genes in gene_lists
+        for gene in read_gene_list(gene_list_path, max_genes)
+    ))
+    df = load_gene_expression_data(file_path, genes=genes)
+    filtered = {}
+    for gene_list_path, max_genes in gene_lists:
+        gene_exp_df = filter_genes(df, gene_list_path, max_genes)
+        filtered[gene_list_path, max_genes] = convert_gene_exp_to_array_and_dict(gene_exp_df)
+    return filtered
+
+
+def _run_matrix_group(
+    gene_exp_arr, gene_dict: dict, method: str, jobs: List[dict], output_dir: str,
+    output_format: str, cache_dir: str,
+) -> List[dict]:
+    """
+    Task: compute one correlation matrix and run every job that shares it.
+    """
+    start = time.perf_counter()
+    dist_matrix = compute_relationship_matrix(
+        gene_exp_arr, gene_dict, method, cache_dir=cache_dir
+    )
+    matrix_seconds = time.perf_counter() - start
+
+    summaries = []
+    for job in jobs:
+        summary = {
+            "name": job["name"],
+            "file_path": job["file_path"],
+            "filter_genes_path": job["filter_genes_path"],
+            "preprocessing": method,
+            "dimensions": job["dimensions"],
+            "num_samples": gene_exp_arr.shape[0],
+            "num_genes": gene_exp_arr.shape[1],
+            "matrix_seconds": matrix_seconds,
+        }
+        start = time.perf_counter()
+        try:
+            interactions, max_radius = compute_interactions(
+                dist_matrix,
+                gene_dict,
+                job["dimensions"],
+                max_radius=job["max_radius"],
+                radius_quantile=job["radius_quantile"],
+                max_simplices=job["max_simplices"],
+                remove_inf_values=job["remove_inf_values"],
+                filter_persistence=job["filter_persistence"],
+                two_pass=job["two_pass"],
+                edge_collapse=job["edge_collapse"],
+                landmarks=job["landmarks"],
+                by_component=job["by_component"],
+                h0_engine=job["h0_engine"],
+            )
+            job_dir = os.path.join(output_dir, job["name"])
+            os.makedirs(job_dir, exist_ok=True)
+            summary["output"] = write_interactions(interactions, job_dir, output_format)
+            summary["max_radius"] = max_radius
+            summary["num_interactions"] = len(interactions)
+            for betti_number, count in interactions["betti_number"].value_counts().items():
+                summary["num_betti_{}".format(betti_number)] = count
+            summary["status"] = "ok"
+        except Exception as error:
+            summary["status"] = "failed"
+            summary["error"] = repr(error)
+        summary["seconds"] = time.perf_counter() - start
+        summaries.append(summary)
+
+    return summaries
+
+
+def estimate_group_bytes(num_samples: int, num_genes: int, jobs: List[dict]) -> int:
+    """
+    Estimate the peak memory of one matrix group: the correlation stage and its largest complex.
+
+    Parameters:
+    - num_samples : int
+        Number of samples of the cohort.
+    - num_genes : int
+        Number of genes after filtering.
+    - jobs : List[dict]
+        The jobs sharing the matrix; their dimensions and max_simplices bound the complex.
+
+    Returns:
+    - int
+        Estimated bytes.
+    """
+    matrices = 6 * 8 * num_genes**2
+    if num_samples <= FAST_DCOR_MIN_SAMPLES:
+        correlation = 8 * num_genes * num_samples * (num_samples + 1) // 2
+    else:
+        correlation = 8 * 8 * num_genes * num_samples
+
+    simplices = 0
+    for job in jobs:
+        count = sum(comb(num_genes, k + 1, exact=True) for k in range(job["dimensions"] + 1))
+        if job["max_simplices"] is not None:
+            count = min(count, job["max_simplices"])
+        simplices = max(simplices, count)
+
+    return int(matrices + correlation + _BYTES_PER_SIMPLEX * simplices)
+
+
+def _run_with_budget(
+    executor: ProcessPoolExecutor,
+    tasks: List[Tuple[int, Callable, tuple]],
+    memory_budget: int,
+    on_result: Callable,
+):
+    """
+    Submit (estimated bytes, function, args) tasks while their estimates fit the budget.
+
+    Larger tasks are submitted first, and at least one task always runs, so a
+    task larger than the budget runs on its own. on_result(args, future) is
+    called as tasks finish.
+    """
+    pending = sorted(tasks, key=lambda task: task[0], reverse=True)
+    running = {}
+    while pending or running:
+        in_use = sum(estimate for estimate, _ in running.values())
+        for task in list(pending):
+            estimate, func, args = task
+            if not running or in_use + estimate <= memory_budget:
+                running[executor.submit(func, *args)] = (estimate, args)
+                in_use += estimate
+                pending.remove(task)
+        done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+        for future in done:
+            _, args = running.pop(future)
+            on_result(args, future)
+
+
+def _failed_summaries(jobs: List[dict], error: Exception) -> List[dict]:
+    return [{"name": job["name"], "status": "failed", "error": repr(error)} for job in jobs]
+
+
+def run_batch(
+    jobs: List[dict],
+    output_dir: str,
+    n_jobs: int = 1,
+    memory_budget_gb: float = 16.0,
+    output_format: str = "csv",
+    cache_dir: str = None,
+) -> pd.DataFrame:
+    """
+    Run many WGTDA jobs in a process pool.
+
+    Each cohort is loaded and filtered once for all of its gene lists, and the
+    jobs sharing a cohort, gene list and method share one correlation matrix.
+    Tasks are scheduled largest first while their estimated memory fits the
+    budget. Every job writes output_dir/<name>/interactions.<format>, and a
+    summary of all jobs is written to output_dir/summary.csv.
+
+    Parameters:
+    - jobs : List[dict]
+        Jobs as returned by load_manifest.
+    - output_dir : str
+        The output directory.
+    - n_jobs : int, default = 1
+        Number of worker processes (-1 uses every core).
+    - memory_budget_gb : float, default = 16.0
+        Memory budget of the concurrently running tasks in GB.
+    - output_format : str, default = "csv"
+        Format of the interactions output, see write_interactions.
+    - cache_dir : str, optional
+        Directory of the on-disk correlation cache.
+
+    Returns:
+    - pd.DataFrame
+        The summary, one row per job.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    memory_budget = int(memory_budget_gb * 1024**3)
+
+    # cohort -> (gene list, max genes, method) -> jobs sharing one correlation matrix
+    cohorts: Dict[str, Dict[Tuple[str, int, str], List[dict]]] = {}
+    for job in jobs:
+        groups = cohorts.setdefault(job["file_path"], {})
+        key = (job["filter_genes_path"], job["max_genes"], job["preprocessing"])
+        groups.setdefault(key, []).append(job)
+
+    summaries = []
+    filtered = {}
+
+    def on_cohort(args, future):
+        file_path = args[0]
+        try:
+            filtered[file_path] = future.result()
+        except Exception as error:
+            for group_jobs in cohorts[file_path].values():
+                summaries.extend(_failed_summaries(group_jobs, error))
+
+    def on_group(args, future):
+        try:
+            summaries.extend(future.result())
+        except Exception as error:
+            summaries.extend(_failed_summaries(args[3], error))
+
+    with ProcessPoolExecutor(
+        max_workers=resolve_n_jobs(n_jobs),
+        mp_context=pool_context(),
+    ) as executor:
+        # Load and filter every cohort once
+        cohort_tasks = [
+            (
+                4 * os.path.getsize(file_path),
+                _load_cohort,
+                (file_path, list(dict.fromkeys(key[:2] for key in groups))),
+            )
+            for file_path, groups in cohorts.items()
+        ]
+        _run_with_budget(executor, cohort_tasks, memory_budget, on_cohort)
+
+        # Compute each shared matrix once and run the jobs that use it
+        group_tasks = []
+        for file_path, groups in cohorts.items():
+            if file_path not in filtered:
+                continue
+            for (gene_list, max_genes, method), group_jobs in groups.items():
+                gene_exp_arr, gene_dict = filtered[file_path][gene_list, max_genes]
+                estimate = estimate_group_bytes(
+                    gene_exp_arr.shape[0], gene_exp_arr.shape[1], group_jobs
+                )
+                args = (gene_exp_arr, gene_dict, method, group_jobs, output_dir,
+                        output_format, cache_dir)
+                group_tasks.append((estimate, _run_matrix_group, args))
+        _run_with_budget(executor, group_tasks, memory_budget, on_group)
+
+    summary = pd.DataFrame(summaries)
+    summary.to_csv(os.path.join(output_dir, "summary.csv"), index=False)
+
+    return summary
@@ -0,0 +1,270 @@
+import argparse
+import json
+import os
+import time
+
+from .client import DEFAULT_URL, submit_job, worker_status
+
+# The subcommands import the pipeline themselves, so the client ones
+# (submit, status) start without loading numpy, pandas or matilda. The choices
+# below are therefore listed here rather than read from OUTPUT_FORMATS and
+# NETWORK_RENDERERS; keep them in sync.
+OUTPUT_FORMAT_CHOICES = ("csv", "parquet", "npz")
+RENDERER_CHOICES = ("matplotlib", "bokeh")
+
+
+def parse_args(argv=None):
+    """
+    Parse the arguments of the wgtda command.
+    """
+    parser = argparse.ArgumentParser(
+        prog="wgtda",
+        description="Tools working on the results of WGTDA runs and a warm worker for pipeline jobs "
+        "(see main.py for the full pipeline)",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    refilter = subparsers.add_parser(
+        "refilter",
+        help="Re-apply the topological filters to a saved persistence without recomputing it",
+    )
+    refilter.add_argument(
+        "persistence_dir",
+        type=str,
+        nargs="?",
+        default="./output/persistence",
+        help="The persistence directory written by main.py (default: ./output/persistence)",
+    )
+    refilter.add_argument(
+        "--outputdir",
+        "-o",
+        type=str,
+        default="./output/",
+        help="The path for the output interactions",
+    )
+    refilter.add_argument(
+        "--output_format",
+        "--output-format",
+        type=str,
+        default="csv",
+        choices=OUTPUT_FORMAT_CHOICES,
+        help="Format of the interactions output, see main.py",
+    )
+    refilter.add_argument(
+        "--remove_inf_values",
+        "-inf",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Remove holes that do not close (--no-remove_inf_values keeps them)",
+    )
+    refilter.add_argument(
+        "--filter_persistence",
+        "-fp",
+        type=int,
+        default=10,
+        help="Filter top n%% of persistent features",
+    )
+    refilter.add_argument(
+        "--network_graphs",
+        "-ng",
+        action="store_true",
+        help="Also redraw the gene interaction network of every Betti number "
+        "into <outputdir>/network_graphs",
+    )
+    refilter.add_argument(
+        "--renderer",
+        type=str,
+        default="matplotlib",
+        choices=RENDERER_CHOICES,
+        help="Draw the networks as .png with matplotlib or as interactive .html with bokeh",
+    )
+    refilter.add_argument(
+        "--min_weight",
+        type=float,
+        default=None,
+        help="Leave out network edges lighter than this weight",
+    )
+    refilter.add_argument(
+        "--max_edges",
+        type=int,
+        default=None,
+        help="Draw only the heaviest edges of each network",
+    )
+
+    serve = subparsers.add_parser(
+        "serve",
+        help="Run a local worker that keeps cohorts, expression arrays and matrices "
+        "in memory between jobs",
+    )
+    serve.add_argument(
+        "--host",
+        type=str,
+        default="127.0.0.1",
+        help="The address to listen on. The worker reads the files named by the jobs, "
+        "so keep it local",
+    )
+    serve.add_argument(
+        "--port",
+        "-p",
+        type=int,
+        default=8765,
+        help="The port to listen on",
+    )
+    serve.add_argument(
+        "--memory_gb",
+        "-m",
+        type=float,
+        default=8.0,
+        help="Memory budget of the cached cohorts, arrays and matrices in GB; the least "
+        "recently used are evicted beyond it",
+    )
+    serve.add_argument(
+        "--cache_dir",
+        "-cd",
+        type=str,
+        default=None,
+        help="Also keep the correlation matrices in this on-disk cache",
+    )
+    serve.add_argument(
+        "--n_jobs",
+        "-j",
+        type=int,
+        default=1,
+        help="Worker processes of the correlation and complex stages (-1 uses every core)",
+    )
+
+    submit = subparsers.add_parser(
+        "submit",
+        help="Run a job on a worker started with `wgtda serve` and print its progress",
+    )
+    submit.add_argument(
+        "job",
+        type=str,
+        help="The job, as a JSON file or a JSON string: file_path, filter_genes_path, "
+        "preprocessing, dimensions and the batch options, plus output_dir and output_format",
+    )
+    submit.add_argument(
+        "--url",
+        type=str,
+        default=DEFAULT_URL,
+        help="The address of the worker",
+    )
+
+    status = subparsers.add_parser(
+        "status",
+        help="List what a worker started with `wgtda serve` keeps in memory",
+    )
+    status.add_argument(
+        "--url",
+        type=str,
+        default=DEFAULT_URL,
+        help="The address of the worker",
+    )
+    status.add_argument(
+        "--clear",
+        action="store_true",
+        help="Empty the worker's caches",
+    )
+
+    return parser.parse_args(argv)
+
+
+def refilter(args):
+    """
+    Run `wgtda refilter`.
+    """
+    from .interactions import write_interactions
+    from .networks import create_network_graphs
+    from .pipeline import refilter_interactions
+
+    start = time.perf_counter()
+    interactions = refilter_interactions(
+        args.persistence_dir,
+        remove_inf_values=args.remove_inf_values,
+        filter_persistence=args.filter_persistence,
+    )
+    print("Refiltered to {} interactions in {:.1f} ms".format(
+        len(interactions), 1000 * (time.perf_counter() - start)
+    ))
+
+    os.makedirs(args.outputdir, exist_ok=True)
+    path = write_interactions(interactions, args.outputdir, args.output_format)
+    print("Saved to " + path)
+
+    if args.network_graphs:
+        output_dir = os.path.join(args.outputdir, "network_graphs")
+        create_network_graphs(
+            interactions,
+            output_dir,
+            renderer=args.renderer,
+            min_weight=args.min_weight,
+            max_edges=args.max_edges,
+            # Refiltering to the same interactions again reuses their layouts
+            layout_cache_dir=os.path.join(args.persistence_dir, "layouts"),
+        )
+        print("Saved network graphs to " + output_dir)
+
+
+def serve(args):
+    """
+    Run `wgtda serve`.
+    """
+    from .service import serve as serve_jobs
+
+    serve_jobs(args.host, args.port, args.memory_gb, args.cache_dir, args.n_jobs)
+
+
+def submit(args):
+    """
+    Run `wgtda submit`.
+    """
+    if os.path.isfile(args.job):
+        with open(args.job, "r") as file:
+            job = json.load(file)
+    else:
+        job = json.loads(args.job)
+
+    # The worker writes the interactions; the printed summary is enough here
+    job.setdefault("return_interactions", False)
+    result = submit_job(job, args.url)
+    counts = ", ".join(
+        "Betti {}: {}".format(betti, count) for betti, count in result["betti_counts"].items()
+    )
+    print("{} interactions ({}) in {:.2f} s".format(
+        result["num_interactions"], counts or "none", result["seconds"]
+    ))
+    if "output" in result:
+        print("Saved to " + result["output"])
+
+
+def status(args):
+    """
+    Run `wgtda status`.
+    """
+    state = worker_status(args.url, clear=args.clear)
+    print("{} jobs run, {:.1f} of {:.1f} MB cached".format(
+        state["num_jobs"], state["cache_bytes"] / 1024**2, state["max_cache_bytes"] / 1024**2
+    ))
+    for entry in state["entries"]:
+        print("  {:<8} {:>10.1f} MB  {}".format(
+            entry["kind"], entry["bytes"] / 1024**2, " ".join(entry["key"])
+        ))
+
+
+def main(argv=None):
+    """
+    Entry point of the wgtda command.
+    """
+    args = parse_args(argv)
+    if args.command == "refilter":
+        refilter(args)
+    elif args.command == "serve":
+        serve(args)
+    elif args.command == "submit":
+        submit(args)
+    elif args.command == "status":
+        status(args)
+
+
+if __name__ == "__main__":
+    main()
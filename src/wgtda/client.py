@@ -0,0 +1,92 @@
+import json
+import os
+import urllib.request
+from typing import Callable, Iterator, Optional
+
+# Only the standard library is imported here, so the client starts instantly
+DEFAULT_URL = "http://127.0.0.1:8765"
+
+# Job keys holding paths, made absolute since the server may run in another directory
+_PATH_KEYS = ["file_path", "filter_genes_path", "output_dir"]
+
+
+def stream_job(job: dict, url: str = DEFAULT_URL) -> Iterator[dict]:
+    """
+    Submit a job to a `wgtda serve` worker and yield its events as they arrive.
+
+    Parameters:
+    - job : dict
+        The job, see wgtda.service.normalize_job. Relative paths are resolved
+        against the current directory.
+    - url : str, default = DEFAULT_URL
+        The address of the worker.
+
+    Returns:
+    - Iterator[dict]
+        {"event": "progress", "message": ...} events, then one {"event": "result", ...}
+        or {"event": "error", "error": ...} event.
+    """
+    job = dict(job)
+    for key in _PATH_KEYS:
+        if job.get(key) is not None:
+            job[key] = os.path.abspath(job[key])
+    request = urllib.request.Request(
+        url.rstrip("/") + "/jobs",
+        data=json.dumps(job).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request) as response:
+        for line in response:
+            if line.strip():
+                yield json.loads(line)
+
+
+def submit_job(
+    job: dict, url: str = DEFAULT_URL, on_progress: Optional[Callable[[str], None]] = print
+) -> dict:
+    """
+    Submit a job to a `wgtda serve` worker and wait for its result.
+
+    Parameters:
+    - job : dict
+        The job, see stream_job.
+    - url : str, default = DEFAULT_URL
+        The address of the worker.
+    - on_progress : Callable[[str], None], default = print
+        Receives every progress message; None ignores them.
+
+    Returns:
+    - dict
+        The result event, whose "interactions" records load with pandas.DataFrame.
+    """
+    for event in stream_job(job, url):
+        if event["event"] == "progress":
+            if on_progress is not None:
+                on_progress(event["message"])
+        elif event["event"] == "error":
+            raise RuntimeError("The job failed on the worker: " + event["error"])
+        else:
+            return event
+    raise RuntimeError("The worker closed the connection before the job finished")
+
+
+def worker_status(url: str = DEFAULT_URL, clear: bool = False) -> dict:
+    """
+    The cache contents of a `wgtda serve` worker.
+
+    Parameters:
+    - url : str, default = DEFAULT_URL
+        The address of the worker.
+    - clear : bool, default = False
+        Empty the worker's caches first.
+
+    Returns:
+    - dict
+        See wgtda.service.WarmWorker.status.
+    """
+    if clear:
+        request = urllib.request.Request(url.rstrip("/") + "/clear", data=b"", method="POST")
+    else:
+        request = url.rstrip("/") + "/status"
+    with urllib.request.urlopen(request) as response:
+        return json.load(response)
@@ -0,0 +1,75 @@
+from typing import Optional
+
+import numpy as np
+from numpy import ndarray
+
+# Candidate dominating vertices tested per vectorized check
+_CANDIDATE_BLOCK = 64
+
+
+def collapse_edges(preprocessing: ndarray, max_radius: Optional[float] = None) -> ndarray:
+    """
+    Remove the edges of a Vietoris-Rips filtration that can be collapsed without changing its persistence.
+
+    An edge uv entering at t is dominated by a vertex w at filtration value s if w
+    is adjacent to u and v and to every common neighbour of u and v at s. Removing
+    an edge dominated at every s >= t is an edge collapse of every complex of the
+    filtration from t on, so the persistence diagrams (and the flag complexes up to
+    homotopy) do not change. In terms of distances, w dominates uv from t on if
+    d(w, u) <= t, d(w, v) <= t and d(w, x) <= max(t, d(x, u), d(x, v)) for every x.
+
+    Edges are tested from the longest to the shortest against the graph left by the
+    previous removals, trying the candidates closest to the edge first. Vertices
+    are never removed, so the remaining simplices keep their original gene indices.
+
+    Parameters:
+    - preprocessing : ndarray
+        A square distance matrix.
+    - max_radius : float, optional
+        Radius bound of the filtration; longer edges are removed as well.
+
+    Returns:
+    - ndarray
+        A float64 copy of the matrix in which removed edges are infinite.
+    """
+    reduced = np.array(preprocessing, dtype=np.float64)
+    if max_radius is not None:
+        reduced[reduced > max_radius] = np.inf
+    np.fill_diagonal(reduced, 0.0)
+
+    rows, cols = np.triu_indices(reduced.shape[0], k=1)
+    values = reduced[rows, cols]
+    finite = np.isfinite(values)
+    rows, cols, values = rows[finite], cols[finite], values[finite]
+
+    # Longest edges first, ties in the reverse of the complex's (lower, higher) vertex order
+    for edge in np.lexsort((cols, rows, values))[::-1]:
+        u, v, value = rows[edge], cols[edge], values[edge]
+        # Filtration value at which every vertex becomes a common neighbour of u and v
+        joins = np.maximum(reduced[u], reduced[v])
+        candidates = np.flatnonzero(joins <= value)
+        candidates = candidates[(candidates != u) & (candidates != v)]
+        if len(candidates) == 0:
+            continue
+
+        bounds = np.maximum(joins, value)
+        candidates = candidates[np.argsort(joins[candidates], kind="stable")]
+        for start in range(0, len(candidates), _CANDIDATE_BLOCK):
+            block = candidates[start : start + _CANDIDATE_BLOCK]
+            if np.any(np.all(reduced[block] <= bounds, axis=1)):
+                reduced[u, v] = reduced[v, u] = np.inf
+                break
+
+    return reduced
+
+
+def count_edges(preprocessing: ndarray, max_radius: Optional[float] = None) -> int:
+    """
+    Number of edges (finite entries above the diagonal, at most max_radius) of a distance matrix.
+    """
+    max_radius = np.inf if max_radius is None else max_radius
+    num_edges = 0
+    for row in range(preprocessing.shape[0] - 1):
+        distances = np.asarray(preprocessing[row, row + 1 :])
+        num_edges += int(np.count_nonzero(np.isfinite(distances) & (distances <= max_radius)))
+    return num_edges
@@ -1,14 +1,284 @@
+from concurrent.futures import ProcessPoolExecutor
 
 import matilda
 import numpy as np
 import pandas as pd
 from matilda import FilteredSimplicialComplex, PersistentHomologyComputer
 from numpy import ndarray
-from typing import Tuple
+from typing import Optional, Tuple, Union
+
+from . import profiling
+from .collapse import collapse_edges, count_edges
+from .components import gene_components, merge_components, singleton_result
+from .correlation.parallel import pool_context, resolve_n_jobs
+from .h0 import h0_persistence, inject_h0, vertex_complex
+from .interactions import build_interaction_table
+
+# Simplex budget used by max_radius="auto" when no quantile is given
+DEFAULT_MAX_SIMPLICES = 5_000_000
+
+# Genes up to which the triangles of the simplex estimate are counted exactly;
+# above, they are estimated from the pairs of neighbours of a sample of genes
+_EXACT_TRIANGLE_GENES = 2048
+_TRIANGLE_SAMPLE_ROWS = 512
+_TRIANGLE_SAMPLE_PAIRS = 2048
+
+# Rows of the distance matrix processed at a time, which bounds the temporaries on large (memory-mapped) matrices
+_ROW_BLOCK = 1024
+
+
+def _upper_triangle_distances(preprocessing: ndarray) -> ndarray:
+    """
+    The finite pairwise distances above the diagonal, gathered block by block of rows.
+    """
+    num_genes = preprocessing.shape[0]
+    parts = []
+    for start in range(0, num_genes, _ROW_BLOCK):
+        block = np.asarray(preprocessing[start : start + _ROW_BLOCK])
+        for offset, row in enumerate(block):
+            parts.append(row[start + offset + 1 :])
+    distances = np.concatenate(parts) if parts else np.zeros(0)
+    return distances[np.isfinite(distances)]
+
+
+def _triangle_count(preprocessing: ndarray, radius: float, seed: int = 0) -> float:
+    """
+    Count (or, above _EXACT_TRIANGLE_GENES genes, estimate) the triangles of the graph thresholded at a radius.
+
+    The estimate averages the triangles through a seeded sample of
+    _TRIANGLE_SAMPLE_ROWS genes: the edges among a gene's neighbours, counted
+    exactly for few neighbours and otherwise from _TRIANGLE_SAMPLE_PAIRS random
+    pairs of them. It reads those rows and pairs only, so it costs O(genes) per radius.
+    """
+    num_genes = preprocessing.shape[0]
+    if num_genes <= _EXACT_TRIANGLE_GENES:
+        # Neighbour counts are integers far below 2**24, so float32 products are exact
+        adjacency = (np.asarray(preprocessing) <= radius).astype(np.float32)
+        np.fill_diagonal(adjacency, 0.0)
+        return float(np.sum((adjacency @ adjacency) * adjacency, dtype=np.float64) / 6)
+
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(num_genes, _TRIANGLE_SAMPLE_ROWS, replace=False))
+    # The same draws at every radius keep the estimate consistent across the bisection
+    draws = rng.random((_TRIANGLE_SAMPLE_ROWS, 2, _TRIANGLE_SAMPLE_PAIRS))
+    through = np.zeros(len(rows))
+    for k, row in enumerate(rows):
+        neighbours = np.flatnonzero(np.asarray(preprocessing[row]) <= radius)
+        neighbours = neighbours[neighbours != row]
+        num_pairs = len(neighbours) * (len(neighbours) - 1) / 2
+        if num_pairs == 0:
+            continue
+        if num_pairs <= _TRIANGLE_SAMPLE_PAIRS:
+            linked = np.asarray(preprocessing[np.ix_(neighbours, neighbours)]) <= radius
+            through[k] = (linked.sum() - len(neighbours)) / 2
+            continue
+        first = neighbours[(draws[k, 0] * len(neighbours)).astype(np.int64)]
+        second = neighbours[(draws[k, 1] * len(neighbours)).astype(np.int64)]
+        distinct = first != second
+        linked = np.asarray(preprocessing[first[distinct], second[distinct]]) <= radius
+        through[k] = num_pairs * linked.mean()
+
+    # Every triangle goes through three genes
+    return float(through.mean() * num_genes / 3)
+
+
+def estimate_vr_simplices(
+    preprocessing: ndarray,
+    radius: float,
+    dimensions=3,
+    sorted_distances: Optional[ndarray] = None,
+) -> ndarray:
+    """
+    Estimate the number of simplices per dimension of a Vietoris-Rips complex cut at a radius.
+
+    Vertices and edges are counted exactly, the edges by a binary search in the
+    sorted pairwise distances. Triangles are counted exactly up to
+    _EXACT_TRIANGLE_GENES genes (a G x G product); for more genes they are
+    estimated from a sample of rows, which is approximate but costs O(G) per
+    radius. Higher-dimensional cliques are extrapolated from how quickly the
+    counts grow from one dimension to the next.
+
+    Parameters:
+    - preprocessing : ndarray
+        A square distance matrix.
+    - radius : float
+        The filtration radius at which the complex is cut.
+    - dimensions : int, default = 3
+        The maximum dimension of simplices in the complex.
+    - sorted_distances : ndarray, optional
+        The sorted finite distances above the diagonal, to reuse them across radii
+        (computed from preprocessing if not given).
+
+    Returns:
+    - ndarray
+        The (estimated) number of simplices of each dimension 0..dimensions.
+    """
+    num_genes = preprocessing.shape[0]
+    if sorted_distances is None:
+        sorted_distances = np.sort(_upper_triangle_distances(preprocessing))
+
+    counts = np.zeros(dimensions + 1)
+    counts[0] = num_genes
+    if dimensions >= 1:
+        counts[1] = np.searchsorted(sorted_distances, radius, side="right")
+    if dimensions >= 2 and counts[1] > 0:
+        counts[2] = _triangle_count(preprocessing, radius)
+    for dim in range(3, dimensions + 1):
+        if counts[dim - 2] == 0:
+            break
+        # Extrapolate assuming the growth ratio c_k / c_k-1 decays geometrically
+        ratio = counts[dim - 1] / counts[dim - 2]
+        previous_ratio = counts[dim - 2] / counts[dim - 3]
+        counts[dim] = counts[dim - 1] * ratio**2 / previous_ratio
+
+    return counts
+
+
+def select_vr_radius(
+    preprocessing: ndarray,
+    dimensions=3,
+    radius_quantile: Optional[float] = None,
+    max_simplices: Optional[int] = None,
+) -> float:
+    """
+    Pick a Vietoris-Rips radius from the distance distribution or from a simplex budget.
+
+    Parameters:
+    - preprocessing : ndarray
+        A square distance matrix.
+    - dimensions : int, default = 3
+        The maximum dimension of simplices in the complex.
+    - radius_quantile : float, optional
+        Use this quantile (0-1) of the pairwise distances as the radius.
+    - max_simplices : int, optional
+        Otherwise, use the largest radius whose estimated simplex count stays within
+        this budget (DEFAULT_MAX_SIMPLICES if neither option is given).
+
+    Returns:
+    - float
+        The selected radius.
+    """
+    # Sorted once, for the quantiles and the edge counts of every candidate radius
+    distances = np.sort(_upper_triangle_distances(preprocessing))
+    if distances.size == 0:
+        return 0.0
+
+    if radius_quantile is not None:
+        if not 0 <= radius_quantile <= 1:
+            raise ValueError("radius_quantile must be between 0 and 1.")
+        return float(np.quantile(distances, radius_quantile))
+
+    if max_simplices is None:
+        max_simplices = DEFAULT_MAX_SIMPLICES
+
+    # Binary search over a quantile grid of the distances; the count is monotone in the radius
+    candidates = np.unique(np.quantile(distances, np.linspace(0, 1, 257)))
+    low, high = 0, len(candidates) - 1
+
+    def fits(radius):
+        counts = estimate_vr_simplices(preprocessing, radius, dimensions, distances)
+        return counts.sum() <= max_simplices
+
+    if fits(candidates[high]):
+        return float(candidates[high])
+    while low < high:
+        middle = (low + high + 1) // 2
+        if fits(candidates[middle]):
+            low = middle
+        else:
+            high = middle - 1
+
+    return float(candidates[low])
+
+
+def _component_persistence(
+    preprocessing: ndarray,
+    dimensions: int,
+    max_radius: float,
+    with_representatives: bool,
+    edge_collapse: bool,
+) -> dict:
+    """
+    Pool worker: complex and persistence of one connected component, as plain picklable data.
+    """
+    persistence, rips_complex = construct_vr_complex_rna_matrix(
+        preprocessing,
+        dimensions,
+        max_radius=max_radius,
+        with_representatives=with_representatives,
+        h0_engine="matilda",
+        edge_collapse=edge_collapse,
+    )
+    cycles = getattr(persistence, "persistent_cycles", None) or {}
+    return {
+        "simplices": [list(simplex) for simplex in rips_complex.simplices],
+        "appears_at": list(rips_complex.appears_at),
+        "bars": {dim: dict(bars) for dim, bars in persistence.bars.items()},
+        "cycles": {
+            dim: {key: dict(cycle) for key, cycle in dim_cycles.items()}
+            for dim, dim_cycles in cycles.items()
+        } if with_representatives else {},
+    }
+
+
+def _construct_by_component(
+    preprocessing: ndarray,
+    components: list,
+    dimensions: int,
+    max_radius: float,
+    with_representatives: bool,
+    edge_collapse: bool,
+    n_jobs: int,
+) -> Tuple[PersistentHomologyComputer, FilteredSimplicialComplex]:
+    """
+    Compute the persistence of every connected component separately and merge the results.
+
+    Isolated genes are filled in directly; the other components run in a process
+    pool, largest first so that the longest reductions start early.
+    """
+    results = [None] * len(components)
+    tasks = []
+    for index, genes in enumerate(components):
+        if len(genes) == 1:
+            results[index] = singleton_result(with_representatives)
+        else:
+            tasks.append(index)
+    tasks.sort(key=lambda index: -len(components[index]))
+
+    def arguments(index):
+        genes = components[index]
+        return (
+            np.asarray(preprocessing[np.ix_(genes, genes)], dtype=np.float64),
+            dimensions, max_radius, with_representatives, edge_collapse,
+        )
+
+    n_jobs = min(resolve_n_jobs(n_jobs), len(tasks))
+    if n_jobs <= 1:
+        for index in tasks:
+            results[index] = _component_persistence(*arguments(index))
+    else:
+        with ProcessPoolExecutor(
+            max_workers=n_jobs, mp_context=pool_context()
+        ) as executor:
+            futures = {index: executor.submit(_component_persistence, *arguments(index)) for index in tasks}
+            for index, future in futures.items():
+                results[index] = future.result()
+
+    return merge_components(components, results, dimensions, with_representatives)
 
 
 def construct_vr_complex_rna_matrix(
-    preprocessing: ndarray, dimensions=3
+    preprocessing: ndarray,
+    dimensions=3,
+    max_radius: Union[float, str, None] = None,
+    radius_quantile: Optional[float] = None,
+    max_simplices: Optional[int] = None,
+    with_representatives: bool = True,
+    verbose: bool = False,
+    h0_engine: str = "matilda",
+    edge_collapse: bool = False,
+    by_component: bool = False,
+    n_jobs: int = 1,
 ) -> Tuple[PersistentHomologyComputer, FilteredSimplicialComplex]:
     """
     Construct a Vietoris-Rips complex from the specified preprocessing matrix and compute its persistent homology.
@@ -16,8 +286,43 @@ def construct_vr_complex_rna_matrix(
     Parameters:
     - preprocessing : ndarray
         A square matrix where element [i, j] represents the distance between the i-th and j-th elements.
+        It may be a (float32) np.memmap, which is passed to matilda without being loaded into memory.
+        Infinite entries (e.g. pairs dropped by wgtda.correlation.significance_filter) never enter the complex.
     - dimension : int, default = 3
         The maximum dimension of simplices to be considered in the Vietoris-Rips complex. Default is 3.
+    - max_radius : float or "auto", optional
+        Only add simplices whose filtration value is at most this radius. None builds the
+        full complex; "auto" picks the radius with select_vr_radius from radius_quantile
+        or max_simplices. Features still alive at the radius are reported as infinite.
+    - radius_quantile : float, optional
+        Quantile of the pairwise distances used as the radius when max_radius="auto".
+    - max_simplices : int, optional
+        Simplex budget used to pick the radius when max_radius="auto".
+    - with_representatives : bool, default = True
+        Store a representative cycle for every bar. Set to False to compute bars only,
+        e.g. before filtering them and calling extract_representatives.
+    - verbose : bool, default = False
+        Let matilda report the progress of the reduction.
+    - h0_engine : str, default = "matilda"
+        "matilda" keeps the boundary matrix reduction's Betti 0 results. "mst" computes
+        the Betti 0 bars and representatives from the minimum spanning tree (see
+        wgtda.h0) in place of matilda's, and with dimensions=0 builds no complex at all.
+    - edge_collapse : bool, default = False
+        Remove the edges that collapse_edges (see wgtda.collapse) finds dominated
+        before expanding the complex to the requested dimension. The bars are
+        unchanged, the complex is smaller and its representatives are still given in
+        the original gene indices, though they may differ from the full complex's.
+        Only the bars of the top dimension, which never die in a complex cut at
+        that dimension, can differ. The distance matrix is loaded into memory as float64.
+    - by_component : bool, default = False
+        With a finite radius, split the genes into the connected components of the
+        distance matrix thresholded at the radius (without one, the components of
+        its finite entries, if some pairs are infinite), build the complex and compute
+        persistent homology of every component in a process pool and merge the bars
+        and representatives (in gene indices) into one complex. The homology of a
+        disjoint union is that of its parts, so the bars are the same.
+    - n_jobs : int, default = 1
+        Worker processes used with by_component (-1 for every core).
 
     Returns:
     - tuple[PersistentHomologyComputer, FilteredSimplicialComplex]
@@ -34,24 +339,211 @@ def construct_vr_complex_rna_matrix(
          matrix = np.array([[0, 1, 1.5], [1, 0, 2], [1.5, 2, 0]])
      persistence, rips_complex = VRcomplex(matrix, dimension=2)
     """
-    # Create a FilteredSimplicialComplex object
-    rips_complex = matilda.FilteredSimplicialComplex()
+    if max_radius is None:
+        max_radius = np.inf
+    elif max_radius == "auto":
+        max_radius = select_vr_radius(
+            preprocessing, dimensions, radius_quantile, max_simplices
+        )
+        print("Vietoris-Rips radius: {:.6g}".format(max_radius))
 
-    # Construct the Vietoris-Rips complex from the preprocessed distance matrix
-    rips_complex.construct_vietoris_from_metric(
-        matrix=preprocessing, dimension=dimensions, upper_bound=np.inf
-    )
+    if h0_engine not in ["mst", "matilda"]:
+        raise ValueError("Unsupported H0 engine. Supported engines are: 'mst', 'matilda'")
 
-    persistence = matilda.PersistentHomologyComputer()
+    components = None
+    component_radius = max_radius
+    if by_component and not np.isfinite(max_radius) and not np.isfinite(preprocessing).all():
+        # Without a radius, dropped (infinite) pairs can still split the genes
+        component_radius = np.max(preprocessing, where=np.isfinite(preprocessing), initial=0.0)
+    if by_component and np.isfinite(component_radius) and not (dimensions == 0 and h0_engine == "mst"):
+        with profiling.stage("components"):
+            components = gene_components(preprocessing, component_radius)
+        print("{} connected components at radius {:.6g}".format(len(components), component_radius))
+        profiling.record(
+            num_components=len(components),
+            largest_component=max(len(genes) for genes in components),
+        )
 
-    # Compute the persistent homology of the VR complex
-    persistence.compute_persistent_homology(
-        rips_complex, with_representatives=True, verbose=True
-    )
+    if dimensions == 0 and h0_engine == "mst":
+        # Betti 0 only: the spanning tree below is all that is needed
+        rips_complex = vertex_complex(preprocessing.shape[0])
+        persistence = matilda.PersistentHomologyComputer()
+    elif components is not None and len(components) > 1:
+        with profiling.stage("persistent_homology_by_component"):
+            persistence, rips_complex = _construct_by_component(
+                preprocessing, components, dimensions, max_radius,
+                with_representatives, edge_collapse, n_jobs,
+            )
+    else:
+        # Create a FilteredSimplicialComplex object
+        rips_complex = matilda.FilteredSimplicialComplex()
+
+        matrix, upper_bound = preprocessing, max_radius
+        if edge_collapse and dimensions > 0:
+            with profiling.stage("edge_collapse", profile=True):
+                matrix = collapse_edges(preprocessing, max_radius)
+            num_edges, kept_edges = count_edges(preprocessing, max_radius), count_edges(matrix)
+            print("Edge collapse kept {} of {} edges".format(kept_edges, num_edges))
+            profiling.record(num_edges=num_edges, num_collapsed_edges=kept_edges)
+
+        if not np.isfinite(upper_bound) and not np.isfinite(matrix).all():
+            # Collapsed or dropped edges are infinite, keep them out of the complex
+            upper_bound = np.nextafter(np.max(matrix, where=np.isfinite(matrix), initial=0.0), np.inf)
+
+        # Construct the Vietoris-Rips complex from the preprocessed distance matrix
+        with profiling.stage("vr_construction", profile=True):
+            rips_complex.construct_vietoris_from_metric(
+                matrix=matrix, dimension=dimensions, upper_bound=upper_bound
+            )
+
+        persistence = matilda.PersistentHomologyComputer()
+
+        # Compute the persistent homology of the VR complex
+        with profiling.stage("persistent_homology", profile=True):
+            persistence.compute_persistent_homology(
+                rips_complex, with_representatives=with_representatives, verbose=verbose
+            )
+
+    if h0_engine == "mst":
+        with profiling.stage("h0_mst"):
+            inject_h0(
+                persistence,
+                rips_complex,
+                h0_persistence(preprocessing, max_radius),
+                with_representatives,
+            )
+
+    if profiling.is_active():
+        dimension_counts = np.bincount([len(simplex) - 1 for simplex in rips_complex.simplices])
+        profiling.append(
+            "complexes",
+            {
+                "max_radius": float(max_radius) if np.isfinite(max_radius) else None,
+                "with_representatives": with_representatives,
+                "num_simplices": {dim: int(count) for dim, count in enumerate(dimension_counts)},
+                "num_bars": {int(dim): len(bars) for dim, bars in sorted(persistence.bars.items())},
+            },
+        )
 
     return persistence, rips_complex
 
 
+def extract_representatives(
+    preprocessing: ndarray,
+    interactions: pd.DataFrame,
+    gene_dict: dict,
+    dimensions=3,
+    max_radius: Optional[float] = None,
+    verbose: bool = False,
+    edge_collapse: bool = False,
+    by_component: bool = False,
+    n_jobs: int = 1,
+) -> pd.DataFrame:
+    """
+    Fill in representative cycles for the bars that survived filtering (second pass of two-pass persistence).
+
+    The first pass computes bars only; after remove_infinite_holes and
+    extract_top_n_persistent_holes, this recomputes persistent homology with
+    representatives on the complex truncated at the latest death among the kept
+    bars of Betti number 1 and up. A truncated filtration is a prefix of the full
+    one, so the kept bars and their representatives are exactly those of the full
+    computation, while representatives of the many short-lived discarded bars
+    beyond the truncation are never stored. Betti 0 representatives come from the
+    minimum spanning tree, so they neither need a complex nor extend the truncation.
+
+    Parameters:
+    - preprocessing : ndarray
+        The distance matrix used in the first pass.
+    - interactions : pd.DataFrame
+        The filtered interactions of the first pass.
+    - gene_dict : dict
+        A dictionary mapping vertex indices to gene names.
+    - dimensions : int, default = 3
+        The maximum simplex dimension used in the first pass.
+    - max_radius : float, optional
+        The radius bound used in the first pass.
+    - verbose : bool, default = False
+        Let matilda report the progress of the reduction.
+    - edge_collapse : bool, default = False
+        Collapse dominated edges of the truncated complex, as in the first pass.
+    - by_component : bool, default = False
+        Compute the truncated complex component by component, see construct_vr_complex_rna_matrix.
+    - n_jobs : int, default = 1
+        Worker processes used with by_component.
+
+    Returns:
+    - pd.DataFrame
+        The interactions with their vertices and vertices_set columns filled in.
+
+    Raises:
+    - RuntimeError
+        If a kept bar has no bar with the same Betti number, birth and death in the
+        second pass, rather than leaving its representative empty.
+    """
+    max_radius = np.inf if max_radius is None else max_radius
+    higher = interactions["betti_number"].to_numpy() > 0
+
+    parts = []
+    if higher.any():
+        truncated_radius = max_radius
+        deaths = interactions.loc[higher, "death"].to_numpy(dtype=float)
+        if np.all(np.isfinite(deaths)):
+            # Nudge up so the simplices killing the latest bars are kept whether
+            # the bound is applied inclusively or not
+            truncated_radius = min(max_radius, np.nextafter(deaths.max(), np.inf))
+        persistence, rips_complex = construct_vr_complex_rna_matrix(
+            preprocessing,
+            dimensions,
+            max_radius=truncated_radius,
+            with_representatives=True,
+            verbose=verbose,
+            h0_engine="matilda",
+            edge_collapse=edge_collapse,
+            by_component=by_component,
+            n_jobs=n_jobs,
+        )
+        representatives = interactions_dataframe(persistence, rips_complex, gene_dict)
+        parts.append(representatives[representatives["betti_number"] > 0])
+    if not higher.all():
+        # Betti 0 representatives come from the spanning tree, without any complex.
+        # The mst engine is required here: matilda's 0-dimensional complex has
+        # no edges, so all of its Betti 0 bars would be infinite
+        persistence, rips_complex = construct_vr_complex_rna_matrix(
+            preprocessing, 0, max_radius=max_radius, with_representatives=True, h0_engine="mst"
+        )
+        parts.append(interactions_dataframe(persistence, rips_complex, gene_dict))
+    representatives = pd.concat(parts, ignore_index=True)
+
+    # Match bars on (betti number, birth, death), numbering repeated bars in order
+    keys = ["betti_number", "birth", "death"]
+    kept = interactions.sort_values("interaction_id").copy()
+    kept["occurrence"] = kept.groupby(keys).cumcount()
+    representatives["occurrence"] = representatives.groupby(keys).cumcount()
+    matched = kept.drop(columns=["vertices", "vertices_set"]).merge(
+        representatives[keys + ["occurrence", "vertices", "vertices_set"]],
+        on=keys + ["occurrence"],
+        how="left",
+    )
+    matched.index = kept.index
+
+    # Both passes see the same filtration up to the truncation, so every kept bar must reappear
+    unmatched = matched["vertices"].isna()
+    if unmatched.any():
+        betti_numbers = sorted(int(b) for b in matched.loc[unmatched, "betti_number"].unique())
+        raise RuntimeError(
+            "{} of the {} kept bars (Betti numbers {}) have no matching bar in the second pass "
+            "of two-pass persistence, so their representatives are unknown".format(
+                int(unmatched.sum()), len(matched), ", ".join(map(str, betti_numbers))
+            )
+        )
+
+    result = interactions.copy()
+    for column in ["vertices", "vertices_set"]:
+        result[column] = matched[column].reindex(result.index)
+
+    return result
+
+
 def interactions_dataframe(
     persistence: PersistentHomologyComputer,
     rips_complex: FilteredSimplicialComplex,
@@ -76,63 +568,8 @@ def interactions_dataframe(
 
     This function processes the results of persistent homology calculations to extract
     meaningful biological interactions, which can help in understanding the connectivity
-    and interaction between different genes within the analyzed dataset.
-    """
-    interactions_list = []
-    interactions = pd.DataFrame(
-        columns=[
-            "interaction_id",
-            "betti_number",
-            "birth",
-            "death",
-            "lifespan",
-            "vertices",
-            "vertices_set",
-        ]
-    )
-
-    # Organize persistent cycles and betti pairs for easy access
-    betti_pairs = [
-        (outer_key, (inner_key, tuple(inner_value)))
-        for outer_key, inner_dict in persistence.bars.items()
-        for inner_key, inner_value in inner_dict.items()
-    ]
-    persistence_pairs = {
-        outer_key: {
-            middle_key: list(inner_dict.keys())
-            for middle_key, inner_dict in middle_dict.items()
-        }
-        for outer_key, middle_dict in persistence.persistent_cycles.items()
-    }
-    persistence_pairs = [
-        (outer_key, (inner_key, value))
-        for outer_key, middle_dict in persistence_pairs.items()
-        for inner_key, value in middle_dict.items()
-    ]
-
-    # Process each pair and populate the dataframe
-    for index, (
-        (betti_number, (interaction_id, (birth, death))),
-        (betti_number2, (interaction_id2, vertices)),
-    ) in enumerate(zip(betti_pairs, persistence_pairs)):
-        lifespan = death - birth
-        vertices_id = [rips_complex.simplices[i] for i in vertices]
-        vertices_id = [list(item) for item in vertices_id]
-        vertices_set = [
-            [gene_dict[item] for item in sublist] for sublist in vertices_id
-        ]
-        interaction = [
-            index,
-            betti_number,
-            birth,
-            death,
-            lifespan,
-            vertices,
-            vertices_set,
-        ]
-        interactions_list.append(interaction)
-    new_interactions = pd.DataFrame(interactions_list, columns=interactions.columns)
-
-    interactions = pd.concat([interactions, new_interactions], ignore_index=True)
-
-    return interactions
+    and interaction between different genes within the analyzed dataset. It is built on
+    the columnar build_interaction_table; use that directly to avoid materialising the
+    list-valued columns.
+    """
+    return build_interaction_table(persistence, rips_complex, gene_dict).to_dataframe()
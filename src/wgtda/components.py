@@ -0,0 +1,132 @@
+from typing import List
+
+import matilda
+import numpy as np
+from numpy import ndarray
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+# Rows of the distance matrix thresholded at a time
+_ROW_BLOCK = 1024
+
+
+def gene_components(preprocessing: ndarray, max_radius: float) -> List[ndarray]:
+    """
+    Split the genes into the connected components of the distance matrix thresholded at a radius.
+
+    Parameters:
+    - preprocessing : ndarray
+        A square distance matrix (may be a np.memmap, it is read block by block of rows).
+    - max_radius : float
+        Genes closer than this radius are connected.
+
+    Returns:
+    - List[ndarray]
+        The (sorted) gene indices of every component, ordered by their lowest gene.
+    """
+    num_genes = preprocessing.shape[0]
+    rows, cols = [], []
+    for start in range(0, num_genes, _ROW_BLOCK):
+        block_rows, block_cols = np.nonzero(
+            np.asarray(preprocessing[start : start + _ROW_BLOCK]) <= max_radius
+        )
+        rows.append(block_rows + start)
+        cols.append(block_cols)
+    rows, cols = np.concatenate(rows), np.concatenate(cols)
+    graph = coo_matrix(
+        (np.ones(len(rows), dtype=bool), (rows, cols)), shape=(num_genes, num_genes)
+    ).tocsr()
+
+    _, labels = connected_components(graph, directed=False)
+    # Components are labelled in order of their lowest gene
+    order = np.argsort(labels, kind="stable")
+    boundaries = np.flatnonzero(np.diff(labels[order])) + 1
+    return np.split(order, boundaries)
+
+
+def singleton_result(with_representatives: bool = True) -> dict:
+    """
+    The complex and persistence of a single isolated gene, in the format of merge_components.
+    """
+    return {
+        "simplices": [[0]],
+        "appears_at": [0.0],
+        "bars": {0: {0: (0.0, np.inf)}},
+        "cycles": {0: {0: {0: 1}}} if with_representatives else {},
+    }
+
+
+def merge_components(
+    components: List[ndarray],
+    results: List[dict],
+    dimensions: int,
+    with_representatives: bool = True,
+) -> tuple:
+    """
+    Merge the complexes and persistence computed on separate components into single matilda objects.
+
+    The simplices of all components are renumbered in one filtration order
+    (filtration value, then dimension, then component), their vertices are mapped
+    back to gene indices and the bar keys and representative cycles are remapped
+    to the new simplex indices.
+
+    Parameters:
+    - components : List[ndarray]
+        The gene indices of every component.
+    - results : List[dict]
+        For every component, its "simplices" (in component vertex indices),
+        "appears_at", "bars" {dim: {key: (birth, death)}} and "cycles"
+        {dim: {key: {simplex: coefficient}}} (empty without representatives).
+    - dimensions : int
+        The maximum simplex dimension of the complexes.
+    - with_representatives : bool, default = True
+        Whether the results have representative cycles.
+
+    Returns:
+    - tuple[PersistentHomologyComputer, FilteredSimplicialComplex]
+        The merged persistence and complex.
+    """
+    simplices, appears_at, offsets = [], [], []
+    for genes, result in zip(components, results, strict=True):
+        offsets.append(len(simplices))
+        simplices.extend([[int(genes[vertex]) for vertex in simplex] for simplex in result["simplices"]])
+        appears_at.extend(result["appears_at"])
+
+    num_simplices = len(simplices)
+    appears = np.asarray(appears_at, dtype=np.float64)
+    simplex_dimensions = np.fromiter((len(simplex) for simplex in simplices), np.int64, num_simplices)
+    order = np.lexsort((np.arange(num_simplices), simplex_dimensions, appears))
+    rank = np.empty(num_simplices, dtype=np.int64)
+    rank[order] = np.arange(num_simplices)
+
+    rips_complex = matilda.FilteredSimplicialComplex()
+    rips_complex.dimension = dimensions
+    rips_complex.simplices = [simplices[index] for index in order]
+    rips_complex.appears_at = appears[order].tolist()
+    rips_complex.simplices_indices = list(range(num_simplices))
+
+    bars, cycles = {}, {}
+    for offset, result in zip(offsets, results, strict=True):
+        for dim, dim_bars in result["bars"].items():
+            bars.setdefault(dim, {}).update(
+                {int(rank[offset + key]): bar for key, bar in dim_bars.items()}
+            )
+        for dim, dim_cycles in result["cycles"].items():
+            cycles.setdefault(dim, {}).update({
+                int(rank[offset + key]): {
+                    int(rank[offset + simplex]): coefficient
+                    for simplex, coefficient in cycle.items()
+                }
+                for key, cycle in dim_cycles.items()
+            })
+
+    persistence = matilda.PersistentHomologyComputer()
+    persistence.bars = {
+        dim: {key: bars[dim][key] for key in sorted(bars[dim])} for dim in sorted(bars)
+    }
+    if with_representatives:
+        persistence.persistent_cycles = {
+            dim: {key: dict(sorted(cycles[dim][key].items())) for key in sorted(cycles[dim])}
+            for dim in sorted(cycles)
+        }
+    return persistence, rips_complex
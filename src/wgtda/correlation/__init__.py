@@ -1,4 +1,30 @@
+from .cache import cached_correlation, correlation_cache_key
 from .computation import (compute_distance_correlation_matrix,
                           compute_wto_matrix)
+from .linear import (compute_biweight_matrix, compute_pearson_matrix,
+                     compute_spearman_matrix)
+from .registry import (get_preprocessor, preprocessor_names,
+                       register_preprocessor)
+from .significance import (benjamini_hochberg, distance_correlation_pvalues,
+                           significance_filter, significant_pairs,
+                           sparsify_distance_matrix)
+from .store import CorrelationStore
 
-__all__ = ["compute_distance_correlation_matrix", "compute_wto_matrix"]
+__all__ = [
+    "CorrelationStore",
+    "benjamini_hochberg",
+    "cached_correlation",
+    "correlation_cache_key",
+    "compute_biweight_matrix",
+    "compute_distance_correlation_matrix",
+    "compute_pearson_matrix",
+    "compute_spearman_matrix",
+    "compute_wto_matrix",
+    "distance_correlation_pvalues",
+    "get_preprocessor",
+    "preprocessor_names",
+    "register_preprocessor",
+    "significance_filter",
+    "significant_pairs",
+    "sparsify_distance_matrix",
+]
@@ -0,0 +1,153 @@
+import hashlib
+import os
+from typing import Callable, List, Optional
+
+import numpy as np
+
+# Default size limit of a correlation cache directory (8 GiB)
+DEFAULT_CACHE_BYTES = 8 * 1024**3
+
+
+def correlation_cache_key(gene_exp_arr: np.ndarray, genes: List[str], method: str) -> str:
+    """
+    Compute the content address of a correlation matrix.
+
+    Parameters:
+    - gene_exp_arr: np.ndarray, the filtered samples x genes expression array.
+    - genes: List[str], the ordered gene names of the array's columns.
+    - method: str, the preprocessing method, e.g. 'dc' or 'stom'.
+
+    Returns:
+    - str, a hex digest identifying the matrix.
+    """
+    gene_exp_arr = np.ascontiguousarray(gene_exp_arr)
+    digest = hashlib.sha256()
+    digest.update(method.encode())
+    digest.update(b"\0")
+    digest.update(str((gene_exp_arr.dtype.str, gene_exp_arr.shape)).encode())
+    digest.update(b"\0")
+    digest.update("\n".join(map(str, genes)).encode())
+    digest.update(b"\0")
+    digest.update(gene_exp_arr.data)
+    return digest.hexdigest()
+
+
+def load_cached_matrix(cache_dir: str, key: str) -> Optional[np.memmap]:
+    """
+    Load a cached matrix as a read-only memory map, or None on a cache miss.
+
+    Parameters:
+    - cache_dir: str, the cache directory.
+    - key: str, the content address from correlation_cache_key.
+
+    Returns:
+    - np.memmap or None
+    """
+    path = os.path.join(cache_dir, key + ".npy")
+    try:
+        matrix = np.load(path, mmap_mode="r")
+    except (FileNotFoundError, ValueError):
+        return None
+
+    # Mark the entry as most recently used
+    os.utime(path)
+    return matrix
+
+
+def save_cached_matrix(
+    cache_dir: str, key: str, matrix: np.ndarray, max_bytes: int = DEFAULT_CACHE_BYTES
+) -> str:
+    """
+    Store a matrix in the cache and evict least recently used entries beyond max_bytes.
+
+    Parameters:
+    - cache_dir: str, the cache directory, created if missing.
+    - key: str, the content address from correlation_cache_key.
+    - matrix: np.ndarray, the matrix to store.
+    - max_bytes: int, size limit of the cache directory.
+
+    Returns:
+    - str, the path of the stored .npy file.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, key + ".npy")
+
+    # Write to a temporary file first so readers never see a partial matrix
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp_path, "wb") as file:
+        np.save(file, np.ascontiguousarray(matrix))
+    os.replace(tmp_path, path)
+
+    evict_cache(cache_dir, max_bytes, keep=path)
+    return path
+
+
+def evict_cache(cache_dir: str, max_bytes: int, keep: Optional[str] = None):
+    """
+    Delete the least recently used cached matrices until the directory fits in max_bytes.
+
+    Parameters:
+    - cache_dir: str, the cache directory.
+    - max_bytes: int, size limit of the cache directory.
+    - keep: str, optional, a path that must not be evicted.
+    """
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith(".npy"):
+            continue
+        path = os.path.join(cache_dir, name)
+        stat = os.stat(path)
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        os.remove(path)
+        total -= size
+
+
+def cached_correlation(
+    func: Callable[..., np.ndarray],
+    gene_exp_arr: np.ndarray,
+    genes: List[str],
+    method: str,
+    cache_dir: Optional[str],
+    max_bytes: int = DEFAULT_CACHE_BYTES,
+    **kwargs,
+) -> np.ndarray:
+    """
+    Return a correlation matrix from the on-disk cache, computing and storing it on a miss.
+
+    Cached matrices are keyed by the bytes of the filtered expression array, the
+    ordered gene list and the method, and are loaded zero-copy as read-only memory maps.
+
+    Parameters:
+    - func: Callable, the wgtda.correlation function computing the matrix.
+    - gene_exp_arr: np.ndarray, the filtered samples x genes expression array.
+    - genes: List[str], the ordered gene names of the array's columns.
+    - method: str, the preprocessing method, e.g. 'dc' or 'stom'.
+    - cache_dir: str, the cache directory. None disables caching.
+    - max_bytes: int, size limit of the cache directory.
+    - **kwargs: passed to func, e.g. n_jobs or memmap_path. They must not change
+      the values of the result; options that do (such as the float32 output of
+      memmap_path) belong in the method string.
+
+    Returns:
+    - np.ndarray, the correlation matrix.
+    """
+    if cache_dir is None:
+        return func(gene_exp_arr=gene_exp_arr, **kwargs)
+
+    key = correlation_cache_key(gene_exp_arr, genes, method)
+    matrix = load_cached_matrix(cache_dir, key)
+    if matrix is not None:
+        print("Loaded cached matrix " + key[:12])
+        return matrix
+
+    matrix = func(gene_exp_arr=gene_exp_arr, **kwargs)
+    save_cached_matrix(cache_dir, key, matrix, max_bytes)
+
+    return matrix
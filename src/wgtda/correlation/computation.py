@@ -1,64 +1,541 @@
-import dcor
+import os
+from typing import Optional
+
 import numpy as np
 
+from .parallel import TilePool, resolve_n_jobs, upper_triangle_tiles
+
+# Sample count above which method="auto" switches to the O(n log n) algorithm
+FAST_DCOR_MIN_SAMPLES = 2000
+
+# Bytes of condensed centered distance matrices up to which the naive algorithm
+# computes those of all genes once; above, every tile recomputes those of its
+# genes, holding at most _NAIVE_DCOR_TILE_BYTES of them per gene axis
+_NAIVE_DCOR_CENTERED_BYTES = 2**30
+_NAIVE_DCOR_TILE_BYTES = 2**28
+
+# Upper bound on genes x samples elements processed per batch by the fast algorithm
+_FAST_DCOR_BATCH_ELEMENTS = 2**20
 
-def compute_distance_correlation_matrix(gene_exp_arr: np.ndarray) -> np.ndarray:
+
+def _centered_distance_rows(
+    gene_exp_arr: np.ndarray, weights: Optional[np.ndarray] = None
+) -> np.ndarray:
     """
-    Compute the distance correlation matrix for a given DataFrame.
+    Double-center the sample-distance matrix of every gene once.
+
+    Each gene's n x n centered matrix is symmetric, so only its upper triangle
+    (diagonal included) is kept. Off-diagonal entries are scaled by sqrt(2) so
+    that the dot product of two rows equals the sum over the full matrices.
+
+    With weights, sample i stands for weights[i] copies of itself, as in a
+    bootstrap resample: the means are weighted and entry (i, j) is scaled by
+    sqrt(weights[i] * weights[j]), so the rows give the distance covariances of
+    the resample without materialising its duplicated samples.
 
     Parameters:
-    - df: np.ndarray input data.
+    - gene_exp_arr: np.ndarray, samples x genes expression array.
+    - weights: np.ndarray, optional, positive multiplicity of every sample.
 
     Returns:
-    - dist_corr_matrix: np.ndarray, the distance correlation matrix.
+    - centered: np.ndarray, genes x n(n+1)/2 array of condensed centered matrices.
     """
-    num_genes = gene_exp_arr.shape[1]
-    dist_matrix = np.zeros((num_genes, num_genes))
+    num_samples, num_genes = gene_exp_arr.shape
+    rows, cols = np.triu_indices(num_samples)
+    scale = np.where(rows == cols, 1.0, np.sqrt(2.0))
+    if weights is not None:
+        weights = np.asarray(weights, dtype=np.float64)
+        scale *= np.sqrt(weights[rows] * weights[cols])
+        weights = weights / weights.sum()
+
+    centered = np.empty((num_genes, rows.size))
+    for g in range(num_genes):
+        x = gene_exp_arr[:, g]
+        dist = np.abs(x[:, None] - x[None, :])
+        if weights is None:
+            row_mean = dist.mean(axis=1)
+            grand_mean = row_mean.mean()
+        else:
+            row_mean = dist @ weights
+            grand_mean = row_mean @ weights
+        dist -= row_mean[:, None]
+        dist -= row_mean[None, :]
+        dist += grand_mean
+        centered[g] = dist[rows, cols] * scale
+
+    return centered
+
+
+def _centered_tile(arrays: dict, start: int, stop: int):
+    """
+    Tile worker: double-center the distance matrices of genes [start, stop) and
+    store their unnormalised distance variances.
+    """
+    centered = _centered_distance_rows(arrays["gene_exp_arr"][:, start:stop])
+    arrays["centered"][start:stop] = centered
+    arrays["dvar"][start:stop] = np.einsum("ij,ij->i", centered, centered)
+
+
+def _naive_distance_tile(
+    arrays: dict, row_start: int, row_stop: int, col_start: int, col_stop: int
+):
+    """
+    Tile worker: 1 - dCor of one gene x gene tile from unnormalised distance covariances, mirrored.
+
+    Without precomputed "centered" matrices, those of the tile's row and column
+    genes are computed here and dropped with the tile.
+    """
+    if "centered" in arrays:
+        rows = arrays["centered"][row_start:row_stop]
+        cols = arrays["centered"][col_start:col_stop]
+        dvar_rows = arrays["dvar"][row_start:row_stop]
+        dvar_cols = arrays["dvar"][col_start:col_stop]
+    else:
+        gene_exp_arr = arrays["gene_exp_arr"]
+        rows = _centered_distance_rows(gene_exp_arr[:, row_start:row_stop])
+        if (row_start, row_stop) == (col_start, col_stop):
+            cols = rows
+        else:
+            cols = _centered_distance_rows(gene_exp_arr[:, col_start:col_stop])
+        dvar_rows = np.einsum("ij,ij->i", rows, rows)
+        dvar_cols = np.einsum("ij,ij->i", cols, cols)
+
+    distance = 1 - _dcor_from_dcov(rows @ cols.T, dvar_rows, dvar_cols)
+    arrays["dist"][row_start:row_stop, col_start:col_stop] = distance
+    arrays["dist"][col_start:col_stop, row_start:row_stop] = distance.T
+
+
+def _dcor_from_dcov(dcov: np.ndarray, dvar_rows: np.ndarray, dvar_cols: np.ndarray) -> np.ndarray:
+    """
+    Turn a block of squared distance covariances into distance correlations.
+
+    Parameters:
+    - dcov: np.ndarray, block of squared distance covariances.
+    - dvar_rows: np.ndarray, squared distance variances of the block's row genes.
+    - dvar_cols: np.ndarray, squared distance variances of the block's column genes.
+
+    Returns:
+    - dcor: np.ndarray, block of distance correlations (0 where a gene is constant).
+    """
+    denominator = np.sqrt(np.outer(dvar_rows, dvar_cols))
+    dcor_sqr = np.divide(
+        dcov, denominator, out=np.zeros_like(dcov), where=denominator > 0
+    )
+    return np.sqrt(np.clip(dcor_sqr, 0.0, 1.0))
+
+
+def _fast_gene_state(gene_exp_arr: np.ndarray) -> dict:
+    """
+    Precompute the per-gene state of the fast dCov algorithm once.
+
+    Parameters:
+    - gene_exp_arr: np.ndarray, samples x genes expression array.
+
+    Returns:
+    - dict with the genes x samples arrays "values" (mean-centered expression),
+      "order" (sample sort order), "ranks" (inverse of the sort order) and
+      "row_sums" (sum_j |x_i - x_j| per sample), plus the per-gene "totals".
+    """
+    values = np.ascontiguousarray(gene_exp_arr.T)
+    values = values - values.mean(axis=1, keepdims=True)
+    num_genes, num_samples = values.shape
+
+    order = np.argsort(values, axis=1, kind="stable")
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(num_samples)[None, :], axis=1)
+
+    # Row sums of |x_i - x_j| from prefix sums over the sorted values
+    sorted_values = np.take_along_axis(values, order, axis=1)
+    prefix = np.cumsum(sorted_values, axis=1) - sorted_values
+    positions = np.arange(num_samples)
+    sorted_row_sums = (
+        sorted_values * (2 * positions - num_samples)
+        + sorted_values.sum(axis=1, keepdims=True)
+        - 2 * prefix
+    )
+    row_sums = np.empty_like(values)
+    np.put_along_axis(row_sums, order, sorted_row_sums, axis=1)
+
+    return {
+        "values": values,
+        "order": order,
+        "ranks": ranks,
+        "row_sums": row_sums,
+        "totals": row_sums.sum(axis=1),
+    }
+
+
+def _dominance_sums(ranks: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """
+    For every position p of each row, sum the weights of the positions q < p with ranks[q] > ranks[p].
+
+    The sums are built bottom-up over merge-sort levels: at each level the right
+    half of every block looks up the left half of the same block, which is a
+    single sort and searchsorted over all rows at once.
+
+    Parameters:
+    - ranks: np.ndarray, rows x n integer array, each row a permutation of 0..n-1.
+    - weights: np.ndarray, k x rows x n array of weights to accumulate.
+
+    Returns:
+    - sums: np.ndarray, k x rows x n array of dominance sums.
+    """
+    num_weights, num_rows, n = weights.shape
+    sums = np.zeros_like(weights)
+    positions = np.arange(n)
+    row_ids = np.arange(num_rows)[:, None]
+
+    half = 1
+    while half < n:
+        block = positions // (2 * half)
+        left = (positions // half) % 2 == 0
+        right = ~left
+        num_left = int(left.sum())
+
+        base = (row_ids * (block[-1] + 1) + block[None, :]) * n
+        left_keys = (base[:, left] + ranks[:, left]).ravel()
+        sort = np.argsort(left_keys)
+        left_keys = left_keys[sort]
+
+        # Keys are row-major, so every row keeps its own cumulative sums
+        cumulative = np.zeros((num_weights, num_rows, num_left + 1))
+        cumulative[:, :, 1:] = np.cumsum(
+            weights[:, :, left].reshape(num_weights, -1)[:, sort].reshape(
+                num_weights, num_rows, num_left
+            ),
+            axis=2,
+        )
+        cumulative = cumulative.reshape(num_weights, -1)
+
+        right_base = base[:, right]
+        first_greater = np.searchsorted(
+            left_keys, (right_base + ranks[:, right]).ravel(), side="right"
+        )
+        block_end = np.searchsorted(left_keys, (right_base + n).ravel(), side="left")
+        row_offset = np.repeat(np.arange(num_rows), right_base.shape[1])
+        sums[:, :, right] += (
+            cumulative[:, block_end + row_offset]
+            - cumulative[:, first_greater + row_offset]
+        ).reshape(num_weights, num_rows, -1)
+
+        half *= 2
+
+    return sums
+
+
+def _fast_cross_terms(state: dict, gene: int, others: np.ndarray) -> np.ndarray:
+    """
+    Compute sum_ij |x_i - x_j| |y_i - y_j| between one gene and a batch of genes in O(n log n) each.
+
+    Parameters:
+    - state: dict, per-gene state from _fast_gene_state.
+    - gene: int, index of the x gene.
+    - others: np.ndarray, indices of the y genes.
+
+    Returns:
+    - np.ndarray, one cross term per gene in others.
+    """
+    order = state["order"][gene]
+    x = state["values"][gene, order]
+    y = state["values"][others][:, order]
+    num_samples = x.size
+
+    # sum over q < p of (x_p - x_q)(y_p - y_q), ignoring the absolute value on y
+    signed = num_samples * (y @ x) - x.sum() * y.sum(axis=1)
 
-    for i in range(num_genes):
-        for j in range(i + 1, num_genes):
-            dist_matrix[i, j] = dcor.distance_correlation(
-                gene_exp_arr[:, i], gene_exp_arr[:, j]
+    # Correct the pairs where y decreases while x increases
+    xy = x * y
+    weights = np.stack([np.ones_like(y), y, np.broadcast_to(x, y.shape), xy])
+    count, sum_y, sum_x, sum_xy = _dominance_sums(
+        state["ranks"][others][:, order], weights
+    )
+    discordant = (xy * count - x * sum_y - y * sum_x + sum_xy).sum(axis=1)
+
+    return 2 * signed - 4 * discordant
+
+
+def _fast_dcov(state: dict, gene: int, others: np.ndarray) -> np.ndarray:
+    """
+    Squared distance covariances between one gene and a batch of genes with the fast algorithm.
+    """
+    num_samples = state["values"].shape[1]
+    cross = _fast_cross_terms(state, gene, others)
+    return (
+        cross / num_samples**2
+        - 2 * (state["row_sums"][others] @ state["row_sums"][gene]) / num_samples**3
+        + state["totals"][gene] * state["totals"][others] / num_samples**4
+    )
+
+
+def _fast_distance_tile(
+    arrays: dict, row_start: int, row_stop: int, col_start: int, col_stop: int
+):
+    """
+    Tile worker: 1 - dCor of one gene x gene tile with the fast algorithm, mirrored.
+    """
+    num_samples = arrays["values"].shape[1]
+    batch = max(1, _FAST_DCOR_BATCH_ELEMENTS // num_samples)
+    dvar = arrays["dvar"]
+
+    for gene in range(row_start, row_stop):
+        for start in range(max(gene + 1, col_start), col_stop, batch):
+            others = np.arange(start, min(start + batch, col_stop))
+            dcov = _fast_dcov(arrays, gene, others)
+            distance = 1 - _dcor_from_dcov(dcov[None, :], dvar[gene : gene + 1], dvar[others])[0]
+            arrays["dist"][gene, others] = distance
+            arrays["dist"][others, gene] = distance
+
+
+def _fast_dvar(state: dict) -> np.ndarray:
+    """
+    Squared distance variances of every gene, which have a closed form once the row sums are known.
+    """
+    values, row_sums, totals = state["values"], state["row_sums"], state["totals"]
+    num_samples = values.shape[1]
+    cross = 2 * num_samples * np.sum(values**2, axis=1) - 2 * values.sum(axis=1) ** 2
+    return (
+        cross / num_samples**2
+        - 2 * np.sum(row_sums**2, axis=1) / num_samples**3
+        + totals**2 / num_samples**4
+    )
+
+
+def _naive_distances(gene_exp_arr: np.ndarray, dist, tile_size: int, n_jobs: int) -> np.ndarray:
+    """
+    Fill the distance matrix from double-centered distance matrices.
+
+    If the condensed centered matrices of all genes fit _NAIVE_DCOR_CENTERED_BYTES,
+    every gene's is computed once and shared by the workers. Otherwise every
+    tile recomputes those of its own genes, with tiles small enough for one
+    tile's genes to fit _NAIVE_DCOR_TILE_BYTES, so memory does not grow with the
+    number of genes; the recomputation costs about 1 / tile_size of the products.
+    """
+    num_samples, num_genes = gene_exp_arr.shape
+    condensed = num_samples * (num_samples + 1) // 2
+    outputs = {"dist": dist}
+    if 8 * num_genes * condensed <= _NAIVE_DCOR_CENTERED_BYTES:
+        outputs["centered"] = (num_genes, condensed), np.float64
+        outputs["dvar"] = (num_genes,), np.float64
+    else:
+        tile_size = max(1, min(tile_size, _NAIVE_DCOR_TILE_BYTES // (8 * condensed)))
+
+    with TilePool(n_jobs, inputs={"gene_exp_arr": gene_exp_arr}, outputs=outputs) as pool:
+        if "centered" in outputs:
+            pool.map(
+                _centered_tile,
+                [(s, min(s + tile_size, num_genes)) for s in range(0, num_genes, tile_size)],
             )
+        pool.map(_naive_distance_tile, upper_triangle_tiles(num_genes, tile_size))
+        dist_matrix = pool.result("dist")
+
+    return dist_matrix
+
+
+def _fast_distances(gene_exp_arr: np.ndarray, dist, tile_size: int, n_jobs: int) -> np.ndarray:
+    """
+    Fill the distance matrix with the O(n log n) univariate algorithm.
+    """
+    num_genes = gene_exp_arr.shape[1]
+    state = _fast_gene_state(gene_exp_arr)
+    state["dvar"] = _fast_dvar(state)
+
+    with TilePool(n_jobs, inputs=state, outputs={"dist": dist}) as pool:
+        pool.map(_fast_distance_tile, upper_triangle_tiles(num_genes, tile_size))
+        dist_matrix = pool.result("dist")
+
+    return dist_matrix
+
+
+def _output_matrix(num_genes: int, dtype, memmap_path: Optional[str]):
+    """
+    The output of a tiled computation: a (shape, dtype) spec for TilePool, or a
+    .npy memory map created at memmap_path.
+    """
+    if memmap_path is None:
+        return (num_genes, num_genes), dtype
+    return np.lib.format.open_memmap(
+        memmap_path, mode="w+", dtype=dtype, shape=(num_genes, num_genes)
+    )
+
+
+def compute_distance_correlation_matrix(
+    gene_exp_arr: np.ndarray,
+    method: str = "auto",
+    tile_size: int = 256,
+    n_jobs: int = 1,
+    memmap_path: Optional[str] = None,
+    dtype=None,
+) -> np.ndarray:
+    """
+    Compute the distance correlation matrix for a given gene expression array.
+
+    Two exact algorithms are available:
+    - "naive": every gene's sample-distance matrix is double-centered, after
+      which all pairwise distance covariances are obtained as blocked matrix
+      products over tiles of the upper triangle. O(n^2) per pair; the centered
+      matrices are kept for all genes while they fit 1 GB, and otherwise
+      recomputed per tile so memory is bounded by the tiles in flight.
+    - "fast": the univariate O(n log n) distance covariance algorithm. Per-gene sort
+      orders and row sums are precomputed once and reused for every pair, and
+      memory is O(n) per gene.
+    "auto" uses the naive algorithm up to FAST_DCOR_MIN_SAMPLES samples and the fast one above.
+
+    Every tile is converted to 1 - dCor and written (with its mirror) straight into
+    the output, so no intermediate gene x gene matrices are allocated. With a
+    memmap_path the output is a .npy memory map filled tile by tile, so memory
+    stays bounded by the tiles in flight.
+
+    Parameters:
+    - gene_exp_arr: np.ndarray, samples x genes input data.
+    - method: str, "auto", "naive" or "fast".
+    - tile_size: int, number of genes per tile of the upper triangle.
+    - n_jobs: int, number of worker processes; the inputs and the output live
+      in shared memory and each worker fills its own tiles.
+    - memmap_path: str, optional, path of a .npy file to fill instead of an in-memory matrix.
+    - dtype: optional, dtype of the output. Defaults to float32 with a memmap_path and float64 otherwise.
 
-    # Symmetrize the matrix and set diagonal elements to 1
-    dist_matrix = dist_matrix + dist_matrix.T + np.eye(num_genes)
+    Returns:
+    - dist_corr_matrix: np.ndarray, the distance correlation matrix (1 - dCor),
+      an np.memmap if memmap_path is given.
+    """
+    gene_exp_arr = np.asarray(gene_exp_arr, dtype=np.float64)
+    num_samples, num_genes = gene_exp_arr.shape
+    n_jobs = resolve_n_jobs(n_jobs)
+    # Make sure there are enough tiles to keep every worker busy
+    tile_size = max(1, min(tile_size, -(-num_genes // n_jobs)))
+    if dtype is None:
+        dtype = np.float64 if memmap_path is None else np.float32
+
+    if method == "auto":
+        method = "naive" if num_samples <= FAST_DCOR_MIN_SAMPLES else "fast"
+    if method not in ["naive", "fast"]:
+        raise ValueError(
+            "Unsupported distance correlation method. Supported methods are: 'auto', 'naive', 'fast'"
+        )
+
+    dist = _output_matrix(num_genes, dtype, memmap_path)
+    if method == "naive":
+        dist_corr_matrix = _naive_distances(gene_exp_arr, dist, tile_size, n_jobs)
+    else:
+        dist_corr_matrix = _fast_distances(gene_exp_arr, dist, tile_size, n_jobs)
 
-    # Convert to distance measure
-    dist_corr_matrix = 1 - dist_matrix
+    # Exact zero diagonal
+    np.fill_diagonal(dist_corr_matrix, 0.0)
+    if memmap_path is not None:
+        dist_corr_matrix.flush()
 
     return dist_corr_matrix
 
 
-def compute_wto_matrix(gene_exp_arr: np.ndarray)-> np.ndarray:
+def _wto_block(
+    adjacency_matrix: np.ndarray, connectivity: np.ndarray, rows: slice, cols: slice
+) -> np.ndarray:
+    """
+    Compute one rows x cols block of the wTO matrix with whole-matrix operations.
+
+    Parameters:
+    - adjacency_matrix: np.ndarray, the full adjacency matrix.
+    - connectivity: np.ndarray, absolute row sums of the adjacency matrix.
+    - rows: slice, rows of the block.
+    - cols: slice, columns of the block.
+
+    Returns:
+    - block: np.ndarray, the wTO values of the block (diagonal entries left as computed).
+    """
+    adjacency_block = adjacency_matrix[rows, cols]
+
+    # The adjacency matrix is symmetric, so read the columns as contiguous rows
+    block = adjacency_matrix[rows, :] @ adjacency_matrix[cols, :].T
+    block += adjacency_block
+
+    min_ki_kj = np.minimum(connectivity[rows, None], connectivity[None, cols])
+    min_ki_kj += 1
+    min_ki_kj -= np.abs(adjacency_block)
+
+    block /= min_ki_kj
+    return block
+
+
+def _wto_tile(arrays: dict, row_start: int, row_stop: int, col_start: int, col_stop: int):
+    """
+    Tile worker: wTO values of one gene x gene tile, mirrored.
+    """
+    block = _wto_block(
+        arrays["adjacency"],
+        arrays["connectivity"],
+        slice(row_start, row_stop),
+        slice(col_start, col_stop),
+    )
+    arrays["wto"][row_start:row_stop, col_start:col_stop] = block
+    arrays["wto"][col_start:col_stop, row_start:row_stop] = block.T
+
+
+def compute_wto_matrix(
+    gene_exp_arr: np.ndarray,
+    block_size: int = None,
+    n_jobs: int = 1,
+    memmap_path: Optional[str] = None,
+    dtype=None,
+) -> np.ndarray:
     """
     Compute the Signed Weighted Topological Overlap (wTO) matrix.
 
+    The connectivity vector and A @ A are computed once for the whole matrix and
+    the min-connectivity denominator is formed by broadcasting. In blocked mode
+    the matrix is filled tile by tile so that only the adjacency matrix, the
+    output and one tile of temporaries are held at a time. With a memmap_path
+    both the adjacency matrix (in a temporary file) and the output are memory
+    maps and the matrix is always filled tile by tile.
+
     Parameters:
-    - df: np.ndarray, input data.
+    - gene_exp_arr: np.ndarray, input data.
+    - block_size: int, optional, number of genes per tile. None computes the
+      whole matrix at once unless n_jobs > 1 or memmap_path is given.
+    - n_jobs: int, number of worker processes for both the adjacency and the wTO stage.
+    - memmap_path: str, optional, path of a .npy file to fill instead of an in-memory matrix.
+    - dtype: optional, dtype of the output. Defaults to float32 with a memmap_path and float64 otherwise.
 
     Returns:
-    - wto_matrix: np.ndarray, Signed Topological Overlap matrix
+    - wto_matrix: np.ndarray, Signed Topological Overlap matrix,
+      an np.memmap if memmap_path is given.
     """
-    adjacency_matrix = compute_distance_correlation_matrix(gene_exp_arr=gene_exp_arr)
+    if dtype is None:
+        dtype = np.float64 if memmap_path is None else np.float32
+    adjacency_path = None if memmap_path is None else memmap_path + ".adjacency.tmp"
+    adjacency_matrix = compute_distance_correlation_matrix(
+        gene_exp_arr=gene_exp_arr, n_jobs=n_jobs, memmap_path=adjacency_path, dtype=dtype
+    )
 
     num_genes = adjacency_matrix.shape[0]
-    wto_matrix = np.zeros((num_genes, num_genes))
-
-    for i in range(num_genes):
-        for j in range(num_genes):
-            if i != j:
-                min_ki_kj = (
-                    min(
-                        np.sum(np.abs(adjacency_matrix[i, :])),
-                        np.sum(np.abs(adjacency_matrix[j, :])),
-                    )
-                    + 1
-                    - np.abs(adjacency_matrix[i, j])
-                )
-                wto_matrix[i, j] = (
-                    np.dot(adjacency_matrix[i, :], adjacency_matrix[:, j])
-                    + adjacency_matrix[i, j]
-                ) / min_ki_kj
+    n_jobs = resolve_n_jobs(n_jobs)
+
+    try:
+        if block_size is None and n_jobs == 1 and memmap_path is None:
+            connectivity = np.sum(np.abs(adjacency_matrix), axis=1)
+            wto_matrix = _wto_block(
+                adjacency_matrix, connectivity, slice(None), slice(None)
+            )
+        else:
+            tile_size = block_size or (num_genes if memmap_path is None else 256)
+            tile_size = max(1, min(tile_size, -(-num_genes // n_jobs)))
+            connectivity = np.concatenate([
+                np.sum(np.abs(adjacency_matrix[start : start + tile_size]), axis=1)
+                for start in range(0, num_genes, tile_size)
+            ])
+            with TilePool(
+                n_jobs,
+                inputs={"adjacency": adjacency_matrix, "connectivity": connectivity},
+                outputs={"wto": _output_matrix(num_genes, dtype, memmap_path)},
+            ) as pool:
+                pool.map(_wto_tile, upper_triangle_tiles(num_genes, tile_size))
+                wto_matrix = pool.result("wto")
+    finally:
+        if adjacency_path is not None:
+            del adjacency_matrix
+            os.remove(adjacency_path)
+
+    np.fill_diagonal(wto_matrix, 0.0)
+    if memmap_path is not None:
+        wto_matrix.flush()
 
     return wto_matrix
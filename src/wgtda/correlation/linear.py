@@ -0,0 +1,166 @@
+from typing import Optional
+
+import numpy as np
+from scipy.stats import rankdata
+
+from .parallel import TilePool, resolve_n_jobs, upper_triangle_tiles
+
+
+def _unit_columns(weighted: np.ndarray) -> np.ndarray:
+    """
+    Scale every column to unit norm, leaving all-zero (constant) columns at zero.
+    """
+    norms = np.linalg.norm(weighted, axis=0)
+    return np.divide(weighted, norms, out=np.zeros_like(weighted), where=norms > 0)
+
+
+def _standardize(gene_exp_arr: np.ndarray) -> np.ndarray:
+    """
+    Center every gene and scale it to unit norm, so that Z.T @ Z is the Pearson correlation matrix.
+    """
+    return _unit_columns(gene_exp_arr - gene_exp_arr.mean(axis=0))
+
+
+def _linear_tile(arrays: dict, row_start: int, row_stop: int, col_start: int, col_stop: int):
+    """
+    Tile worker: 1 - |r| of one gene x gene tile from the standardized columns, mirrored.
+    """
+    standardized = arrays["standardized"]
+    correlation = standardized[:, row_start:row_stop].T @ standardized[:, col_start:col_stop]
+    distance = 1 - np.clip(np.abs(correlation), 0.0, 1.0)
+    arrays["dist"][row_start:row_stop, col_start:col_stop] = distance
+    arrays["dist"][col_start:col_stop, row_start:row_stop] = distance.T
+
+
+def _linear_distances(
+    standardized: np.ndarray,
+    tile_size: int,
+    n_jobs: int,
+    memmap_path: Optional[str],
+    dtype,
+) -> np.ndarray:
+    """
+    Turn standardized columns into the 1 - |r| matrix with one GEMM, or tile by tile into a memory map.
+    """
+    num_genes = standardized.shape[1]
+    n_jobs = resolve_n_jobs(n_jobs)
+    tile_size = max(1, min(tile_size, -(-num_genes // n_jobs)))
+    if dtype is None:
+        dtype = np.float64 if memmap_path is None else np.float32
+
+    if memmap_path is None and n_jobs == 1:
+        dist_matrix = standardized.T @ standardized
+        np.abs(dist_matrix, out=dist_matrix)
+        # Rounding can push |r| just above 1
+        np.minimum(dist_matrix, 1.0, out=dist_matrix)
+        np.subtract(1, dist_matrix, out=dist_matrix)
+        dist_matrix = dist_matrix.astype(dtype, copy=False)
+    else:
+        if memmap_path is None:
+            dist = (num_genes, num_genes), dtype
+        else:
+            dist = np.lib.format.open_memmap(
+                memmap_path, mode="w+", dtype=dtype, shape=(num_genes, num_genes)
+            )
+        with TilePool(n_jobs, inputs={"standardized": standardized}, outputs={"dist": dist}) as pool:
+            pool.map(_linear_tile, upper_triangle_tiles(num_genes, tile_size))
+            dist_matrix = pool.result("dist")
+
+    # Exact zero diagonal, also for constant genes
+    np.fill_diagonal(dist_matrix, 0.0)
+    if memmap_path is not None:
+        dist_matrix.flush()
+
+    return dist_matrix
+
+
+def compute_pearson_matrix(
+    gene_exp_arr: np.ndarray,
+    tile_size: int = 1024,
+    n_jobs: int = 1,
+    memmap_path: Optional[str] = None,
+    dtype=None,
+) -> np.ndarray:
+    """
+    Compute the Pearson correlation distance matrix (1 - |r|) for a given gene expression array.
+
+    All pairs come from one GEMM of the standardized expression matrix, so this
+    takes seconds where distance correlation takes minutes, at the price of only
+    seeing linear relationships. Constant genes have distance 1 to every other gene.
+
+    Parameters:
+    - gene_exp_arr: np.ndarray, samples x genes input data.
+    - tile_size: int, number of genes per tile when filling a memory map or using several jobs.
+    - n_jobs: int, number of worker processes for the tiles (the GEMM itself is multi-threaded).
+    - memmap_path: str, optional, path of a .npy file to fill instead of an in-memory matrix.
+    - dtype: optional, dtype of the output. Defaults to float32 with a memmap_path and float64 otherwise.
+
+    Returns:
+    - np.ndarray, the distance matrix (1 - |r|), an np.memmap if memmap_path is given.
+    """
+    standardized = _standardize(np.asarray(gene_exp_arr, dtype=np.float64))
+    return _linear_distances(standardized, tile_size, n_jobs, memmap_path, dtype)
+
+
+def compute_spearman_matrix(
+    gene_exp_arr: np.ndarray,
+    tile_size: int = 1024,
+    n_jobs: int = 1,
+    memmap_path: Optional[str] = None,
+    dtype=None,
+) -> np.ndarray:
+    """
+    Compute the Spearman correlation distance matrix (1 - |rho|) for a given gene expression array.
+
+    Every gene is rank-transformed (ties get their average rank) and the ranks go
+    through the same GEMM as compute_pearson_matrix, which picks up monotone
+    relationships and is robust to outlying expression values.
+
+    Parameters:
+    - gene_exp_arr: np.ndarray, samples x genes input data.
+    - tile_size, n_jobs, memmap_path, dtype: see compute_pearson_matrix.
+
+    Returns:
+    - np.ndarray, the distance matrix (1 - |rho|), an np.memmap if memmap_path is given.
+    """
+    ranks = rankdata(np.asarray(gene_exp_arr, dtype=np.float64), axis=0)
+    return _linear_distances(_standardize(ranks), tile_size, n_jobs, memmap_path, dtype)
+
+
+def compute_biweight_matrix(
+    gene_exp_arr: np.ndarray,
+    tile_size: int = 1024,
+    n_jobs: int = 1,
+    memmap_path: Optional[str] = None,
+    dtype=None,
+    max_deviations: float = 9.0,
+) -> np.ndarray:
+    """
+    Compute the biweight midcorrelation distance matrix (1 - |bicor|) for a given gene expression array.
+
+    Every gene is centered on its median and its samples are weighted by Tukey's
+    biweight, (1 - u^2)^2 with u = (x - median) / (max_deviations * MAD), so
+    samples beyond max_deviations median absolute deviations get no weight. The
+    weighted columns then go through the same GEMM as compute_pearson_matrix.
+    Genes with a zero MAD fall back to Pearson standardization, as in WGCNA.
+
+    Parameters:
+    - gene_exp_arr: np.ndarray, samples x genes input data.
+    - tile_size, n_jobs, memmap_path, dtype: see compute_pearson_matrix.
+    - max_deviations: float, number of MADs at which the biweight reaches zero.
+
+    Returns:
+    - np.ndarray, the distance matrix (1 - |bicor|), an np.memmap if memmap_path is given.
+    """
+    gene_exp_arr = np.asarray(gene_exp_arr, dtype=np.float64)
+    deviations = gene_exp_arr - np.median(gene_exp_arr, axis=0)
+    mad = np.median(np.abs(deviations), axis=0)
+
+    scaled = np.divide(
+        deviations, max_deviations * mad, out=np.zeros_like(deviations), where=mad > 0
+    )
+    weights = (1 - scaled**2) ** 2 * (np.abs(scaled) < 1)
+    weighted = deviations * weights
+    weighted[:, mad == 0] = gene_exp_arr[:, mad == 0] - gene_exp_arr[:, mad == 0].mean(axis=0)
+
+    return _linear_distances(_unit_columns(weighted), tile_size, n_jobs, memmap_path, dtype)
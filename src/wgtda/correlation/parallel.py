@@ -0,0 +1,206 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Callable, Dict, Iterable, List, Tuple, Union
+
+import numpy as np
+
+# Shared arrays attached by each pool worker, keyed by name
+_WORKER_ARRAYS: Dict[str, np.ndarray] = {}
+_WORKER_BLOCKS: List[shared_memory.SharedMemory] = []
+
+
+def resolve_n_jobs(n_jobs: int = 1) -> int:
+    """
+    Resolve an n_jobs value to a number of worker processes.
+
+    Parameters:
+    - n_jobs: int, number of processes. -1 uses every core, -2 all but one, etc.
+
+    Returns:
+    - int, the number of worker processes (at least 1).
+    """
+    if n_jobs is None or n_jobs == 0:
+        return 1
+    if n_jobs < 0:
+        return max(1, (os.cpu_count() or 1) + 1 + n_jobs)
+    return n_jobs
+
+
+def pool_context() -> multiprocessing.context.BaseContext:
+    """
+    The start method of every worker pool of wgtda.
+
+    Workers are started from a fork server where available: forking a parent
+    whose BLAS (through numpy) or other libraries have already started threads
+    can deadlock the children or leave the interpreter hanging at exit, and
+    the workers only need the names of the shared arrays. Windows has no fork
+    server, so workers are spawned there.
+
+    Returns:
+    - multiprocessing context to pass as the mp_context of a ProcessPoolExecutor.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+def upper_triangle_tiles(
+    size: int, tile_size: int
+) -> List[Tuple[int, int, int, int]]:
+    """
+    Split the upper triangle of a size x size matrix into square tiles.
+
+    Parameters:
+    - size: int, number of rows (and columns) of the matrix.
+    - tile_size: int, edge length of each tile.
+
+    Returns:
+    - list of (row_start, row_stop, col_start, col_stop) tuples with col_start >= row_start.
+    """
+    starts = range(0, size, tile_size)
+    return [
+        (i, min(i + tile_size, size), j, min(j + tile_size, size))
+        for i in starts
+        for j in starts
+        if j >= i
+    ]
+
+
+def _attach_worker_arrays(specs: Dict[str, tuple]):
+    """
+    Pool initializer: map every shared block and memory-mapped file into this worker's address space.
+    """
+    for key, (kind, name, offset, shape, dtype) in specs.items():
+        if kind == "memmap":
+            _WORKER_ARRAYS[key] = np.memmap(
+                name, dtype=dtype, mode="r+", offset=offset, shape=shape
+            )
+            continue
+        block = shared_memory.SharedMemory(name=name)
+        _WORKER_BLOCKS.append(block)
+        _WORKER_ARRAYS[key] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+
+def _run_in_worker(func: Callable, task: tuple):
+    return func(_WORKER_ARRAYS, *task)
+
+
+class TilePool:
+    """
+    A process pool whose workers share input and output arrays through shared memory.
+
+    Inputs are copied into shared memory once, so they are never pickled to the
+    workers, and tile functions write their results straight into the shared
+    outputs. Tile functions are called as ``func(arrays, *task)`` where ``arrays``
+    maps names to the shared arrays. With a single job everything runs in-process
+    on ordinary arrays.
+
+    Inputs and outputs may also be np.memmap arrays (not views of them): workers
+    reopen the file instead of copying it, so out-of-core arrays stay on disk and
+    tiles are written straight into the file.
+
+    Examples:
+    - with TilePool(4, inputs={"x": x}, outputs={"out": ((n, n), np.float64)}) as pool:
+          pool.map(_fill_tile, upper_triangle_tiles(n, 64))
+          result = pool.arrays["out"].copy()
+    """
+
+    def __init__(
+        self,
+        n_jobs: int,
+        inputs: Dict[str, np.ndarray],
+        outputs: Dict[str, Union[Tuple[tuple, type], np.memmap]],
+    ):
+        self.n_jobs = resolve_n_jobs(n_jobs)
+        self.arrays: Dict[str, np.ndarray] = {}
+        self._blocks: List[shared_memory.SharedMemory] = []
+        self._executor = None
+
+        if self.n_jobs == 1:
+            self.arrays.update(inputs)
+            for key, output in outputs.items():
+                if isinstance(output, np.memmap):
+                    self.arrays[key] = output
+                else:
+                    self.arrays[key] = np.zeros(output[0], dtype=output[1])
+            return
+
+        specs = {}
+        for key, array in {**inputs, **outputs}.items():
+            if isinstance(array, np.memmap):
+                array.flush()
+                self.arrays[key] = array
+                specs[key] = ("memmap", array.filename, array.offset, array.shape, array.dtype.str)
+            elif key in inputs:
+                self._allocate(key, array.shape, array.dtype, specs)[...] = array
+            else:
+                self._allocate(key, array[0], array[1], specs)[...] = 0
+
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.n_jobs,
+            mp_context=pool_context(),
+            initializer=_attach_worker_arrays,
+            initargs=(specs,),
+        )
+
+    def _allocate(self, key, shape, dtype, specs) -> np.ndarray:
+        dtype = np.dtype(dtype)
+        nbytes = max(1, int(np.prod(shape)) * dtype.itemsize)
+        block = shared_memory.SharedMemory(create=True, size=nbytes)
+        self._blocks.append(block)
+        specs[key] = ("shared", block.name, 0, tuple(shape), dtype.str)
+        self.arrays[key] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+        return self.arrays[key]
+
+    def map(self, func: Callable, tasks: Iterable[tuple]) -> list:
+        """
+        Run ``func(arrays, *task)`` for every task and wait for all of them.
+
+        Parameters:
+        - func: Callable, a module-level tile function.
+        - tasks: Iterable[tuple], the per-tile arguments.
+
+        Returns:
+        - list, the return values of the tile function in task order.
+        """
+        if self._executor is None:
+            return [func(self.arrays, *task) for task in tasks]
+        futures = [self._executor.submit(_run_in_worker, func, task) for task in tasks]
+        return [future.result() for future in futures]
+
+    def result(self, key: str) -> np.ndarray:
+        """
+        Return an array that outlives the pool: shared memory arrays are copied
+        out, in-process and memory-mapped arrays are returned as they are.
+
+        Parameters:
+        - key: str, name of the array.
+
+        Returns:
+        - np.ndarray
+        """
+        array = self.arrays[key]
+        if self._executor is None or isinstance(array, np.memmap):
+            return array
+        return array.copy()
+
+    def close(self):
+        """
+        Shut the workers down and release the shared memory.
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        self.arrays = {}
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,78 @@
+from typing import Callable, Dict, List, NamedTuple
+
+import numpy as np
+
+from .computation import compute_distance_correlation_matrix, compute_wto_matrix
+from .linear import (compute_biweight_matrix, compute_pearson_matrix,
+                     compute_spearman_matrix)
+
+
+class Preprocessor(NamedTuple):
+    """
+    A registered preprocessing method: the function computing the gene x gene
+    distance matrix and a one-line description for messages and --help.
+    """
+
+    func: Callable[..., np.ndarray]
+    description: str
+
+
+_PREPROCESSORS: Dict[str, Preprocessor] = {}
+
+
+def register_preprocessor(name: str, func: Callable[..., np.ndarray], description: str = ""):
+    """
+    Register a preprocessing method under a name usable with --preprocessing.
+
+    The function is called as func(gene_exp_arr=..., n_jobs=..., [memmap_path=...])
+    with the samples x genes expression array and must return a symmetric genes x
+    genes distance matrix with a zero diagonal, the input of
+    construct_vr_complex_rna_matrix. With a memmap_path it fills a float32 .npy
+    memory map at that path and returns it.
+
+    Parameters:
+    - name: str, the method name, e.g. 'pearson'. Registering a name again replaces the method.
+    - func: Callable, the function computing the distance matrix.
+    - description: str, what the method computes, e.g. 'Pearson correlation (1 - |r|)'.
+    """
+    _PREPROCESSORS[name] = Preprocessor(func, description or name)
+
+
+def get_preprocessor(name: str) -> Preprocessor:
+    """
+    Look up a registered preprocessing method.
+
+    Parameters:
+    - name: str, the method name.
+
+    Returns:
+    - Preprocessor, the function and description of the method.
+    """
+    if name not in _PREPROCESSORS:
+        raise ValueError(
+            "Unsupported or Unknown preprocessing method. Supported methods are: "
+            + ", ".join(preprocessor_names())
+        )
+    return _PREPROCESSORS[name]
+
+
+def preprocessor_names() -> List[str]:
+    """
+    The names of the registered preprocessing methods, in registration order.
+    """
+    return list(_PREPROCESSORS)
+
+
+register_preprocessor(
+    "dc", compute_distance_correlation_matrix, "distance correlation (1 - dCor)"
+)
+register_preprocessor(
+    "stom", compute_wto_matrix, "weighted signed topological overlap of distance correlations"
+)
+register_preprocessor("pearson", compute_pearson_matrix, "Pearson correlation (1 - |r|)")
+register_preprocessor(
+    "spearman", compute_spearman_matrix, "Spearman rank correlation (1 - |rho|)"
+)
+register_preprocessor(
+    "biweight", compute_biweight_matrix, "biweight midcorrelation (1 - |bicor|)"
+)
@@ -0,0 +1,226 @@
+from typing import Optional
+
+import numpy as np
+
+from .computation import FAST_DCOR_MIN_SAMPLES, _centered_distance_rows
+from .parallel import TilePool, resolve_n_jobs
+
+# Relative slack when comparing permuted with observed distance covariances,
+# so that permutations reproducing the observed statistic count as at least as large
+_TIE_TOLERANCE = 1e-10
+
+# Memory of the gather indices of one batch of permutations, shared by all tiles
+_PERMUTATION_INDEX_BYTES = 2**28
+
+
+def _permuted_condensed_index(permutation: np.ndarray) -> np.ndarray:
+    """
+    Where every entry of a condensed (upper triangle with diagonal) matrix moves when its samples are permuted.
+
+    Entry (i, j) of the permuted matrix is entry (p[i], p[j]) of the original,
+    so gathering the condensed rows with this index permutes them without
+    recomputing any distances.
+    """
+    num_samples = len(permutation)
+    rows, cols = np.triu_indices(num_samples)
+    low = np.minimum(permutation[rows], permutation[cols])
+    high = np.maximum(permutation[rows], permutation[cols])
+    return low * num_samples - low * (low - 1) // 2 + (high - low)
+
+
+def _permutation_tile(arrays: dict, start: int, stop: int, num_permutations: int):
+    """
+    Tile worker: count, for the gene pairs (i, j) with i < stop and start <= j < stop,
+    the permutations of gene j whose distance covariance with gene i reaches the observed one.
+
+    The permutations are the first num_permutations rows of the shared gather indices.
+    """
+    centered = arrays["centered"]
+    columns = centered[start:stop]
+    threshold = arrays["threshold"][:stop, start:stop]
+    exceed = arrays["exceed"][:stop, start:stop]
+    for index in arrays["indices"][:num_permutations]:
+        permuted = columns[:, index]
+        exceed += centered[:stop] @ permuted.T >= threshold
+
+
+def distance_correlation_pvalues(
+    gene_exp_arr: np.ndarray,
+    num_permutations: int = 1000,
+    seed: int = 0,
+    tile_size: int = 64,
+    n_jobs: int = 1,
+) -> np.ndarray:
+    """
+    Permutation-test p-values of the distance correlation of every gene pair.
+
+    The distance correlation of genes i and j with the samples of j permuted is
+    a dot product of i's double-centered distance matrix with j's, whose rows
+    and columns are permuted (double centering commutes with permutations). So
+    every gene's centered matrix is computed once and each permutation only
+    gathers it through an index array, after which the permuted statistics of
+    all pairs come from one matrix product per tile. The index arrays are built
+    once per permutation and shared by all tiles, in batches of
+    _PERMUTATION_INDEX_BYTES. The distance variances do not change under
+    permutation, so the distance covariances are compared directly. The same permutations are used for all pairs, so the result does
+    not depend on n_jobs.
+
+    Parameters:
+    - gene_exp_arr: np.ndarray, samples x genes input data (up to FAST_DCOR_MIN_SAMPLES
+      samples, as the centered matrices are kept in memory).
+    - num_permutations: int, number of permutations.
+    - seed: int, seed of the permutations.
+    - tile_size: int, number of genes per column tile.
+    - n_jobs: int, number of worker processes for the tiles.
+
+    Returns:
+    - pvalues: np.ndarray, symmetric genes x genes matrix of (1 + exceedances) / (1 + num_permutations),
+      with a zero diagonal.
+    """
+    gene_exp_arr = np.asarray(gene_exp_arr, dtype=np.float64)
+    num_samples, num_genes = gene_exp_arr.shape
+    if num_samples > FAST_DCOR_MIN_SAMPLES:
+        raise ValueError(
+            "The permutation test keeps the centered distance matrices of all genes in memory "
+            "and supports up to {} samples.".format(FAST_DCOR_MIN_SAMPLES)
+        )
+    n_jobs = resolve_n_jobs(n_jobs)
+    tile_size = max(1, min(tile_size, -(-num_genes // n_jobs)))
+
+    centered = _centered_distance_rows(gene_exp_arr)
+    observed = centered @ centered.T
+    rng = np.random.default_rng(seed)
+    permutations = np.stack([rng.permutation(num_samples) for _ in range(num_permutations)])
+
+    # The condensed matrices have fewer than 2^31 entries up to FAST_DCOR_MIN_SAMPLES samples
+    num_entries = centered.shape[1]
+    batch_size = max(1, min(num_permutations, _PERMUTATION_INDEX_BYTES // (4 * num_entries)))
+    starts = range(0, num_genes, tile_size)
+
+    with TilePool(
+        n_jobs,
+        inputs={
+            "centered": centered,
+            "threshold": observed - _TIE_TOLERANCE * np.abs(observed),
+        },
+        outputs={
+            "exceed": ((num_genes, num_genes), np.int64),
+            "indices": ((batch_size, num_entries), np.int32),
+        },
+    ) as pool:
+        # The workers read the indices the parent writes into the shared array, one batch per map
+        indices = pool.arrays["indices"]
+        for batch_start in range(0, num_permutations, batch_size):
+            batch = permutations[batch_start : batch_start + batch_size]
+            for row, permutation in enumerate(batch):
+                indices[row] = _permuted_condensed_index(permutation)
+            pool.map(
+                _permutation_tile,
+                [(s, min(s + tile_size, num_genes), len(batch)) for s in starts],
+            )
+        exceed = pool.result("exceed")
+
+    # Only the upper triangle was counted
+    exceed = np.triu(exceed, k=1)
+    pvalues = (exceed + exceed.T + 1) / (num_permutations + 1)
+    np.fill_diagonal(pvalues, 0.0)
+    return pvalues
+
+
+def benjamini_hochberg(pvalues: np.ndarray) -> np.ndarray:
+    """
+    Benjamini-Hochberg adjusted p-values (q-values).
+
+    Parameters:
+    - pvalues: np.ndarray, 1-D array of p-values.
+
+    Returns:
+    - qvalues: np.ndarray, the adjusted p-values in the input order; a p-value is
+      significant at false discovery rate alpha when its q-value is at most alpha.
+    """
+    pvalues = np.asarray(pvalues, dtype=np.float64)
+    order = np.argsort(pvalues)
+    ranked = pvalues[order] * len(pvalues) / np.arange(1, len(pvalues) + 1)
+    # q_(k) = min over l >= k of p_(l) m / l
+    ranked = np.minimum.accumulate(ranked[::-1])[::-1]
+    qvalues = np.empty_like(ranked)
+    qvalues[order] = np.minimum(ranked, 1.0)
+    return qvalues
+
+
+def significant_pairs(pvalues: np.ndarray, alpha: float = 0.05) -> np.ndarray:
+    """
+    The gene pairs whose p-values are significant at false discovery rate alpha (Benjamini-Hochberg).
+
+    Parameters:
+    - pvalues: np.ndarray, symmetric genes x genes p-values, e.g. from distance_correlation_pvalues.
+    - alpha: float, the false discovery rate.
+
+    Returns:
+    - significant: np.ndarray, symmetric boolean genes x genes matrix (True on the diagonal).
+    """
+    num_genes = pvalues.shape[0]
+    rows, cols = np.triu_indices(num_genes, k=1)
+    significant = np.eye(num_genes, dtype=bool)
+    significant[rows, cols] = benjamini_hochberg(pvalues[rows, cols]) <= alpha
+    significant[cols, rows] = significant[rows, cols]
+    return significant
+
+
+def sparsify_distance_matrix(
+    dist_matrix: np.ndarray, significant: np.ndarray, mode: str = "max"
+) -> np.ndarray:
+    """
+    Move the non-significant gene pairs of a distance matrix out of the way of the complex.
+
+    Parameters:
+    - dist_matrix: np.ndarray, the gene x gene distance matrix (left unchanged).
+    - significant: np.ndarray, boolean matrix of the pairs to keep, e.g. from significant_pairs.
+    - mode: str, "max" sets the other pairs to the largest distance of the matrix, so
+      they only enter at the end of the filtration, and "drop" sets them to infinity,
+      so they never enter the complex (see construct_vr_complex_rna_matrix).
+
+    Returns:
+    - np.ndarray, the sparsified float64 copy of the matrix.
+    """
+    if mode not in ["max", "drop"]:
+        raise ValueError("Unsupported sparsification mode. Supported modes are: 'max', 'drop'")
+    fill = np.max(dist_matrix) if mode == "max" else np.inf
+    return np.where(significant, np.asarray(dist_matrix, dtype=np.float64), fill)
+
+
+def significance_filter(
+    gene_exp_arr: np.ndarray,
+    dist_matrix: np.ndarray,
+    alpha: float = 0.05,
+    num_permutations: int = 1000,
+    mode: str = "max",
+    seed: int = 0,
+    n_jobs: int = 1,
+    pvalues: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    Keep only the gene pairs whose distance correlation is significant at false discovery rate alpha.
+
+    Parameters:
+    - gene_exp_arr: np.ndarray, samples x genes input data of the distance matrix.
+    - dist_matrix: np.ndarray, the gene x gene distance matrix to sparsify.
+    - alpha: float, the false discovery rate (Benjamini-Hochberg).
+    - num_permutations, seed, n_jobs: see distance_correlation_pvalues.
+    - mode: str, "max" or "drop", see sparsify_distance_matrix.
+    - pvalues: np.ndarray, optional, precomputed p-values, e.g. to try several alphas.
+
+    Returns:
+    - np.ndarray, the sparsified distance matrix.
+    """
+    if pvalues is None:
+        pvalues = distance_correlation_pvalues(gene_exp_arr, num_permutations, seed, n_jobs=n_jobs)
+    significant = significant_pairs(pvalues, alpha)
+
+    num_genes = significant.shape[0]
+    num_pairs = num_genes * (num_genes - 1) // 2
+    num_significant = (int(significant.sum()) - num_genes) // 2
+    print("Kept {} of {} gene pairs at a false discovery rate of {}".format(
+        num_significant, num_pairs, alpha
+    ))
+    return sparsify_distance_matrix(dist_matrix, significant, mode)
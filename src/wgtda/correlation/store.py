@@ -0,0 +1,334 @@
+import hashlib
+import json
+import os
+from typing import Dict, List
+
+import numpy as np
+
+from .computation import (_FAST_DCOR_BATCH_ELEMENTS, FAST_DCOR_MIN_SAMPLES,
+                          _centered_distance_rows, _dcor_from_dcov, _fast_dcov,
+                          _fast_dvar, _fast_gene_state)
+
+# Per-gene state kept by each distance correlation algorithm
+_STATE_FIELDS = {
+    "naive": ["centered", "dvar"],
+    "fast": ["values", "order", "ranks", "row_sums", "totals", "dvar"],
+}
+
+# Genes processed at a time when computing, assembling or compacting rows
+_ROW_BLOCK = 256
+
+
+def _column_digest(column: np.ndarray) -> str:
+    """
+    Content address of one gene's expression column.
+    """
+    return hashlib.sha256(np.ascontiguousarray(column, dtype=np.float64).data).hexdigest()
+
+
+class CorrelationStore:
+    """
+    Persistent, gene-keyed distance correlation matrix that grows with the gene panels it serves.
+
+    The store directory holds the matrix of every gene seen so far (matrix.npy),
+    the per-gene state of the distance correlation algorithm (the condensed
+    centered distance matrices for "naive", the sort orders and row sums for
+    "fast", plus the distance variances) and store.json with the gene names and
+    a digest of each gene's expression column. All arrays are .npy memory maps
+    with spare capacity, doubled when it runs out. The naive state takes
+    n(n+1)/2 float64 values per gene for n samples, the fast state O(n).
+
+    Requesting a panel only computes the rows of genes that are new, or whose
+    expression changed, against every stored gene, O(dG * G) instead of O(G^2),
+    and then slices the panel out of the stored matrix in the requested order.
+    The store is tied to one set of samples; expression data with another
+    number of samples starts it afresh.
+
+    Examples:
+    - store = CorrelationStore("output/dc_store")
+      dist_matrix = store.correlation(gene_exp_arr, genes)
+    """
+
+    def __init__(self, directory: str, method: str = "auto"):
+        """
+        Parameters:
+        - directory: str, the store directory, created if missing.
+        - method: str, "auto", "naive" or "fast", see compute_distance_correlation_matrix.
+          An existing store keeps its method unless another one is requested explicitly.
+        """
+        if method not in ["auto", "naive", "fast"]:
+            raise ValueError(
+                "Unsupported distance correlation method. Supported methods are: 'auto', 'naive', 'fast'"
+            )
+        self.directory = directory
+        # The requested method, resolved into self.method whenever the store starts afresh
+        self.requested_method = method
+        self.method = method
+        self.num_samples = None
+        self.genes: List[str] = []
+        self.digests: List[str] = []
+        self._index: Dict[str, int] = {}
+        self._arrays: Dict[str, np.memmap] = {}
+        os.makedirs(directory, exist_ok=True)
+
+        path = os.path.join(directory, "store.json")
+        if not os.path.exists(path):
+            return
+        with open(path, "r") as file:
+            meta = json.load(file)
+        if method not in ["auto", meta["method"]]:
+            print("Correlation store method changed to {}, starting afresh".format(method))
+            return
+
+        self.method = meta["method"]
+        self.num_samples = meta["num_samples"]
+        self.genes = meta["genes"]
+        self.digests = meta["digests"]
+        self._index = {gene: position for position, gene in enumerate(self.genes)}
+        for name in ["matrix"] + _STATE_FIELDS[self.method]:
+            self._arrays[name] = np.load(self._path(name), mmap_mode="r+")
+
+    def __len__(self) -> int:
+        return len(self.genes)
+
+    def __contains__(self, gene: str) -> bool:
+        return gene in self._index
+
+    @property
+    def capacity(self) -> int:
+        return self._arrays["matrix"].shape[0] if self._arrays else 0
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name + ".npy")
+
+    def _state_shape(self, name: str, capacity: int) -> tuple:
+        num_samples = self.num_samples
+        if name == "centered":
+            return (capacity, num_samples * (num_samples + 1) // 2)
+        if name in ["values", "order", "ranks", "row_sums"]:
+            return (capacity, num_samples)
+        return (capacity,)
+
+    def _reserve(self, size: int, count: int):
+        """
+        Grow every array to hold at least size genes, copying the first count stored ones.
+        """
+        if size <= self.capacity:
+            return
+        capacity = max(size, 2 * self.capacity, 16)
+        for name in ["matrix"] + _STATE_FIELDS[self.method]:
+            if name == "matrix":
+                shape = (capacity, capacity)
+            else:
+                shape = self._state_shape(name, capacity)
+            dtype = np.int64 if name in ["order", "ranks"] else np.float64
+
+            # Fill a temporary file first so an interrupted resize leaves the store intact
+            tmp_path = self._path(name) + ".tmp"
+            grown = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=dtype, shape=shape)
+            old = self._arrays.get(name)
+            if old is not None and count > 0:
+                for start in range(0, count, _ROW_BLOCK):
+                    stop = min(start + _ROW_BLOCK, count)
+                    if name == "matrix":
+                        grown[start:stop, :count] = old[start:stop, :count]
+                    else:
+                        grown[start:stop] = old[start:stop]
+            grown.flush()
+            del grown, old
+            self._arrays.pop(name, None)
+            os.replace(tmp_path, self._path(name))
+            self._arrays[name] = np.load(self._path(name), mmap_mode="r+")
+
+    def _reset(self, num_samples: int):
+        """
+        Empty the store for expression data of num_samples samples, resolving an "auto" method for them.
+        """
+        self.num_samples = num_samples
+        if self.requested_method == "auto":
+            self.method = "naive" if num_samples <= FAST_DCOR_MIN_SAMPLES else "fast"
+        else:
+            self.method = self.requested_method
+        self.genes, self.digests, self._index = [], [], {}
+        self._arrays = {}
+
+    def _save(self):
+        for array in self._arrays.values():
+            array.flush()
+        path = os.path.join(self.directory, "store.json")
+        tmp_path = "{}.{}.tmp".format(path, os.getpid())
+        with open(tmp_path, "w") as file:
+            json.dump(
+                {
+                    "method": self.method,
+                    "num_samples": self.num_samples,
+                    "genes": self.genes,
+                    "digests": self.digests,
+                },
+                file,
+            )
+        os.replace(tmp_path, path)
+
+    def _store_state(self, gene_exp_arr: np.ndarray, positions: np.ndarray):
+        """
+        Compute and store the per-gene state of the given expression columns.
+        """
+        for start in range(0, len(positions), _ROW_BLOCK):
+            block = positions[start : start + _ROW_BLOCK]
+            columns = gene_exp_arr[:, start : start + _ROW_BLOCK]
+            if self.method == "naive":
+                centered = _centered_distance_rows(columns)
+                self._arrays["centered"][block] = centered
+                self._arrays["dvar"][block] = np.einsum("ij,ij->i", centered, centered)
+            else:
+                state = _fast_gene_state(columns)
+                for name in ["values", "order", "ranks", "row_sums", "totals"]:
+                    self._arrays[name][block] = state[name]
+                self._arrays["dvar"][block] = _fast_dvar(state)
+
+    def _fill_rows(self, positions: np.ndarray):
+        """
+        Compute the rows (and mirrored columns) of the given genes against every stored gene.
+        """
+        matrix, dvar = self._arrays["matrix"], self._arrays["dvar"]
+        count = len(self.genes)
+
+        if self.method == "naive":
+            centered = self._arrays["centered"]
+            for start in range(0, len(positions), _ROW_BLOCK):
+                rows = positions[start : start + _ROW_BLOCK]
+                row_centered = centered[rows]
+                for col_start in range(0, count, _ROW_BLOCK):
+                    col_stop = min(col_start + _ROW_BLOCK, count)
+                    cols = np.arange(col_start, col_stop)
+                    dcov = row_centered @ centered[col_start:col_stop].T
+                    distance = 1 - _dcor_from_dcov(dcov, dvar[rows], dvar[cols])
+                    matrix[np.ix_(rows, cols)] = distance
+                    matrix[np.ix_(cols, rows)] = distance.T
+        else:
+            state = {name: self._arrays[name] for name in _STATE_FIELDS["fast"]}
+            batch = max(1, _FAST_DCOR_BATCH_ELEMENTS // self.num_samples)
+            for gene in positions:
+                for start in range(0, count, batch):
+                    others = np.arange(start, min(start + batch, count))
+                    dcov = _fast_dcov(state, gene, others)
+                    distance = 1 - _dcor_from_dcov(dcov[None, :], dvar[gene : gene + 1], dvar[others])[0]
+                    matrix[gene, others] = distance
+                    matrix[others, gene] = distance
+
+        matrix[positions, positions] = 0.0
+
+    def update(self, gene_exp_arr: np.ndarray, genes: List[str]) -> int:
+        """
+        Add the genes of an expression array to the store, computing only what is missing.
+
+        Parameters:
+        - gene_exp_arr: np.ndarray, samples x genes expression array.
+        - genes: List[str], the gene names of the array's columns.
+
+        Returns:
+        - int, the number of genes whose rows were computed.
+        """
+        gene_exp_arr = np.asarray(gene_exp_arr, dtype=np.float64)
+        num_samples = gene_exp_arr.shape[0]
+        if self.num_samples is not None and num_samples != self.num_samples:
+            print("Correlation store: the number of samples changed, starting afresh")
+            self._reset(num_samples)
+        if self.num_samples is None:
+            self._reset(num_samples)
+
+        digests = [_column_digest(gene_exp_arr[:, i]) for i in range(len(genes))]
+        missing = [
+            i for i, gene in enumerate(genes)
+            if gene not in self._index or self.digests[self._index[gene]] != digests[i]
+        ]
+        if not missing:
+            return 0
+
+        stored = len(self.genes)
+        positions = []
+        for i in missing:
+            gene = genes[i]
+            if gene in self._index:
+                self.digests[self._index[gene]] = digests[i]
+            else:
+                self._index[gene] = len(self.genes)
+                self.genes.append(gene)
+                self.digests.append(digests[i])
+            positions.append(self._index[gene])
+        positions = np.asarray(positions, dtype=np.int64)
+
+        self._reserve(len(self.genes), stored)
+        self._store_state(gene_exp_arr[:, missing], positions)
+        self._fill_rows(positions)
+        self._save()
+        return len(missing)
+
+    def matrix(self, genes: List[str]) -> np.ndarray:
+        """
+        Assemble the distance correlation matrix (1 - dCor) of a gene panel in panel order.
+
+        Parameters:
+        - genes: List[str], the genes of the panel, all present in the store.
+
+        Returns:
+        - np.ndarray, the len(genes) x len(genes) matrix.
+        """
+        missing = [gene for gene in genes if gene not in self._index]
+        if missing:
+            raise ValueError(
+                "Genes missing from the correlation store: " + ", ".join(map(str, missing[:10]))
+            )
+        positions = np.asarray([self._index[gene] for gene in genes], dtype=np.int64)
+        stored = self._arrays["matrix"]
+
+        panel = np.empty((len(positions), len(positions)))
+        for start in range(0, len(positions), _ROW_BLOCK):
+            panel[start : start + _ROW_BLOCK] = stored[positions[start : start + _ROW_BLOCK]][:, positions]
+        return panel
+
+    def correlation(self, gene_exp_arr: np.ndarray, genes: List[str]) -> np.ndarray:
+        """
+        Update the store with a gene panel and return its distance correlation matrix.
+
+        Parameters:
+        - gene_exp_arr: np.ndarray, samples x genes expression array of the panel.
+        - genes: List[str], the gene names of the array's columns.
+
+        Returns:
+        - np.ndarray, the panel's distance correlation matrix (1 - dCor).
+        """
+        computed = self.update(gene_exp_arr, genes)
+        print("Correlation store: computed {} of {} genes, {} stored".format(
+            computed, len(genes), len(self.genes)
+        ))
+        return self.matrix(genes)
+
+    def remove(self, genes: List[str]):
+        """
+        Drop genes from the store, compacting the rows of the remaining ones.
+
+        Parameters:
+        - genes: List[str], the genes to drop; unknown genes are ignored.
+        """
+        dropped = {self._index[gene] for gene in genes if gene in self._index}
+        if not dropped:
+            return
+        keep = np.asarray(
+            [position for position in range(len(self.genes)) if position not in dropped],
+            dtype=np.int64,
+        )
+
+        # Rows move to lower positions only, so compacting in increasing order never
+        # overwrites a row that is still to be read
+        for start in range(0, len(keep), _ROW_BLOCK):
+            rows = keep[start : start + _ROW_BLOCK]
+            stop = start + len(rows)
+            self._arrays["matrix"][start:stop, : len(keep)] = self._arrays["matrix"][rows][:, keep]
+            for name in _STATE_FIELDS[self.method]:
+                self._arrays[name][start:stop] = self._arrays[name][rows]
+
+        self.genes = [self.genes[position] for position in keep]
+        self.digests = [self.digests[position] for position in keep]
+        self._index = {gene: position for position, gene in enumerate(self.genes)}
+        self._save()
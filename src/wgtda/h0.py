@@ -0,0 +1,190 @@
+from typing import Optional
+
+import numpy as np
+from matilda import FilteredSimplicialComplex, PersistentHomologyComputer
+from numpy import ndarray
+
+
+def minimum_spanning_tree(preprocessing: ndarray) -> tuple:
+    """
+    Compute a minimum spanning forest of a dense distance matrix with Prim's algorithm.
+
+    Each step adds the closest vertex outside the tree and relaxes the distances of
+    the remaining vertices with one vectorized pass over its row, so the matrix is
+    read row by row (memory maps work) in O(n^2) time and O(n) extra memory.
+    Vertices only reachable through infinite distances start a new tree.
+
+    Parameters:
+    - preprocessing : ndarray
+        A square distance matrix.
+
+    Returns:
+    - tuple(ndarray, ndarray, ndarray)
+        The endpoints (parent, child) and weights of the n - 1 forest edges. Edges
+        joining separate trees have parent -1 and an infinite weight.
+    """
+    num_genes = preprocessing.shape[0]
+    in_tree = np.zeros(num_genes, dtype=bool)
+    best = np.full(num_genes, np.inf)
+    parent = np.full(num_genes, -1)
+
+    parents = np.empty(max(num_genes - 1, 0), dtype=np.int64)
+    children = np.empty(max(num_genes - 1, 0), dtype=np.int64)
+    weights = np.empty(max(num_genes - 1, 0))
+
+    # Edges are ordered by weight and then by their (lower, higher) vertex pair, the
+    # order of the complex, so that ties resolve to the tree the reduction uses
+    def pair_codes(ends, others):
+        return np.minimum(ends, others) * num_genes + np.maximum(ends, others)
+
+    vertices = np.arange(num_genes)
+    vertex = 0
+    for step in range(num_genes):
+        if step > 0:
+            vertex = int(np.argmin(best))
+            if in_tree[vertex]:
+                # Everything left is disconnected from the tree
+                vertex = int(np.flatnonzero(~in_tree)[0])
+                parent[vertex] = -1
+            else:
+                tied = np.flatnonzero(best == best[vertex])
+                if len(tied) > 1:
+                    vertex = int(tied[np.argmin(pair_codes(parent[tied], tied))])
+            parents[step - 1] = parent[vertex]
+            children[step - 1] = vertex
+            weights[step - 1] = best[vertex] if parent[vertex] >= 0 else np.inf
+
+        in_tree[vertex] = True
+        best[vertex] = np.inf
+        row = np.asarray(preprocessing[vertex], dtype=np.float64)
+        closer = (row < best) | (
+            (row == best) & (pair_codes(vertex, vertices) < pair_codes(parent, vertices))
+        )
+        closer &= ~in_tree
+        best[closer] = row[closer]
+        parent[closer] = vertex
+
+    return parents, children, weights
+
+
+def h0_persistence(preprocessing: ndarray, max_radius: Optional[float] = None) -> dict:
+    """
+    Compute the Betti 0 persistence of a Vietoris-Rips filtration from its minimum spanning tree.
+
+    H0 of a Vietoris-Rips filtration is single-linkage clustering: every vertex is
+    born at 0 and the minimum spanning tree edges, taken in increasing order, are
+    exactly the merges. Every component is labelled by its oldest (lowest index)
+    vertex and at each merge the younger component dies (elder rule), which is the
+    pairing the boundary matrix reduction produces.
+
+    Parameters:
+    - preprocessing : ndarray
+        A square distance matrix.
+    - max_radius : float, optional
+        Only merges at distances up to this radius happen; components still
+        separate at the radius live forever.
+
+    Returns:
+    - dict with the arrays "vertex" (root of the dying component), "partner" (the
+      other vertex of the reduced merging edge, in the surviving component) and
+      "death" (merge distance) of the finite bars in merge order, and "survivors"
+      (roots of the components that never die).
+    """
+    max_radius = np.inf if max_radius is None else max_radius
+    num_genes = preprocessing.shape[0]
+    parents, children, weights = minimum_spanning_tree(preprocessing)
+
+    # Merge order: by distance, ties in the order of the edges (lowest vertex pair first)
+    low, high = np.minimum(parents, children), np.maximum(parents, children)
+    order = np.lexsort((high, low, weights))
+    # Genes at an infinite distance (e.g. dropped pairs) never merge
+    order = order[(weights[order] <= max_radius) & np.isfinite(weights[order]) & (parents[order] >= 0)]
+
+    # Replay the boundary matrix reduction on the tree edges: an edge's column {u, v}
+    # repeatedly swaps its largest vertex for the partner of the column that already
+    # killed it, until the largest vertex is alive. That vertex is the root of the
+    # younger component and dies; the column is the bar's representative. Edges
+    # outside the tree reduce to zero and never change the other columns.
+    partner_of = np.full(num_genes, -1)
+    dying, partners = [], []
+    for edge in order:
+        low, high = sorted((int(parents[edge]), int(children[edge])))
+        while partner_of[high] >= 0:
+            low, high = sorted((low, int(partner_of[high])))
+        partner_of[high] = low
+        dying.append(high)
+        partners.append(low)
+
+    return {
+        "vertex": np.asarray(dying, dtype=np.int64),
+        "partner": np.asarray(partners, dtype=np.int64),
+        "death": weights[order],
+        "survivors": np.flatnonzero(partner_of < 0),
+    }
+
+
+def vertex_complex(num_genes: int) -> FilteredSimplicialComplex:
+    """
+    A filtered complex of only the vertices, all born at 0, for runs that need no higher simplices.
+    """
+    rips_complex = FilteredSimplicialComplex()
+    rips_complex.dimension = 0
+    rips_complex.simplices = [[vertex] for vertex in range(num_genes)]
+    rips_complex.simplices_indices = list(range(num_genes))
+    rips_complex.appears_at = [0.0] * num_genes
+    return rips_complex
+
+
+def inject_h0(
+    persistence: PersistentHomologyComputer,
+    rips_complex: FilteredSimplicialComplex,
+    h0: dict,
+    with_representatives: bool = True,
+):
+    """
+    Store Betti 0 bars (and representatives) from h0_persistence in a persistence object.
+
+    Bars are keyed by the simplex index of the dying vertex, like matilda's, and
+    the representative of a finite bar is the reduced boundary of its merging edge;
+    a surviving component is represented by its root. Bars that are born and die
+    at the same distance are dropped.
+
+    Parameters:
+    - persistence : PersistentHomologyComputer
+        The persistence object whose dimension 0 entries are replaced.
+    - rips_complex : FilteredSimplicialComplex
+        The complex the simplex indices refer to; it must contain every vertex.
+    - h0 : dict
+        The result of h0_persistence.
+    - with_representatives : bool, default = True
+        Also store the representative cycles.
+    """
+    num_genes = len(h0["survivors"]) + len(h0["vertex"])
+    simplex_of_vertex = np.empty(num_genes, dtype=np.int64)
+    for index, simplex in enumerate(rips_complex.simplices):
+        if len(simplex) == 1:
+            simplex_of_vertex[simplex[0]] = index
+
+    bars, cycles = {}, {}
+    for vertex, partner, death in zip(h0["vertex"], h0["partner"], h0["death"], strict=True):
+        key = int(simplex_of_vertex[vertex])
+        birth = rips_complex.appears_at[key]
+        if death == birth:
+            continue
+        bars[key] = (birth, float(death))
+        cycles[key] = {int(simplex_of_vertex[partner]): 1, key: 1}
+    for vertex in h0["survivors"]:
+        key = int(simplex_of_vertex[vertex])
+        bars[key] = (rips_complex.appears_at[key], np.inf)
+        cycles[key] = {key: 1}
+
+    if getattr(persistence, "bars", None) is None:
+        persistence.bars = {}
+    persistence.bars[0] = {key: bars[key] for key in sorted(bars)}
+
+    if with_representatives:
+        if getattr(persistence, "persistent_cycles", None) is None:
+            persistence.persistent_cycles = {}
+        persistence.persistent_cycles[0] = {
+            key: dict(sorted(cycles[key].items())) for key in sorted(cycles)
+        }
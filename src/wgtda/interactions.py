@@ -0,0 +1,506 @@
+import ast
+import json
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from matilda import FilteredSimplicialComplex, PersistentHomologyComputer
+
+INTERACTION_COLUMNS = [
+    "interaction_id",
+    "betti_number",
+    "birth",
+    "death",
+    "lifespan",
+    "vertices",
+    "vertices_set",
+]
+
+# Nesting depth of the list-valued interaction columns
+LIST_COLUMNS = {"vertices": 1, "vertices_set": 2, "gene_set": 1, "witness_genes": 1}
+
+OUTPUT_FORMATS = {"csv": ".csv", "parquet": ".parquet", "npz": ".npz"}
+
+# Array fields of InteractionTable stored in a persistence directory
+TABLE_ARRAYS = [
+    "interaction_id",
+    "betti_number",
+    "birth",
+    "death",
+    "lifespan",
+    "cycle_offsets",
+    "cycle_simplices",
+    "simplex_index",
+    "simplex_offsets",
+    "simplex_vertices",
+    "gene_names",
+]
+
+PERSISTENCE_FORMAT_VERSION = 1
+
+
+def _ragged_split(values: np.ndarray, offsets: np.ndarray) -> List[np.ndarray]:
+    """
+    Split a flat array into the rows of a CSR-style ragged array.
+    """
+    return np.split(values, offsets[1:-1])
+
+
+def _ragged_gather(starts: np.ndarray, stops: np.ndarray) -> np.ndarray:
+    """
+    Concatenation of the index ranges [start, stop), without a Python loop.
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    lengths = np.asarray(stops, dtype=np.int64) - starts
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    return np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+
+
+@dataclass
+class InteractionTable:
+    """
+    Columnar table of topological interactions.
+
+    Every bar is one row of the NumPy columns interaction_id, betti_number, birth,
+    death and lifespan. Representative cycles are stored as a CSR-style ragged
+    array: the simplices of row i are cycle_simplices[cycle_offsets[i]:cycle_offsets[i + 1]].
+    The vertices of the referenced simplices form a second ragged array over
+    simplex_index (sorted simplex indices) and gene names are only resolved on
+    demand through the gene_names index -> name array.
+    """
+
+    interaction_id: np.ndarray
+    betti_number: np.ndarray
+    birth: np.ndarray
+    death: np.ndarray
+    lifespan: np.ndarray
+    cycle_offsets: np.ndarray
+    cycle_simplices: np.ndarray
+    simplex_index: np.ndarray
+    simplex_offsets: np.ndarray
+    simplex_vertices: np.ndarray
+    gene_names: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.interaction_id)
+
+    def cycle_vertices(self) -> tuple:
+        """
+        Resolve every cycle to its gene (vertex) indices.
+
+        Returns:
+        - tuple(np.ndarray, np.ndarray)
+            Flat vertex indices of all cycle simplices and the per-row offsets into them.
+        """
+        position = np.searchsorted(self.simplex_index, self.cycle_simplices)
+        starts = self.simplex_offsets[position]
+        lengths = self.simplex_offsets[position + 1] - starts
+        flat = self.simplex_vertices[
+            np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+            + np.arange(lengths.sum())
+        ]
+        simplex_ends = np.concatenate([[0], np.cumsum(lengths)])
+        return flat, simplex_ends[self.cycle_offsets]
+
+    def gene_sets(self) -> List[np.ndarray]:
+        """
+        The unique gene names (in gene index order) touched by each row's representative cycle.
+
+        Returns:
+        - List[np.ndarray], one array of gene names per row.
+        """
+        flat, offsets = self.cycle_vertices()
+        return [
+            self.gene_names[np.unique(vertices)]
+            for vertices in _ragged_split(flat, offsets)
+        ]
+
+    def summary_dataframe(self) -> pd.DataFrame:
+        """
+        The scalar columns only (no cycles), indexed by row position, e.g. to run the
+        filters before materialising the kept rows with take.
+
+        Returns:
+        - pd.DataFrame with the columns interaction_id, betti_number, birth, death and lifespan.
+        """
+        return pd.DataFrame(
+            {
+                "interaction_id": self.interaction_id,
+                "betti_number": self.betti_number,
+                "birth": self.birth,
+                "death": self.death,
+                "lifespan": self.lifespan,
+            }
+        )
+
+    def take(self, rows) -> "InteractionTable":
+        """
+        Select rows (in the given order) of the table; the simplex table is shared.
+
+        Parameters:
+        - rows : array-like of int
+            Row positions.
+
+        Returns:
+        - InteractionTable with the selected rows.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        starts, stops = self.cycle_offsets[rows], self.cycle_offsets[rows + 1]
+        cycle_offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(stops - starts, out=cycle_offsets[1:])
+        gather = _ragged_gather(starts, stops)
+
+        return InteractionTable(
+            interaction_id=np.asarray(self.interaction_id)[rows],
+            betti_number=np.asarray(self.betti_number)[rows],
+            birth=np.asarray(self.birth)[rows],
+            death=np.asarray(self.death)[rows],
+            lifespan=np.asarray(self.lifespan)[rows],
+            cycle_offsets=cycle_offsets,
+            cycle_simplices=np.asarray(self.cycle_simplices)[gather],
+            simplex_index=self.simplex_index,
+            simplex_offsets=self.simplex_offsets,
+            simplex_vertices=self.simplex_vertices,
+            gene_names=self.gene_names,
+        )
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        Materialise the table as the interactions DataFrame, with list-valued
+        vertices and vertices_set columns.
+
+        Returns:
+        - pd.DataFrame with the columns in INTERACTION_COLUMNS.
+        """
+        # Resolve the names of every referenced simplex once (after take, only
+        # those of the kept rows)
+        position = np.searchsorted(self.simplex_index, self.cycle_simplices)
+        used, position = np.unique(position, return_inverse=True)
+        starts, stops = self.simplex_offsets[used], self.simplex_offsets[used + 1]
+        names = np.asarray(self.gene_names)[
+            np.asarray(self.simplex_vertices)[_ragged_gather(starts, stops)]
+        ].tolist()
+        name_offsets = np.concatenate([[0], np.cumsum(stops - starts)])
+        simplex_names = [
+            names[start:stop] for start, stop in zip(name_offsets[:-1], name_offsets[1:], strict=True)
+        ]
+
+        vertices = [
+            row.tolist() for row in _ragged_split(self.cycle_simplices, self.cycle_offsets)
+        ]
+        vertices_set = [
+            [simplex_names[p] for p in row]
+            for row in _ragged_split(position, self.cycle_offsets)
+        ]
+
+        index = np.asarray(self.interaction_id)
+        return pd.DataFrame(
+            {
+                "interaction_id": self.interaction_id,
+                "betti_number": self.betti_number,
+                "birth": self.birth,
+                "death": self.death,
+                "lifespan": self.lifespan,
+                "vertices": pd.Series(vertices, index=index, dtype=object),
+                "vertices_set": pd.Series(vertices_set, index=index, dtype=object),
+            },
+            columns=INTERACTION_COLUMNS,
+            index=index,
+        )
+
+
+def build_interaction_table(
+    persistence: PersistentHomologyComputer,
+    rips_complex: FilteredSimplicialComplex,
+    gene_dict: dict,
+) -> InteractionTable:
+    """
+    Build the columnar interaction table from persistent homology computations.
+
+    Bars and representative cycles are matched explicitly by (Betti number, bar key);
+    bars without a stored representative get an empty cycle.
+
+    Parameters:
+    - persistence : PersistentHomologyComputer
+        An object containing computed homological features and persistence bars.
+    - rips_complex : FilteredSimplicialComplex
+        The simplicial complex from which these homological features are computed.
+    - gene_dict : dict
+        A dictionary mapping vertex indices to gene names.
+
+    Returns:
+    - InteractionTable
+    """
+    persistent_cycles = getattr(persistence, "persistent_cycles", None) or {}
+
+    betti_numbers, bounds, cycle_lengths, cycles = [], [], [], []
+    for betti_number, bars in persistence.bars.items():
+        if not bars:
+            continue
+        dim_cycles = persistent_cycles.get(betti_number, {})
+        betti_numbers.append(np.full(len(bars), betti_number, dtype=np.int64))
+        bounds.append(np.asarray(list(bars.values()), dtype=np.float64).reshape(-1, 2))
+        for key in bars:
+            cycle = dim_cycles.get(key, ())
+            cycle_lengths.append(len(cycle))
+            cycles.append(cycle)
+
+    num_bars = len(cycle_lengths)
+    betti_number = np.concatenate(betti_numbers) if num_bars else np.zeros(0, np.int64)
+    bounds = np.concatenate(bounds) if num_bars else np.zeros((0, 2))
+    birth, death = bounds[:, 0].copy(), bounds[:, 1].copy()
+
+    cycle_offsets = np.zeros(num_bars + 1, dtype=np.int64)
+    np.cumsum(cycle_lengths, out=cycle_offsets[1:])
+    cycle_simplices = np.fromiter(
+        (simplex for cycle in cycles for simplex in cycle),
+        dtype=np.int64,
+        count=int(cycle_offsets[-1]),
+    )
+
+    # Table of the vertices of every simplex referenced by a cycle, looked up once each
+    simplex_index = np.unique(cycle_simplices)
+    simplices = [rips_complex.simplices[i] for i in simplex_index]
+    simplex_offsets = np.zeros(len(simplices) + 1, dtype=np.int64)
+    np.cumsum([len(simplex) for simplex in simplices], out=simplex_offsets[1:])
+    simplex_vertices = np.fromiter(
+        (vertex for simplex in simplices for vertex in simplex),
+        dtype=np.int64,
+        count=int(simplex_offsets[-1]),
+    )
+
+    gene_names = np.empty(max(gene_dict, default=-1) + 1, dtype=object)
+    gene_names[list(gene_dict.keys())] = list(gene_dict.values())
+
+    return InteractionTable(
+        interaction_id=np.arange(num_bars, dtype=np.int64),
+        betti_number=betti_number,
+        birth=birth,
+        death=death,
+        lifespan=death - birth,
+        cycle_offsets=cycle_offsets,
+        cycle_simplices=cycle_simplices,
+        simplex_index=simplex_index,
+        simplex_offsets=simplex_offsets,
+        simplex_vertices=simplex_vertices,
+        gene_names=gene_names,
+    )
+
+
+def save_interaction_table(
+    table: InteractionTable,
+    directory: str,
+    metadata: Optional[dict] = None,
+    arrays: Optional[Dict[str, np.ndarray]] = None,
+) -> str:
+    """
+    Write an interaction table to a persistence directory of .npy files and meta.json.
+
+    Bars, the CSR representative cycles (flat simplex indices plus offsets), the
+    simplex table and the gene names are stored as plain arrays, so that
+    load_interaction_table can memory-map them and the filters can be re-run
+    without recomputing persistent homology.
+
+    Parameters:
+    - table : InteractionTable
+        The unfiltered table, e.g. from build_interaction_table.
+    - directory : str
+        The persistence directory, created if missing.
+    - metadata : dict, optional
+        JSON-serialisable run settings stored in meta.json (dimensions, radius, ...).
+    - arrays : dict, optional
+        Further named arrays to store next to the table (e.g. landmark witnesses).
+
+    Returns:
+    - str
+        The directory.
+    """
+    os.makedirs(directory, exist_ok=True)
+    arrays = arrays or {}
+    for name in TABLE_ARRAYS:
+        values = getattr(table, name)
+        if name == "gene_names":
+            # Unicode rather than object arrays, which np.load can memory-map
+            values = np.asarray(["" if gene is None else str(gene) for gene in values], dtype=str)
+        np.save(os.path.join(directory, name + ".npy"), np.ascontiguousarray(values))
+    for name, values in arrays.items():
+        np.save(os.path.join(directory, name + ".npy"), np.ascontiguousarray(values))
+
+    meta = {
+        "format_version": PERSISTENCE_FORMAT_VERSION,
+        "num_bars": len(table),
+        "arrays": sorted(arrays),
+        **(metadata or {}),
+    }
+    with open(os.path.join(directory, "meta.json"), "w") as file:
+        json.dump(meta, file, indent=2)
+    return directory
+
+
+def load_interaction_table(directory: str, mmap: bool = True) -> Tuple[InteractionTable, dict]:
+    """
+    Load an interaction table written by save_interaction_table.
+
+    Parameters:
+    - directory : str
+        The persistence directory.
+    - mmap : bool, default = True
+        Memory-map the arrays instead of reading them.
+
+    Returns:
+    - tuple[InteractionTable, dict]
+        The table and the contents of meta.json, whose "arrays" entry maps the
+        names of the further arrays to the loaded arrays.
+    """
+    with open(os.path.join(directory, "meta.json"), "r") as file:
+        meta = json.load(file)
+    if meta.get("format_version") != PERSISTENCE_FORMAT_VERSION:
+        raise ValueError(
+            "Unsupported persistence directory format: {}".format(meta.get("format_version"))
+        )
+
+    mmap_mode = "r" if mmap else None
+
+    def load(name):
+        return np.load(os.path.join(directory, name + ".npy"), mmap_mode=mmap_mode)
+
+    table = InteractionTable(**{name: load(name) for name in TABLE_ARRAYS})
+    meta["arrays"] = {name: load(name) for name in meta.get("arrays", [])}
+    return table, meta
+
+
+def _encode_ragged(rows: list, depth: int, prefix: str) -> dict:
+    """
+    Encode a column of (nested) lists as flat values plus one offsets array per nesting level.
+    """
+    arrays = {}
+    for level in range(depth):
+        lengths = [len(row) for row in rows]
+        offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        arrays["{}__offsets{}".format(prefix, level)] = offsets
+        rows = [item for row in rows for item in row]
+    arrays[prefix + "__values"] = np.asarray(rows) if rows else np.zeros(0)
+    return arrays
+
+
+def _decode_ragged(arrays, prefix: str, depth: int) -> list:
+    """
+    Decode a column encoded by _encode_ragged back into (nested) lists.
+    """
+    rows = arrays[prefix + "__values"].tolist()
+    for level in reversed(range(depth)):
+        offsets = arrays["{}__offsets{}".format(prefix, level)]
+        rows = [rows[start:stop] for start, stop in zip(offsets[:-1], offsets[1:], strict=True)]
+    return rows
+
+
+def write_interactions(
+    interactions: pd.DataFrame, output_dir: str, output_format: str = "csv"
+) -> str:
+    """
+    Write the interactions to output_dir/interactions.<format>.
+
+    Parameters:
+    - interactions : pd.DataFrame
+        The interactions, with list-valued vertices, vertices_set and (optionally) gene_set columns.
+    - output_dir : str
+        The output directory.
+    - output_format : str, default = "csv"
+        "csv" writes the list columns as Python list reprs (export format);
+        "parquet" keeps them as native (nested) list columns (requires pyarrow);
+        "npz" stores every list column as flat values plus offsets.
+
+    Returns:
+    - str
+        The path of the written file.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(
+            "Unsupported output format. Supported formats are: "
+            + ", ".join(OUTPUT_FORMATS)
+        )
+    path = os.path.join(output_dir, "interactions" + OUTPUT_FORMATS[output_format])
+
+    if output_format == "csv":
+        interactions.to_csv(path, index=True)
+    elif output_format == "parquet":
+        interactions.to_parquet(path, index=True)
+    else:
+        arrays = {
+            "__index": interactions.index.to_numpy(),
+            "__columns": np.asarray(interactions.columns, dtype=str),
+        }
+        for column in interactions.columns:
+            depth = LIST_COLUMNS.get(column)
+            if depth is None:
+                arrays[column] = interactions[column].to_numpy()
+            else:
+                rows = [list(row) for row in interactions[column]]
+                arrays.update(_encode_ragged(rows, depth, column))
+        np.savez(path, **arrays)
+
+    return path
+
+
+def read_interactions(path: str) -> pd.DataFrame:
+    """
+    Read interactions written by write_interactions.
+
+    Parquet and npz files are loaded without any string parsing. CSV files are
+    still supported, with their list reprs parsed back into lists. A gene_set
+    column is derived from vertices_set if the file does not have one.
+
+    Parameters:
+    - path : str
+        Path of an interactions.csv, .parquet or .npz file.
+
+    Returns:
+    - pd.DataFrame
+        The interactions with list-valued vertices, vertices_set and gene_set columns.
+    """
+    _, extension = os.path.splitext(path)
+    extension = extension.lower()
+
+    if extension == ".parquet":
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(path)
+        interactions = table.to_pandas()
+        for column in LIST_COLUMNS:
+            if column in table.column_names:
+                interactions[column] = pd.Series(
+                    table.column(column).to_pylist(), index=interactions.index, dtype=object
+                )
+    elif extension == ".npz":
+        with np.load(path, allow_pickle=False) as arrays:
+            interactions = pd.DataFrame(index=arrays["__index"])
+            for column in arrays["__columns"].tolist():
+                depth = LIST_COLUMNS.get(column)
+                if depth is None:
+                    interactions[column] = arrays[column]
+                else:
+                    interactions[column] = pd.Series(
+                        _decode_ragged(arrays, column, depth),
+                        index=interactions.index,
+                        dtype=object,
+                    )
+    elif extension == ".csv":
+        interactions = pd.read_csv(path, index_col=0)
+        for column in LIST_COLUMNS:
+            if column in interactions.columns:
+                interactions[column] = interactions[column].apply(ast.literal_eval)
+    else:
+        raise ValueError(
+            "Unsupported interactions file. Supported extensions are: .csv, .parquet, .npz"
+        )
+
+    if "gene_set" not in interactions.columns and "vertices_set" in interactions.columns:
+        interactions["gene_set"] = [
+            list(dict.fromkeys(gene for simplex in row for gene in simplex))
+            for row in interactions["vertices_set"]
+        ]
+
+    return interactions
@@ -0,0 +1,158 @@
+from typing import List
+
+import numpy as np
+import pandas as pd
+from numpy import ndarray
+
+# Rows of the distance matrix read at a time
+_ROW_BLOCK = 1024
+
+# Elements of the witnesses x landmarks x landmarks temporary computed at a time
+_WITNESS_BLOCK_ELEMENTS = 1 << 24
+
+
+def select_landmarks(preprocessing: ndarray, num_landmarks: int, first: int = 0) -> ndarray:
+    """
+    Select landmark genes by max-min (farthest point) sampling.
+
+    Starting from `first`, every step adds the gene farthest from all landmarks
+    chosen so far, so the landmarks spread evenly over the gene space. Each step
+    reads one row of the matrix and updates the distances to the nearest landmark
+    in one vectorized pass, O(num_genes * num_landmarks) overall.
+
+    Parameters:
+    - preprocessing : ndarray
+        A square distance matrix (may be a np.memmap).
+    - num_landmarks : int
+        Number of landmarks, capped at the number of genes.
+    - first : int, default = 0
+        Index of the first landmark.
+
+    Returns:
+    - ndarray
+        The gene indices of the landmarks, in selection order.
+    """
+    num_genes = preprocessing.shape[0]
+    num_landmarks = min(num_landmarks, num_genes)
+    if num_landmarks <= 0:
+        raise ValueError("The number of landmarks must be positive.")
+
+    landmarks = np.empty(num_landmarks, dtype=np.int64)
+    nearest = np.full(num_genes, np.inf)
+    landmark = first
+    for step in range(num_landmarks):
+        landmarks[step] = landmark
+        np.minimum(nearest, np.asarray(preprocessing[landmark], dtype=np.float64), out=nearest)
+        nearest[landmarks[: step + 1]] = -np.inf
+        landmark = int(np.argmax(nearest))
+
+    return landmarks
+
+
+def lazy_witness_matrix(preprocessing: ndarray, landmarks: ndarray, nu: int = 2) -> tuple:
+    """
+    Compute the edge filtration of the lazy witness complex on the landmarks, with every gene as a witness.
+
+    A gene w witnesses the edge between landmarks a and b at radius
+    max(d(w, a), d(w, b)) - m(w), where m(w) is the distance from w to its nu-th
+    nearest landmark (0 for nu = 0). The edge enters at the smallest radius over
+    all witnesses (and not below 0). The lazy witness complex is the flag complex
+    of these edges, so the matrix can be passed to construct_vr_complex_rna_matrix
+    like a distance matrix.
+
+    Parameters:
+    - preprocessing : ndarray
+        A square distance matrix over all genes (may be a np.memmap).
+    - landmarks : ndarray
+        Gene indices of the landmarks, e.g. from select_landmarks.
+    - nu : int, default = 2
+        The lazy witness parameter (0, 1 or 2).
+
+    Returns:
+    - tuple(ndarray, ndarray)
+        The landmarks x landmarks filtration matrix and, for every landmark pair,
+        the gene index of the witness that realises its filtration value.
+    """
+    if nu not in (0, 1, 2):
+        raise ValueError("nu must be 0, 1 or 2.")
+    num_genes, num_landmarks = preprocessing.shape[0], len(landmarks)
+
+    to_landmarks = np.empty((num_genes, num_landmarks))
+    for start in range(0, num_genes, _ROW_BLOCK):
+        to_landmarks[start : start + _ROW_BLOCK] = np.asarray(
+            preprocessing[start : start + _ROW_BLOCK]
+        )[:, landmarks]
+    offsets = (
+        np.zeros(num_genes)
+        if nu == 0
+        else np.partition(to_landmarks, nu - 1, axis=1)[:, nu - 1]
+    )
+
+    matrix = np.full((num_landmarks, num_landmarks), np.inf)
+    witnesses = np.full((num_landmarks, num_landmarks), -1, dtype=np.int64)
+    block = max(1, _WITNESS_BLOCK_ELEMENTS // max(1, num_landmarks**2))
+    for start in range(0, num_genes, block):
+        rows = to_landmarks[start : start + block]
+        radii = np.maximum(rows[:, :, None], rows[:, None, :]) - offsets[start : start + block, None, None]
+        best = np.argmin(radii, axis=0)
+        values = np.take_along_axis(radii, best[None], axis=0)[0]
+        better = values < matrix
+        matrix[better] = values[better]
+        witnesses[better] = best[better] + start
+
+    np.maximum(matrix, 0.0, out=matrix)
+    np.fill_diagonal(matrix, 0.0)
+    return matrix, witnesses
+
+
+def feature_witnesses(
+    interactions: pd.DataFrame,
+    landmarks: ndarray,
+    witnesses: ndarray,
+    gene_dict: dict,
+) -> List[list]:
+    """
+    The non-landmark genes witnessing the edges of each feature's representative cycle.
+
+    Every edge of every simplex in vertices_set contributes the witness that
+    realises its filtration value. Betti 0 representatives only have vertices, so
+    the edge between their two vertices (the merge) is used instead.
+
+    Parameters:
+    - interactions : pd.DataFrame
+        Interactions of the witness complex, whose vertices_set holds landmark gene names.
+    - landmarks : ndarray
+        Gene indices of the landmarks.
+    - witnesses : ndarray
+        The witness of every landmark pair, from lazy_witness_matrix.
+    - gene_dict : dict
+        A dictionary mapping all gene indices to gene names.
+
+    Returns:
+    - List[list]
+        The witness gene names of every row, in gene index order.
+    """
+    position = {gene_dict[int(landmark)]: index for index, landmark in enumerate(landmarks)}
+    landmark_genes = set(landmarks.tolist())
+
+    rows = []
+    for vertices_set in interactions["vertices_set"]:
+        simplices = [[position[gene] for gene in simplex] for simplex in vertices_set]
+        if simplices and all(len(simplex) == 1 for simplex in simplices):
+            simplices = [[simplex[0] for simplex in simplices]]
+        genes = set()
+        for simplex in simplices:
+            for i, a in enumerate(simplex):
+                for b in simplex[i + 1 :]:
+                    witness = witnesses[a, b]
+                    if witness >= 0 and witness not in landmark_genes:
+                        genes.add(int(witness))
+        rows.append([gene_dict[gene] for gene in sorted(genes)])
+    return rows
+
+
+def landmark_gene_dict(landmarks: ndarray, gene_dict: dict) -> dict:
+    """
+    Map the vertices of the witness complex (positions in landmarks) to gene names.
+    """
+    return {index: gene_dict[int(landmark)] for index, landmark in enumerate(landmarks)}
@@ -1,3 +1,13 @@
-from .network import create_network_graph
+from .network import (NETWORK_RENDERERS, clear_layout_cache, cooccurrence_matrix,
+                      create_network_graph, create_network_graphs, graph_layout,
+                      interaction_graph)
 
-__all__ = ["create_network_graph"]
+__all__ = [
+    "NETWORK_RENDERERS",
+    "clear_layout_cache",
+    "cooccurrence_matrix",
+    "create_network_graph",
+    "create_network_graphs",
+    "graph_layout",
+    "interaction_graph",
+]
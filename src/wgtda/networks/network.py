@@ -1,48 +1,289 @@
-import matplotlib.pyplot as plt
+import hashlib
+import json
+import os
+from itertools import chain
+from typing import Dict, List, Optional, Tuple
+
 import networkx as nx
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix, triu
+
+# Layouts computed in this process, keyed by the digest of the graph and seed
+_LAYOUT_CACHE: Dict[str, dict] = {}
+
+NETWORK_RENDERERS = {"matplotlib": ".png", "bokeh": ".html"}
+
+
+def cooccurrence_matrix(gene_sets: List[list]) -> Tuple[csr_matrix, np.ndarray]:
+    """
+    Count how many gene sets every pair of genes shares, in one sparse product.
+
+    The gene sets form a sparse sets x genes incidence matrix B, and B^T B holds
+    the co-occurrence counts off its diagonal.
+
+    Parameters:
+    - gene_sets : List[list]
+        The gene sets, e.g. the gene_set column of the interactions.
+
+    Returns:
+    - tuple[csr_matrix, np.ndarray]
+        The strictly upper triangular genes x genes count matrix and the (sorted)
+        gene names of its rows and columns.
+    """
+    lengths = np.fromiter(map(len, gene_sets), dtype=np.int64, count=len(gene_sets))
+    flat = np.asarray(list(chain.from_iterable(gene_sets)), dtype=str)
+    genes, columns = np.unique(flat, return_inverse=True)
+
+    incidence = csr_matrix(
+        (np.ones(len(flat)), (np.repeat(np.arange(len(gene_sets)), lengths), columns.ravel())),
+        shape=(len(gene_sets), len(genes)),
+    )
+    # A gene listed twice in one set still counts once
+    incidence.sum_duplicates()
+    incidence.data[:] = 1.0
+
+    return triu(incidence.T @ incidence, k=1, format="csr"), genes
+
+
+def interaction_graph(
+    df: pd.DataFrame,
+    betti_number: int,
+    min_weight: Optional[float] = None,
+    max_edges: Optional[int] = None,
+) -> nx.Graph:
+    """
+    Build the gene interaction network of one Betti number.
+
+    Two genes are linked when they appear in the gene_set of the same
+    interaction. The first shared interaction gives the edge weight 1 and every
+    further one adds 0.5, so weight = (count + 1) / 2.
+
+    Parameters:
+    - df : pd.DataFrame
+        The interactions, with betti_number and gene_set columns.
+    - betti_number : int
+        The Betti number whose interactions are drawn.
+    - min_weight : float, optional
+        Drop the edges lighter than this weight.
+    - max_edges : int, optional
+        Keep only the heaviest edges, to downsample large networks.
+
+    Returns:
+    - nx.Graph
+        The network, with a "weight" attribute on every edge.
+    """
+    gene_sets = df.loc[df["betti_number"] == betti_number, "gene_set"].tolist()
+    counts, genes = cooccurrence_matrix(gene_sets)
+    counts = counts.tocoo()
+    weights = (counts.data + 1) / 2
+
+    keep = np.ones(len(weights), dtype=bool)
+    if min_weight is not None:
+        keep &= weights >= min_weight
+    if max_edges is not None and keep.sum() > max_edges:
+        kept = np.flatnonzero(keep)
+        heaviest = kept[np.argsort(-weights[kept], kind="stable")[:max_edges]]
+        keep[:] = False
+        keep[heaviest] = True
+
+    graph = nx.Graph()
+    graph.add_weighted_edges_from(
+        zip(
+            genes[counts.row[keep]].tolist(),
+            genes[counts.col[keep]].tolist(),
+            weights[keep].tolist(),
+            strict=True,
+        )
+    )
+    return graph
+
+
+def _graph_digest(graph: nx.Graph, seed: int) -> str:
+    """
+    Content address of a graph's weighted edges and the layout seed.
+    """
+    edges = sorted(
+        (min(u, v), max(u, v), data["weight"]) for u, v, data in graph.edges(data=True)
+    )
+    return hashlib.sha256(json.dumps([seed, edges]).encode()).hexdigest()
+
+
+def graph_layout(graph: nx.Graph, seed: int = 0, cache_dir: Optional[str] = None) -> dict:
+    """
+    Seeded spring layout of a graph, cached by the graph's edges and weights.
+
+    The same network is laid out only once per process, and once overall with
+    a cache_dir, so redrawing it (e.g. with another renderer or after refiltering
+    to the same interactions) skips the layout.
 
+    Parameters:
+    - graph : nx.Graph
+        The network.
+    - seed : int, default = 0
+        Seed of the spring layout.
+    - cache_dir : str, optional
+        Directory where layouts are kept as JSON between runs.
 
-# Function to create and save the graph
-def create_network_graph(df, betti_number):
-    # Filter DataFrame for the specified Betti number
-    filtered_df = df[df["betti_number"] == betti_number]
-
-    # Create a NetworkX graph
-    G = nx.Graph()
-
-    # Add nodes and edges to the graph
-    for gene_list in filtered_df["gene_set"]:
-        for i in range(len(gene_list)):
-            for j in range(i + 1, len(gene_list)):
-                gene1, gene2 = gene_list[i], gene_list[j]
-                if G.has_edge(gene1, gene2):
-                    G[gene1][gene2]["weight"] += 0.5
-                else:
-                    G.add_edge(gene1, gene2, weight=1)
-
-    # Function to save the graph
-    def save_graph(G, title="Gene Interaction Network (Betti {})".format(betti_number)):
-        plt.figure(figsize=(12, 12))
-        pos = nx.spring_layout(G)
-
-        # Get edge weights for width
-        edges = G.edges(data=True)
-        edge_widths = [data["weight"] for _, _, data in edges]
-
-        # Draw the graph with edge widths
-        nx.draw(
-            G,
-            pos,
-            with_labels=True,
-            node_size=50,
-            font_size=10,
-            font_weight="bold",
-            width=edge_widths,
-            edge_color="gray",
+    Returns:
+    - dict
+        The (x, y) position of every node.
+    """
+    key = _graph_digest(graph, seed)
+    if key in _LAYOUT_CACHE:
+        return _LAYOUT_CACHE[key]
+
+    path = None if cache_dir is None else os.path.join(cache_dir, key + ".json")
+    if path is not None and os.path.exists(path):
+        with open(path, "r") as file:
+            pos = {node: tuple(xy) for node, xy in json.load(file).items()}
+    else:
+        pos = nx.spring_layout(graph, seed=seed)
+        pos = {node: (float(x), float(y)) for node, (x, y) in pos.items()}
+        if path is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            with open(path, "w") as file:
+                json.dump(pos, file)
+
+    _LAYOUT_CACHE[key] = pos
+    return pos
+
+
+def clear_layout_cache():
+    """
+    Forget the layouts computed in this process (the cache_dir of graph_layout is kept).
+    """
+    _LAYOUT_CACHE.clear()
+
+
+def _title(betti_number: int) -> str:
+    return "Gene Interaction Network (Betti {})".format(betti_number)
+
+
+def _save_matplotlib(graph: nx.Graph, pos: dict, title: str, path: str):
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=(12, 12))
+    # Get edge weights for width
+    edge_widths = [data["weight"] for _, _, data in graph.edges(data=True)]
+
+    # Draw the graph with edge widths
+    nx.draw(
+        graph,
+        pos,
+        with_labels=True,
+        node_size=50,
+        font_size=10,
+        font_weight="bold",
+        width=edge_widths,
+        edge_color="gray",
+    )
+    plt.title(title)
+    plt.savefig(path)
+    plt.close()
+
+
+def _save_bokeh(graph: nx.Graph, pos: dict, title: str, path: str):
+    try:
+        from bokeh.io import output_file, save
+        from bokeh.models import HoverTool
+        from bokeh.plotting import figure, from_networkx
+    except ImportError as error:
+        raise ImportError(
+            "The bokeh renderer requires bokeh, install it with `pip install bokeh`"
+        ) from error
+
+    plot = figure(title=title, width=900, height=900, tools="pan,wheel_zoom,box_zoom,reset,save")
+    plot.axis.visible = False
+    plot.grid.visible = False
+
+    # Edge attributes become columns of the edge data source
+    renderer = from_networkx(graph, pos)
+    renderer.node_renderer.glyph.update(size=8, fill_color="steelblue")
+    renderer.edge_renderer.glyph.update(line_width="weight", line_color="gray", line_alpha=0.6)
+    plot.renderers.append(renderer)
+    plot.add_tools(HoverTool(renderers=[renderer.node_renderer], tooltips=[("gene", "@index")]))
+
+    output_file(path, title=title)
+    save(plot)
+
+
+def create_network_graph(
+    df: pd.DataFrame,
+    betti_number: int,
+    output_dir: str = "output/network_graphs",
+    renderer: str = "matplotlib",
+    seed: int = 0,
+    min_weight: Optional[float] = None,
+    max_edges: Optional[int] = None,
+    layout_cache_dir: Optional[str] = None,
+) -> str:
+    """
+    Draw and save the gene interaction network of one Betti number.
+
+    Parameters:
+    - df : pd.DataFrame
+        The interactions, with betti_number and gene_set columns.
+    - betti_number : int
+        The Betti number whose interactions are drawn.
+    - output_dir : str, default = "output/network_graphs"
+        Where "Gene Interaction Network (Betti n)" is saved, created if missing.
+    - renderer : str, default = "matplotlib"
+        "matplotlib" for a .png, or "bokeh" for an interactive .html (requires bokeh).
+    - seed : int, default = 0
+        Seed of the spring layout.
+    - min_weight, max_edges :
+        Edge thresholding and downsampling, see interaction_graph.
+    - layout_cache_dir : str, optional
+        Keep layouts there between runs, see graph_layout.
+
+    Returns:
+    - str
+        The path of the saved figure.
+    """
+    if renderer not in NETWORK_RENDERERS:
+        raise ValueError(
+            "Unsupported renderer. Supported renderers are: " + ", ".join(NETWORK_RENDERERS)
         )
-        plt.title(title)
-        plt.savefig(f"output/network_graphs/{title}.png")
-        plt.close()
+    graph = interaction_graph(df, betti_number, min_weight, max_edges)
+    pos = graph_layout(graph, seed, layout_cache_dir)
+
+    os.makedirs(output_dir, exist_ok=True)
+    title = _title(betti_number)
+    path = os.path.join(output_dir, title + NETWORK_RENDERERS[renderer])
+    if renderer == "matplotlib":
+        _save_matplotlib(graph, pos, title, path)
+    else:
+        _save_bokeh(graph, pos, title, path)
+    return path
+
+
+def create_network_graphs(
+    df: pd.DataFrame,
+    output_dir: str = "output/network_graphs",
+    betti_numbers: Optional[List[int]] = None,
+    **kwargs,
+) -> Dict[int, str]:
+    """
+    Draw and save the gene interaction networks of several Betti numbers in one call.
+
+    Parameters:
+    - df : pd.DataFrame
+        The interactions, with betti_number and gene_set columns.
+    - output_dir : str, default = "output/network_graphs"
+        Where the figures are saved, created if missing.
+    - betti_numbers : List[int], optional
+        The Betti numbers to draw, by default all of those in df.
+    - kwargs :
+        renderer, seed, min_weight, max_edges and layout_cache_dir, see create_network_graph.
 
-    # Save the graph
-    save_graph(G)
+    Returns:
+    - Dict[int, str]
+        The path of the figure of every Betti number.
+    """
+    if betti_numbers is None:
+        betti_numbers = sorted(int(betti) for betti in df["betti_number"].unique())
+    return {
+        betti_number: create_network_graph(df, betti_number, output_dir, **kwargs)
+        for betti_number in betti_numbers
+    }
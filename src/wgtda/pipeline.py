@@ -0,0 +1,309 @@
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from . import profiling
+from .complex import (construct_vr_complex_rna_matrix, extract_representatives,
+                      select_vr_radius)
+from .correlation import CorrelationStore, cached_correlation, get_preprocessor
+from .correlation.cache import DEFAULT_CACHE_BYTES
+from .filters import extract_top_n_persistent_holes, remove_infinite_holes
+from .interactions import (build_interaction_table, load_interaction_table,
+                           save_interaction_table)
+from .landmarks import (feature_witnesses, landmark_gene_dict, lazy_witness_matrix,
+                        select_landmarks)
+from .preprocessing import flatten_gene_list
+
+
+def compute_relationship_matrix(
+    gene_exp_arr: np.ndarray,
+    gene_dict: dict,
+    method: str = "dc",
+    cache_dir: Optional[str] = None,
+    max_cache_bytes: int = DEFAULT_CACHE_BYTES,
+    n_jobs: int = 1,
+    memmap_dir: Optional[str] = None,
+    store_dir: Optional[str] = None,
+) -> np.ndarray:
+    """
+    Compute the gene x gene matrix fed to the Vietoris-Rips complex.
+
+    Parameters:
+    - gene_exp_arr : np.ndarray
+        The filtered samples x genes expression array.
+    - gene_dict : dict
+        A dictionary mapping column indices to gene names.
+    - method : str, default = "dc"
+        A registered preprocessing method (see wgtda.correlation.register_preprocessor):
+        'dc' for distance correlation, 'stom' for signed TOMs, or the correlation
+        distances 'pearson', 'spearman' and 'biweight'.
+    - cache_dir : str, optional
+        Directory of the on-disk correlation cache.
+    - max_cache_bytes : int
+        Size limit of the cache directory.
+    - n_jobs : int, default = 1
+        Number of worker processes for the correlation stage.
+    - memmap_dir : str, optional
+        Fill a float32 memory-mapped matrix, memmap_dir/<method>_matrix.npy, tile by
+        tile instead of holding a float64 matrix in memory.
+    - store_dir : str, optional
+        Directory of a CorrelationStore ('dc' only). Only the genes missing from the
+        store are computed and the panel is sliced out of it, in place of the
+        cache and memmap_dir.
+
+    Returns:
+    - np.ndarray
+        The gene x gene matrix (an np.memmap with memmap_dir).
+    """
+    preprocessor = get_preprocessor(method)
+
+    if store_dir is not None:
+        if method != "dc":
+            raise ValueError("The correlation store only supports the 'dc' method.")
+        print("Computing the distance correlation matrix from the store in " + store_dir)
+        with profiling.stage("correlation", profile=True):
+            return CorrelationStore(store_dir).correlation(
+                gene_exp_arr, list(gene_dict.values())
+            )
+
+    print("Computing the {} matrix".format(preprocessor.description))
+
+    kwargs = {"n_jobs": n_jobs}
+    cache_method = method
+    if memmap_dir is not None:
+        os.makedirs(memmap_dir, exist_ok=True)
+        kwargs["memmap_path"] = os.path.join(memmap_dir, method + "_matrix.npy")
+        # float32 matrices must not be served for float64 requests and vice versa
+        cache_method = method + ":float32"
+
+    with profiling.stage("correlation", profile=True):
+        return cached_correlation(
+            preprocessor.func,
+            gene_exp_arr,
+            genes=list(gene_dict.values()),
+            method=cache_method,
+            cache_dir=cache_dir,
+            max_bytes=max_cache_bytes,
+            **kwargs,
+        )
+
+
+def _filter_interactions(
+    interactions: pd.DataFrame,
+    remove_inf_values: bool,
+    filter_persistence: float,
+) -> pd.DataFrame:
+    """
+    Apply the --remove_inf_values and --filter_persistence filters.
+    """
+    if remove_inf_values:
+        print("Filtering  Holes")
+        interactions = remove_infinite_holes(interactions)
+
+    return extract_top_n_persistent_holes(interactions, filter_persistence)
+
+
+def compute_interactions(
+    dist_matrix: np.ndarray,
+    gene_dict: dict,
+    dimensions: int = 3,
+    max_radius: Optional[float] = None,
+    radius_quantile: Optional[float] = None,
+    max_simplices: Optional[int] = None,
+    remove_inf_values: bool = True,
+    filter_persistence: float = 10,
+    two_pass: bool = False,
+    verbose: bool = False,
+    h0_engine: str = "matilda",
+    edge_collapse: bool = False,
+    landmarks: Optional[int] = None,
+    witness_nu: int = 2,
+    by_component: bool = False,
+    n_jobs: int = 1,
+    persistence_dir: Optional[str] = None,
+) -> Tuple[pd.DataFrame, Optional[float]]:
+    """
+    Run the topological part of WGTDA on a gene x gene matrix.
+
+    Constructs the Vietoris-Rips complex, computes persistent homology, filters the
+    features and derives each interaction's gene_set.
+
+    Parameters:
+    - dist_matrix : np.ndarray
+        The gene x gene matrix.
+    - gene_dict : dict
+        A dictionary mapping vertex indices to gene names.
+    - dimensions : int, default = 3
+        The maximum simplex dimension of the complex.
+    - max_radius, radius_quantile, max_simplices :
+        Radius bound of the complex, see construct_vr_complex_rna_matrix.
+    - remove_inf_values : bool, default = True
+        Remove holes that do not close.
+    - filter_persistence : float, default = 10
+        Keep the top n% most persistent features of each Betti number.
+    - two_pass : bool, default = False
+        Compute representatives only for the features that survive filtering.
+    - verbose : bool, default = False
+        Report the progress of the persistent homology computation.
+    - h0_engine : str, default = "matilda"
+        How Betti 0 is computed, see construct_vr_complex_rna_matrix.
+    - edge_collapse : bool, default = False
+        Collapse dominated edges before building the complex, see wgtda.collapse.
+    - landmarks : int, optional
+        Build a lazy witness complex on this many max-min landmark genes, with all
+        genes as witnesses, instead of the Vietoris-Rips complex on every gene (see
+        wgtda.landmarks). The radius options then apply to the witness filtration and
+        a witness_genes column lists the non-landmark genes witnessing each feature.
+    - witness_nu : int, default = 2
+        The lazy witness parameter nu (0, 1 or 2) used with landmarks.
+    - by_component : bool, default = False
+        With a radius bound, compute persistent homology separately on every
+        connected component, see construct_vr_complex_rna_matrix.
+    - n_jobs : int, default = 1
+        Worker processes used with by_component.
+    - persistence_dir : str, optional
+        Save the unfiltered bars and representatives there (see
+        save_interaction_table), so refilter_interactions can re-apply the filters
+        without recomputing persistent homology.
+
+    Returns:
+    - tuple[pd.DataFrame, float or None]
+        The filtered interactions and the radius bound that was used (None if unbounded).
+    """
+    if landmarks is not None:
+        with profiling.stage("landmarks"):
+            landmark_genes = select_landmarks(dist_matrix, landmarks)
+            all_genes = gene_dict
+            dist_matrix, witnesses = lazy_witness_matrix(dist_matrix, landmark_genes, witness_nu)
+            gene_dict = landmark_gene_dict(landmark_genes, all_genes)
+        print("Witness complex on {} landmarks of {} genes".format(len(landmark_genes), len(all_genes)))
+        profiling.record(num_landmarks=len(landmark_genes))
+
+    if max_radius is None and (radius_quantile is not None or max_simplices is not None):
+        max_radius = select_vr_radius(
+            dist_matrix, dimensions, radius_quantile, max_simplices
+        )
+    if max_radius is not None:
+        print("Vietoris-Rips radius: {:.6g}".format(max_radius))
+
+    print("Constructing the Vietoris Rips Complex")
+    persistence, rips_complex = construct_vr_complex_rna_matrix(
+        dist_matrix,
+        dimensions,
+        max_radius=max_radius,
+        with_representatives=not two_pass,
+        verbose=verbose,
+        h0_engine=h0_engine,
+        edge_collapse=edge_collapse,
+        by_component=by_component,
+        n_jobs=n_jobs,
+    )
+    with profiling.stage("dataframe", profile=True):
+        table = build_interaction_table(persistence, rips_complex, gene_dict)
+        interactions = table.to_dataframe()
+
+    if persistence_dir is not None:
+        with profiling.stage("persistence_artifact"):
+            metadata = {
+                "dimensions": dimensions,
+                "max_radius": None if max_radius is None else float(max_radius),
+                "with_representatives": not two_pass,
+                "landmarks": None if landmarks is None else len(landmark_genes),
+            }
+            arrays = {}
+            if landmarks is not None:
+                arrays = {
+                    "landmarks": landmark_genes,
+                    "witnesses": witnesses,
+                    "all_gene_names": np.asarray([str(all_genes[i]) for i in range(len(all_genes))]),
+                }
+            save_interaction_table(table, persistence_dir, metadata, arrays)
+        print("Saved persistence to", persistence_dir)
+
+    with profiling.stage("filtering"):
+        interactions = _filter_interactions(interactions, remove_inf_values, filter_persistence)
+
+    if two_pass:
+        print("Extracting representatives of the kept features")
+        with profiling.stage("representatives"):
+            interactions = extract_representatives(
+                dist_matrix,
+                interactions,
+                gene_dict,
+                dimensions,
+                max_radius=max_radius,
+                verbose=verbose,
+                edge_collapse=edge_collapse,
+                by_component=by_component,
+                n_jobs=n_jobs,
+            )
+
+    # Apply the function to the 'gene_interactions' column
+    interactions["gene_set"] = interactions["vertices_set"].apply(flatten_gene_list)
+    if landmarks is not None:
+        interactions["witness_genes"] = pd.Series(
+            feature_witnesses(interactions, landmark_genes, witnesses, all_genes),
+            index=interactions.index,
+            dtype=object,
+        )
+
+    profiling.record(
+        max_radius=max_radius,
+        num_interactions=len(interactions),
+        num_interactions_per_betti={
+            int(betti_number): int(count)
+            for betti_number, count in interactions["betti_number"].value_counts().sort_index().items()
+        },
+    )
+
+    return interactions, max_radius
+
+
+def refilter_interactions(
+    persistence_dir: str,
+    remove_inf_values: bool = True,
+    filter_persistence: float = 10,
+) -> pd.DataFrame:
+    """
+    Re-apply the filters to the persistence saved by compute_interactions, without recomputing it.
+
+    The filters run on the memory-mapped bars alone and only the kept rows get
+    their representative cycles turned into vertices_set, so this takes
+    milliseconds where the homology took minutes.
+
+    Parameters:
+    - persistence_dir : str
+        The persistence_dir passed to compute_interactions.
+    - remove_inf_values : bool, default = True
+        Remove holes that do not close.
+    - filter_persistence : float, default = 10
+        Keep the top n% most persistent features of each Betti number.
+
+    Returns:
+    - pd.DataFrame
+        The filtered interactions, with the columns of compute_interactions.
+    """
+    table, meta = load_interaction_table(persistence_dir)
+    if not meta.get("with_representatives", True):
+        print(
+            "Warning: the persistence was computed with --two_pass and has no "
+            "representatives, vertices_set and gene_set are empty"
+        )
+
+    kept = _filter_interactions(table.summary_dataframe(), remove_inf_values, filter_persistence)
+    interactions = table.take(kept.index.to_numpy()).to_dataframe()
+    interactions["gene_set"] = interactions["vertices_set"].apply(flatten_gene_list)
+
+    arrays = meta["arrays"]
+    if "witnesses" in arrays:
+        all_genes = dict(enumerate(arrays["all_gene_names"].tolist()))
+        interactions["witness_genes"] = pd.Series(
+            feature_witnesses(
+                interactions, np.asarray(arrays["landmarks"]), arrays["witnesses"], all_genes
+            ),
+            index=interactions.index,
+            dtype=object,
+        )
+    return interactions
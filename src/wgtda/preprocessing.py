@@ -1,21 +1,75 @@
 import ast
 import os
 from typing import TextIO
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 import numpy as np
 import pandas as pd
 
 
-def load_gene_expression_data(file_path: str) -> pd.DataFrame:
+def read_gene_list(gene_list_file: TextIO, max_genes: Optional[int] = 50) -> List[str]:
+    """
+    Read a txt list of genes, one gene per line.
+
+    Parameters:
+    - gene_list_file : str
+        Path to the text file containing the list of genes.
+    - max_genes : int, default = 50
+        Keep only the first max_genes genes of the list (None keeps all of them).
+
+    Returns:
+    - List[str]
+        The genes, in file order.
+    """
+    with open(gene_list_file, "r") as file:
+        gene_list = file.read().splitlines()
+
+    if max_genes is not None:
+        gene_list = gene_list[0:max_genes]
+
+    return gene_list
+
+
+def _read_arrow_columns(file_path: str, file_extension: str) -> List[str]:
+    """
+    Read the column names of a Parquet or Feather file from its schema, without loading any data.
+    """
+    if file_extension in [".parquet", ".pq"]:
+        import pyarrow.parquet as pq
+
+        return pq.read_schema(file_path).names
+
+    import pyarrow.feather as feather
+
+    # Memory-mapped, so only the schema is actually read
+    return feather.read_table(file_path, memory_map=True).schema.names
+
+
+def load_gene_expression_data(
+    file_path: str,
+    genes: Optional[List[str]] = None,
+    dtype: Optional[np.dtype] = None,
+    chunksize: Optional[int] = None,
+) -> pd.DataFrame:
     """
     Load gene expression data from a file, automatically determining the file type.
 
     This function reads a file specified by `file_path` and loads it into a pandas DataFrame. The file type is inferred
-    from the file extension. Supported file types are CSV, Excel, Pickle, and TSV/Text.
+    from the file extension. Supported file types are CSV, Excel, Pickle, TSV/Text, Parquet and Feather.
+
+    If `genes` is given, only those columns are read: CSV, TSV and Excel files are parsed with `usecols`, and
+    Parquet and Feather files only load the projected columns. Pickles are always loaded whole. Genes missing
+    from the file are ignored.
 
     Parameters:
     - file_path : str
         The path to the data file.
+    - genes : List[str], optional
+        The gene columns to load. All columns are loaded if not given.
+    - dtype : np.dtype, optional
+        Load the gene columns with this dtype, e.g. np.float32 to halve the memory.
+    - chunksize : int, optional
+        Parse CSV/TSV files this many rows at a time, which bounds the parser's
+        memory on very wide files.
 
     Returns:
     - pandas.DataFrame
@@ -30,23 +84,58 @@ def load_gene_expression_data(file_path: str) -> pd.DataFrame:
     _, file_extension = os.path.splitext(file_path)
     file_extension = file_extension.lower()
 
-    if file_extension == ".csv":
-        df = pd.read_csv(file_path)
+    usecols = None
+    if genes is not None:
+        wanted = set(genes)
+        usecols = wanted.__contains__
+
+    if file_extension in [".csv", ".tsv", ".txt"]:
+        sep = "," if file_extension == ".csv" else "\t"
+        if genes is not None and dtype is not None:
+            # Typing only the projected columns keeps string columns (e.g. sample ids) out of the cast
+            read_dtype = {gene: dtype for gene in genes}
+        else:
+            read_dtype = None
+        reader = pd.read_csv(
+            file_path, sep=sep, usecols=usecols, dtype=read_dtype, chunksize=chunksize
+        )
+        df = pd.concat(reader, ignore_index=True) if chunksize else reader
     elif file_extension in [".xls", ".xlsx", ".xlsm", ".xlsb"]:
-        df = pd.read_excel(file_path)
+        df = pd.read_excel(file_path, usecols=usecols)
     elif file_extension in [".pkl", ".pickle"]:
         df = pd.read_pickle(file_path)
-    elif file_extension in ".tsv":
-        df = pd.read_csv(file_path, sep="\t")
+        if genes is not None:
+            df = df[[column for column in df.columns if column in wanted]]
+    elif file_extension in [".parquet", ".pq", ".feather", ".ftr"]:
+        columns = None
+        if genes is not None:
+            columns = [
+                column
+                for column in _read_arrow_columns(file_path, file_extension)
+                if column in wanted
+            ]
+        if file_extension in [".parquet", ".pq"]:
+            df = pd.read_parquet(file_path, columns=columns)
+        else:
+            df = pd.read_feather(file_path, columns=columns)
     else:
         raise ValueError(
-            "Unsupported file extension. Supported extensions are: .csv, .xls(x), .pkl(pickle), .tsv"
+            "Unsupported file extension. Supported extensions are: .csv, .xls(x), .pkl(pickle), .tsv, "
+            ".parquet, .feather"
         )
+
+    if dtype is not None:
+        numeric = df.select_dtypes(include="number").columns
+        if len(numeric) and (df.dtypes[numeric] != dtype).any():
+            df[numeric] = df[numeric].astype(dtype)
+
     return df
 
 
 def filter_genes(
-    gene_expression_df: pd.DataFrame, gene_list_file: TextIO
+    gene_expression_df: pd.DataFrame,
+    gene_list_file: TextIO,
+    max_genes: Optional[int] = 50,
 ) -> Tuple[np.ndarray, Dict]:
     """
     Filter gene expression data based on a txt list of genes.
@@ -54,6 +143,7 @@ def filter_genes(
     Parameters:
     gene_expression_df (pd.DataFrame): Gene expression DataFrame where columns are gene names.
     gene_list_file (str): Path to the text file containing the list of genes to filter.
+    max_genes (int): Use only the first max_genes genes of the list (None uses all of them).
 
 
     Returns:
@@ -63,12 +153,11 @@ def filter_genes(
         A dictionary mapping column indices to gene names in the filtered DataFrame.
     """
     # Read the list of genes from the text file
-    with open(gene_list_file, "r") as file:
-        gene_list = file.read().splitlines()
+    gene_list = read_gene_list(gene_list_file, max_genes)
 
     # Filter the DataFrame to include only the genes from the list
     filtered_df = gene_expression_df[
-        gene_expression_df.columns.intersection(gene_list[0:50])
+        gene_expression_df.columns.intersection(gene_list)
     ]
 
     # Count the number of genes that were successfully filtered
@@ -125,21 +214,24 @@ def create_gene_list_file(
 
 def flatten_gene_list(gene_list_str: List) -> List:
     """
-    Convert sting['vertices_set'] to a flattened list of genes in ['gene_set']
+    Convert ['vertices_set'] to a flattened list of genes in ['gene_set']
 
     Parameters:
-        gene_list_str: 
-        List from dataframe in ['vertices_set']
+        gene_list_str:
+        List (or its string repr, as read from a CSV) from dataframe in ['vertices_set']
 
     Returns:
        flatten list of genes for ease.
     """
     try:
-        # Convert the string to an actual list of lists
-        list_of_lists = ast.literal_eval(gene_list_str)
+        # Only CSV exports need the string converted to an actual list of lists
+        if isinstance(gene_list_str, str):
+            list_of_lists = ast.literal_eval(gene_list_str)
+        else:
+            list_of_lists = gene_list_str
         # Flatten the list of lists into a single list
         flattened_list = list(
-            set(gene for sublist in list_of_lists for gene in sublist)
+            dict.fromkeys(gene for sublist in list_of_lists for gene in sublist)
         )
         return flattened_list
     except (ValueError, SyntaxError):
@@ -0,0 +1,195 @@
+import cProfile
+import json
+import os
+import platform
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# The report stages are recorded into, set while a RunReport is active
+_ACTIVE_REPORT: Optional["RunReport"] = None
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """
+    Peak resident set size of this process so far in MB (None where unsupported).
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / 1024**2 if platform.system() == "Darwin" else peak / 1024
+
+
+class RunReport:
+    """
+    Collects per-stage wall time, CPU time and peak RSS plus the problem sizes of one run.
+
+    CPU time and peak RSS are those of the main process: the work of pool workers
+    (n_jobs > 1) shows up in the wall time only. The peak RSS is a high-water
+    mark over the process lifetime, so every stage records it at its end
+    (process_peak_rss_mb, cumulative) and by how much the stage raised it
+    (peak_rss_increase_mb, a lower bound on the memory the stage needed on top
+    of what earlier stages had already reached).
+
+    While the report is active (used as a context manager), the stage() blocks
+    and record() calls throughout wgtda write into it; otherwise they do nothing.
+    With a profile_dir, stages started with profile=True are also run under
+    cProfile and dumped to profile_dir/<stage>.pstats.
+
+    An on_stage callback receives every stage entry as it is recorded, e.g. to
+    report the progress of a run to a client.
+
+    Examples:
+    - with RunReport() as report:
+          with stage("load"):
+              df = load_gene_expression_data(path)
+      report.write("output/run_report.json")
+    """
+
+    def __init__(self, profile_dir: Optional[str] = None, on_stage: Optional[Callable] = None):
+        self.profile_dir = profile_dir
+        self.on_stage = on_stage
+        self.stages = []
+        self.sizes = {}
+        self._profiling = False
+        self._start_wall = None
+        self._start_cpu = None
+        self._previous = None
+
+    def __enter__(self):
+        global _ACTIVE_REPORT
+        self._previous = _ACTIVE_REPORT
+        _ACTIVE_REPORT = self
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+        return self
+
+    def __exit__(self, *exc):
+        global _ACTIVE_REPORT
+        _ACTIVE_REPORT = self._previous
+        self.sizes.setdefault("total_wall_seconds", time.perf_counter() - self._start_wall)
+        self.sizes.setdefault("total_cpu_seconds", time.process_time() - self._start_cpu)
+
+    def to_dict(self) -> dict:
+        """
+        The report as a JSON-serialisable dict with "stages" and "sizes".
+        """
+        return {"stages": self.stages, "sizes": self.sizes, "peak_rss_mb": _peak_rss_mb()}
+
+    def write(self, path: str) -> str:
+        """
+        Write the report as JSON.
+
+        Parameters:
+        - path : str
+            Path of the JSON file.
+
+        Returns:
+        - str
+            The path of the written file.
+        """
+        with open(path, "w") as file:
+            json.dump(self.to_dict(), file, indent=2, default=_json_default)
+        return path
+
+
+def _json_default(value):
+    # NumPy scalars and arrays in the recorded sizes
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError("Object of type {} is not JSON serializable".format(type(value).__name__))
+
+
+def is_active() -> bool:
+    """
+    Whether a RunReport is collecting, so callers can skip computing sizes nobody records.
+    """
+    return _ACTIVE_REPORT is not None
+
+
+def record(**sizes):
+    """
+    Record problem sizes (genes, samples, simplex counts, ...) in the active report, if any.
+    """
+    if _ACTIVE_REPORT is not None:
+        _ACTIVE_REPORT.sizes.update(sizes)
+
+
+def append(key: str, value):
+    """
+    Append a value to a list of sizes in the active report, if any (e.g. one entry per complex built).
+    """
+    if _ACTIVE_REPORT is not None:
+        _ACTIVE_REPORT.sizes.setdefault(key, []).append(value)
+
+
+@contextmanager
+def stage(name: str, profile: bool = False):
+    """
+    Time a stage of the pipeline into the active report; a no-op without one.
+
+    Parameters:
+    - name : str
+        Name of the stage. Stages that run several times (e.g. both passes of
+        two-pass persistence) get one entry per execution.
+    - profile : bool, default = False
+        Run the stage under cProfile if the report has a profile_dir.
+    """
+    report = _ACTIVE_REPORT
+    if report is None:
+        yield
+        return
+
+    profiler = None
+    if profile and report.profile_dir is not None and not report._profiling:
+        profiler = cProfile.Profile()
+        report._profiling = True
+
+    start_wall = time.perf_counter()
+    start_cpu = time.process_time()
+    start_peak = _peak_rss_mb()
+    try:
+        if profiler is not None:
+            profiler.enable()
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            report._profiling = False
+        peak = _peak_rss_mb()
+        entry = {
+            "name": name,
+            "wall_seconds": time.perf_counter() - start_wall,
+            "cpu_seconds": time.process_time() - start_cpu,
+            "process_peak_rss_mb": peak,
+            "peak_rss_increase_mb": None if peak is None else max(0.0, peak - start_peak),
+        }
+        if profiler is not None:
+            os.makedirs(report.profile_dir, exist_ok=True)
+            runs = sum(stage_entry["name"] == name for stage_entry in report.stages)
+            file_name = name if runs == 0 else "{}_{}".format(name, runs + 1)
+            entry["profile"] = os.path.join(report.profile_dir, file_name + ".pstats")
+            profiler.dump_stats(entry["profile"])
+        report.stages.append(entry)
+        if report.on_stage is not None:
+            report.on_stage(entry)
+
+
+@contextmanager
+def suspended():
+    """
+    Stop recording into the active report for the duration, e.g. while the many
+    complexes of a bootstrap are built in this process.
+    """
+    global _ACTIVE_REPORT
+    report, _ACTIVE_REPORT = _ACTIVE_REPORT, None
+    try:
+        yield
+    finally:
+        _ACTIVE_REPORT = report
@@ -0,0 +1,377 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+from . import profiling
+from .batch import DEFAULT_JOB_OPTIONS
+from .interactions import write_interactions
+from .pipeline import compute_interactions, compute_relationship_matrix
+from .preprocessing import (convert_gene_exp_to_array_and_dict, filter_genes,
+                            load_gene_expression_data)
+
+DEFAULT_PORT = 8765
+
+# Keys a job may set besides DEFAULT_JOB_OPTIONS, with their defaults
+JOB_KEYS = {
+    "file_path": None,
+    "filter_genes_path": None,
+    "preprocessing": "dc",
+    "dimensions": 3,
+    "output_dir": None,
+    "output_format": "csv",
+    "return_interactions": True,
+}
+
+
+def _nbytes(value) -> int:
+    """
+    Memory held by a cached value: DataFrames, arrays and tuples of them (anything else counts as free).
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True).sum())
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, tuple):
+        return sum(_nbytes(item) for item in value)
+    return 0
+
+
+def _file_key(path: str) -> tuple:
+    """
+    Identify a file by its path, modification time and size, so edited files are reloaded.
+    """
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+def _json_default(value):
+    # NumPy scalars and arrays, and the tuples/sets of the interaction columns
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    raise TypeError("Object of type {} is not JSON serializable".format(type(value).__name__))
+
+
+class LRUCache:
+    """
+    In-memory cache of arrays and DataFrames bounded by their total size in bytes.
+
+    Adding an entry evicts the least recently used ones until everything fits
+    the budget; an entry larger than the whole budget is not cached.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        The cached value of key (marked as most recently used), or None.
+        """
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def put(self, key, value):
+        """
+        Cache value under key, evicting the least recently used entries to stay within max_bytes.
+        """
+        size = _nbytes(value)
+        with self._lock:
+            self._entries.pop(key, None)
+            if size > self.max_bytes:
+                return
+            while self._entries and self.total_bytes() + size > self.max_bytes:
+                self._entries.popitem(last=False)
+            self._entries[key] = (value, size)
+
+    def total_bytes(self) -> int:
+        return sum(size for _, size in self._entries.values())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def entries(self) -> list:
+        """
+        The cached keys and sizes, least recently used first.
+        """
+        with self._lock:
+            return [(key, size) for key, (_, size) in self._entries.items()]
+
+
+def normalize_job(job: dict) -> dict:
+    """
+    Fill in the defaults of a service job and reject unknown keys.
+
+    A job is the JSON object of a batch manifest job (file_path,
+    filter_genes_path, preprocessing, dimensions and the DEFAULT_JOB_OPTIONS
+    of batch.py), plus an optional output_dir to write the interactions to in
+    output_format, and return_interactions to leave them out of the result.
+
+    Parameters:
+    - job : dict
+        The job as sent by the client.
+
+    Returns:
+    - dict
+        The job with every key set.
+    """
+    defaults = {**JOB_KEYS, **DEFAULT_JOB_OPTIONS}
+    unknown = sorted(set(job) - set(defaults))
+    if unknown:
+        raise ValueError("Unknown job keys: " + ", ".join(unknown))
+    job = {**defaults, **job}
+    for key in ["file_path", "filter_genes_path"]:
+        if job[key] is None:
+            raise ValueError("A job needs a " + key)
+    return job
+
+
+class WarmWorker:
+    """
+    Runs pipeline jobs while keeping the loaded cohorts, filtered arrays and correlation matrices in memory.
+
+    Jobs on a cohort loaded by an earlier job skip reading it, and jobs on the
+    same genes skip the correlation matrix as well; all three kinds of entries
+    share one LRU cache of memory_bytes. Jobs run one at a time.
+    """
+
+    def __init__(self, memory_bytes: int, cache_dir: Optional[str] = None, n_jobs: int = 1):
+        self.cache = LRUCache(memory_bytes)
+        self.cache_dir = cache_dir
+        self.n_jobs = n_jobs
+        self.num_jobs = 0
+        self._job_lock = threading.Lock()
+
+    def _cached(self, key: tuple, description: str, compute: Callable, emit: Callable):
+        value = self.cache.get(key)
+        if value is None:
+            emit({"event": "progress", "message": "Caching the " + description})
+            value = compute()
+            self.cache.put(key, value)
+        else:
+            emit({"event": "progress", "message": "Using the cached " + description})
+        return value
+
+    def run(self, job: dict, emit: Callable[[dict], None]) -> dict:
+        """
+        Run one job, passing its progress to emit as {"event": "progress", "message": ...}.
+
+        The progress is what the worker loads, reuses or computes and every
+        pipeline stage as it finishes, reported through callbacks; what the
+        pipeline prints goes to the worker's own output.
+
+        Parameters:
+        - job : dict
+            The job, see normalize_job.
+        - emit : Callable[[dict], None]
+            Receives the progress events while the job runs.
+
+        Returns:
+        - dict
+            The result event: the number of interactions per Betti number,
+            max_radius, the run report, and the interactions as records and the
+            path they were written to, if requested.
+        """
+        job = normalize_job(job)
+
+        def on_stage(entry: dict):
+            emit({
+                "event": "progress",
+                "message": "Finished {} in {:.2f} s".format(entry["name"], entry["wall_seconds"]),
+                "stage": entry["name"],
+                "seconds": entry["wall_seconds"],
+            })
+
+        with self._job_lock, profiling.RunReport(on_stage=on_stage) as report:
+            cohort_key = ("cohort",) + _file_key(job["file_path"])
+            with profiling.stage("load"):
+                df = self._cached(
+                    cohort_key,
+                    "cohort " + job["file_path"],
+                    lambda: load_gene_expression_data(job["file_path"]),
+                    emit,
+                )
+
+            genes_key = cohort_key[1:] + _file_key(job["filter_genes_path"]) + (job["max_genes"],)
+            with profiling.stage("filter"):
+                gene_exp_arr, gene_dict = self._cached(
+                    ("filtered",) + genes_key,
+                    "expression array of " + job["filter_genes_path"],
+                    lambda: convert_gene_exp_to_array_and_dict(
+                        filter_genes(df, job["filter_genes_path"], job["max_genes"])
+                    ),
+                    emit,
+                )
+
+            dist_matrix = self._cached(
+                ("matrix",) + genes_key + (job["preprocessing"],),
+                job["preprocessing"] + " matrix",
+                lambda: compute_relationship_matrix(
+                    gene_exp_arr,
+                    gene_dict,
+                    job["preprocessing"],
+                    cache_dir=self.cache_dir,
+                    n_jobs=self.n_jobs,
+                ),
+                emit,
+            )
+
+            interactions, max_radius = compute_interactions(
+                dist_matrix,
+                gene_dict,
+                job["dimensions"],
+                max_radius=job["max_radius"],
+                radius_quantile=job["radius_quantile"],
+                max_simplices=job["max_simplices"],
+                remove_inf_values=job["remove_inf_values"],
+                filter_persistence=job["filter_persistence"],
+                two_pass=job["two_pass"],
+                edge_collapse=job["edge_collapse"],
+                landmarks=job["landmarks"],
+                by_component=job["by_component"],
+                h0_engine=job["h0_engine"],
+                n_jobs=self.n_jobs,
+            )
+
+        result = {
+            "event": "result",
+            "num_interactions": len(interactions),
+            "betti_counts": {
+                str(betti): int(count)
+                for betti, count in interactions["betti_number"].value_counts().sort_index().items()
+            },
+            "max_radius": max_radius,
+            "report": report.to_dict(),
+        }
+        if job["output_dir"] is not None:
+            os.makedirs(job["output_dir"], exist_ok=True)
+            result["output"] = write_interactions(interactions, job["output_dir"], job["output_format"])
+        if job["return_interactions"]:
+            result["interactions"] = interactions.to_dict(orient="records")
+        self.num_jobs += 1
+        return result
+
+    def status(self) -> dict:
+        """
+        The cache contents and budget, and the number of jobs run.
+        """
+        return {
+            "num_jobs": self.num_jobs,
+            "cache_bytes": self.cache.total_bytes(),
+            "max_cache_bytes": self.cache.max_bytes,
+            "entries": [
+                {"kind": key[0], "key": [str(part) for part in key[1:]], "bytes": size}
+                for key, size in self.cache.entries()
+            ],
+        }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    GET /status, POST /clear, and POST /jobs, which streams the job's events as newline-delimited JSON.
+    """
+
+    server_version = "wgtda"
+
+    def _send_json(self, payload: dict):
+        body = json.dumps(payload, default=_json_default).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/status":
+            self._send_json(self.server.worker.status())
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        if self.path == "/clear":
+            self.server.worker.cache.clear()
+            self._send_json(self.server.worker.status())
+            return
+        if self.path != "/jobs":
+            self.send_error(404)
+            return
+
+        try:
+            job = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        except ValueError as error:
+            self.send_error(400, "Invalid job: {}".format(error))
+            return
+
+        # The response has no length and ends when the connection closes
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        connected = True
+
+        def emit(event: dict):
+            nonlocal connected
+            if not connected:
+                return
+            try:
+                self.wfile.write((json.dumps(event, default=_json_default) + "\n").encode())
+                self.wfile.flush()
+            except OSError:
+                # The client went away; finish the job anyway so its caches stay warm
+                connected = False
+
+        start = time.perf_counter()
+        try:
+            result = self.server.worker.run(job, emit)
+        except Exception as error:
+            result = {"event": "error", "error": repr(error)}
+        result["seconds"] = time.perf_counter() - start
+        emit(result)
+
+
+def serve(
+    host: str = "127.0.0.1",
+    port: int = DEFAULT_PORT,
+    memory_gb: float = 8.0,
+    cache_dir: Optional[str] = None,
+    n_jobs: int = 1,
+):
+    """
+    Serve pipeline jobs over HTTP until interrupted.
+
+    The server reads the cohorts and gene lists named by the jobs from its own
+    filesystem, so it listens on localhost by default.
+
+    Parameters:
+    - host : str, default = "127.0.0.1"
+        The address to listen on.
+    - port : int, default = DEFAULT_PORT
+        The port to listen on.
+    - memory_gb : float, default = 8.0
+        Memory budget of the cached cohorts, arrays and matrices in GB.
+    - cache_dir : str, optional
+        Directory of the on-disk correlation cache, used below the in-memory one.
+    - n_jobs : int, default = 1
+        Worker processes of the correlation and complex stages.
+    """
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.worker = WarmWorker(int(memory_gb * 1024**3), cache_dir, n_jobs)
+    print("Serving WGTDA jobs on http://{}:{}".format(host, server.server_port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
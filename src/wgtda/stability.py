@@ -0,0 +1,296 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+from numpy import ndarray
+from scipy.sparse import csr_matrix
+
+from . import profiling
+from .complex import construct_vr_complex_rna_matrix
+from .correlation import get_preprocessor
+from .correlation.computation import (FAST_DCOR_MIN_SAMPLES,
+                                      _centered_distance_rows, _dcor_from_dcov)
+from .correlation.parallel import pool_context, resolve_n_jobs
+from .interactions import build_interaction_table
+from .preprocessing import flatten_gene_list
+
+# State shared by all replicates of a worker process, set once by _init_worker
+_WORKER_STATE = {}
+
+
+def replicate_weights(
+    num_samples: int,
+    num_replicates: int,
+    sample_fraction: Optional[float] = None,
+    seed: int = 0,
+) -> ndarray:
+    """
+    Draw the resamples of the patients as multiplicities of the original samples.
+
+    Parameters:
+    - num_samples : int
+        Number of samples (patients).
+    - num_replicates : int
+        Number of resamples.
+    - sample_fraction : float, optional
+        Subsample this fraction of the samples without replacement instead of
+        drawing bootstrap resamples (num_samples draws with replacement).
+    - seed : int, default = 0
+        Seed of the random generator.
+
+    Returns:
+    - ndarray
+        replicates x samples array of how often each sample is drawn.
+    """
+    rng = np.random.default_rng(seed)
+    weights = np.empty((num_replicates, num_samples), dtype=np.int64)
+    for replicate in range(num_replicates):
+        if sample_fraction is None:
+            draws = rng.integers(0, num_samples, num_samples)
+        else:
+            size = min(num_samples, max(2, int(round(sample_fraction * num_samples))))
+            draws = rng.choice(num_samples, size, replace=False)
+        weights[replicate] = np.bincount(draws, minlength=num_samples)
+    return weights
+
+
+def resampled_distance_matrix(gene_exp_arr: ndarray, weights: ndarray, method: str = "dc") -> ndarray:
+    """
+    The gene x gene matrix of a resample given as sample multiplicities.
+
+    For distance correlation (up to FAST_DCOR_MIN_SAMPLES distinct samples) the
+    per-gene sample-distance matrices are taken over the distinct samples of the
+    resample and double-centered with the multiplicities as weights, which gives
+    exactly the distance correlations of the resample while skipping its
+    duplicated samples (a bootstrap resample holds about 63% distinct samples).
+    Other methods are computed on the resampled expression array.
+
+    The per-gene sample distances are recomputed from the resampled rows on
+    purpose: gathering them from full-sample distance matrices computed once
+    is slower than the subtraction it replaces (a fancy-indexed copy per gene),
+    and would hold genes x n^2 floats in every worker process.
+
+    Parameters:
+    - gene_exp_arr : ndarray
+        The samples x genes expression array.
+    - weights : ndarray
+        How often each sample is drawn, e.g. a row of replicate_weights.
+    - method : str, default = "dc"
+        A registered preprocessing method.
+
+    Returns:
+    - ndarray
+        The gene x gene distance matrix of the resample.
+    """
+    support = np.flatnonzero(weights)
+    if method == "dc" and len(support) <= FAST_DCOR_MIN_SAMPLES:
+        centered = _centered_distance_rows(
+            np.asarray(gene_exp_arr[support], dtype=np.float64), weights[support]
+        )
+        dvar = np.einsum("ij,ij->i", centered, centered)
+        dist_matrix = 1 - _dcor_from_dcov(centered @ centered.T, dvar, dvar)
+        np.fill_diagonal(dist_matrix, 0.0)
+        return dist_matrix
+
+    samples = np.repeat(np.arange(len(weights)), weights)
+    return get_preprocessor(method).func(gene_exp_arr=gene_exp_arr[samples], n_jobs=1)
+
+
+def _incidence(gene_sets: List[list], gene_index: dict) -> csr_matrix:
+    """
+    Sparse features x genes incidence matrix of gene sets (genes outside gene_index are ignored).
+    """
+    rows, cols = [], []
+    for row, genes in enumerate(gene_sets):
+        for gene in genes:
+            if gene in gene_index:
+                rows.append(row)
+                cols.append(gene_index[gene])
+    return csr_matrix(
+        (np.ones(len(rows)), (rows, cols)), shape=(len(gene_sets), len(gene_index))
+    )
+
+
+def best_jaccard(
+    betti_numbers: ndarray,
+    gene_sets: List[list],
+    other_betti_numbers: ndarray,
+    other_gene_sets: List[list],
+    gene_index: dict,
+) -> ndarray:
+    """
+    For every feature, the highest Jaccard index of its gene set with a feature of the same Betti number of another run.
+
+    The overlaps of all pairs come from one sparse product of the gene
+    incidence matrices per Betti number.
+
+    Parameters:
+    - betti_numbers, gene_sets :
+        Betti number and gene set of every feature.
+    - other_betti_numbers, other_gene_sets :
+        Betti number and gene set of every feature of the other run.
+    - gene_index : dict
+        A dictionary mapping gene names to column indices.
+
+    Returns:
+    - ndarray
+        The best Jaccard index of every feature (0 without any overlap).
+    """
+    betti_numbers = np.asarray(betti_numbers)
+    other_betti_numbers = np.asarray(other_betti_numbers)
+    best = np.zeros(len(gene_sets))
+    for betti_number in np.unique(betti_numbers):
+        rows = np.flatnonzero(betti_numbers == betti_number)
+        others = np.flatnonzero(other_betti_numbers == betti_number)
+        if len(others) == 0:
+            continue
+        features = _incidence([gene_sets[i] for i in rows], gene_index)
+        other_features = _incidence([other_gene_sets[i] for i in others], gene_index)
+        sizes = np.asarray(features.sum(axis=1)).ravel()
+        other_sizes = np.asarray(other_features.sum(axis=1)).ravel()
+
+        overlaps = (features @ other_features.T).tocoo()
+        jaccard = overlaps.data / (sizes[overlaps.row] + other_sizes[overlaps.col] - overlaps.data)
+        row_best = np.zeros(len(rows))
+        np.maximum.at(row_best, overlaps.row, jaccard)
+        best[rows] = row_best
+    return best
+
+
+def _init_worker(gene_exp_arr: ndarray, betti_numbers: ndarray, gene_sets: List[list], settings: dict):
+    """
+    Keep the expression array, the features to match and the settings in the worker process.
+    """
+    _WORKER_STATE.clear()
+    _WORKER_STATE.update(
+        settings,
+        gene_exp_arr=gene_exp_arr,
+        betti_numbers=betti_numbers,
+        gene_sets=gene_sets,
+        gene_index={gene: index for index, gene in settings["gene_dict"].items()},
+    )
+
+
+def _replicate_overlaps(weights: ndarray) -> ndarray:
+    """
+    Worker: compute the features of one resample and return the best Jaccard index of every original feature.
+    """
+    state = _WORKER_STATE
+    dist_matrix = resampled_distance_matrix(state["gene_exp_arr"], weights, state["method"])
+    persistence, rips_complex = construct_vr_complex_rna_matrix(
+        dist_matrix,
+        state["dimensions"],
+        max_radius=state["max_radius"],
+        h0_engine=state["h0_engine"],
+        edge_collapse=state["edge_collapse"],
+    )
+    replicate = build_interaction_table(persistence, rips_complex, state["gene_dict"]).to_dataframe()
+    return best_jaccard(
+        state["betti_numbers"],
+        state["gene_sets"],
+        replicate["betti_number"].to_numpy(),
+        replicate["vertices_set"].apply(flatten_gene_list).tolist(),
+        state["gene_index"],
+    )
+
+
+def feature_stability(
+    gene_exp_arr: ndarray,
+    interactions: pd.DataFrame,
+    gene_dict: dict,
+    dimensions: int = 3,
+    max_radius: Optional[float] = None,
+    method: str = "dc",
+    num_replicates: int = 200,
+    sample_fraction: Optional[float] = None,
+    min_jaccard: float = 0.5,
+    seed: int = 0,
+    h0_engine: str = "matilda",
+    edge_collapse: bool = False,
+    n_jobs: int = 1,
+) -> pd.Series:
+    """
+    Score how often each interaction reappears when the patients are resampled.
+
+    Every replicate resamples the samples (bootstrap, or subsampling with
+    sample_fraction), recomputes the gene x gene matrix (see
+    resampled_distance_matrix), the Vietoris-Rips complex and its persistent
+    homology with the settings of the original run, and matches every original
+    feature to the replicate feature of the same Betti number whose gene set
+    overlaps it most. A feature is recovered in a replicate when that Jaccard
+    index is at least min_jaccard, and its stability is the fraction of
+    replicates that recover it. The replicates run in a pool of n_jobs worker
+    processes, each receiving the expression array once.
+
+    Parameters:
+    - gene_exp_arr : ndarray
+        The samples x genes expression array the interactions were computed from.
+    - interactions : pd.DataFrame
+        The interactions, e.g. from compute_interactions, with a gene_set column.
+    - gene_dict : dict
+        A dictionary mapping column indices to gene names.
+    - dimensions : int, default = 3
+        The maximum simplex dimension of the complexes.
+    - max_radius : float, optional
+        The radius bound of the original run, reused for every replicate.
+    - method : str, default = "dc"
+        The preprocessing method of the original run.
+    - num_replicates : int, default = 200
+        Number of resamples.
+    - sample_fraction : float, optional
+        Subsample this fraction of the samples without replacement instead of bootstrapping.
+    - min_jaccard : float, default = 0.5
+        Jaccard index of the gene sets above which a feature counts as recovered.
+    - seed : int, default = 0
+        Seed of the resampling, so the scores do not depend on n_jobs.
+    - h0_engine, edge_collapse :
+        See construct_vr_complex_rna_matrix.
+    - n_jobs : int, default = 1
+        Worker processes running the replicates.
+
+    Returns:
+    - pd.Series
+        The stability (0 to 1) of every interaction, indexed like interactions.
+    """
+    weights = replicate_weights(gene_exp_arr.shape[0], num_replicates, sample_fraction, seed)
+    initargs = (
+        gene_exp_arr,
+        interactions["betti_number"].to_numpy(),
+        [list(genes) for genes in interactions["gene_set"]],
+        {
+            "gene_dict": gene_dict,
+            "method": method,
+            "dimensions": dimensions,
+            "max_radius": max_radius,
+            "h0_engine": h0_engine,
+            "edge_collapse": edge_collapse,
+        },
+    )
+
+    recovered = np.zeros(len(interactions))
+    report_every = max(1, num_replicates // 10)
+    n_jobs = min(resolve_n_jobs(n_jobs), num_replicates)
+    with profiling.stage("stability"):
+        if n_jobs <= 1:
+            _init_worker(*initargs)
+            with profiling.suspended():
+                for done, row in enumerate(weights, 1):
+                    recovered += _replicate_overlaps(row) >= min_jaccard
+                    if done % report_every == 0:
+                        print("Stability: {} of {} replicates".format(done, num_replicates))
+        else:
+            with ProcessPoolExecutor(
+                max_workers=n_jobs,
+                mp_context=pool_context(),
+                initializer=_init_worker,
+                initargs=initargs,
+            ) as executor:
+                futures = [executor.submit(_replicate_overlaps, row) for row in weights]
+                for done, future in enumerate(as_completed(futures), 1):
+                    recovered += future.result() >= min_jaccard
+                    if done % report_every == 0:
+                        print("Stability: {} of {} replicates".format(done, num_replicates))
+
+    profiling.record(num_replicates=num_replicates)
+    return pd.Series(recovered / num_replicates, index=interactions.index, name="stability")
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("matilda")
+
+from wgtda.complex import extract_representatives  # noqa: E402
+from wgtda.pipeline import compute_interactions  # noqa: E402
+
+
+def _distance_matrix(num_genes: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    points = rng.normal(size=(num_genes, 3))
+    dist_matrix = np.linalg.norm(points[:, None] - points[None, :], axis=-1)
+    return dist_matrix / dist_matrix.max()
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_two_pass_betti_0_representatives_match_single_pass(seed):
+    dist_matrix = _distance_matrix(12, seed)
+    gene_dict = {i: "G{}".format(i) for i in range(len(dist_matrix))}
+    options = {"dimensions": 1, "filter_persistence": 100}
+
+    single, _ = compute_interactions(dist_matrix, gene_dict, **options)
+    two_pass, _ = compute_interactions(dist_matrix, gene_dict, two_pass=True, **options)
+
+    single = single[single["betti_number"] == 0].sort_values("interaction_id")
+    two_pass = two_pass[two_pass["betti_number"] == 0].sort_values("interaction_id")
+    assert len(single) > 0
+    assert two_pass[["birth", "death"]].to_numpy().tolist() == single[["birth", "death"]].to_numpy().tolist()
+    assert two_pass["gene_set"].map(sorted).tolist() == single["gene_set"].map(sorted).tolist()
+    assert all(len(vertices) > 0 for vertices in two_pass["vertices"])
+
+
+def test_unmatched_bars_raise_instead_of_empty_representatives():
+    dist_matrix = _distance_matrix(12, 0)
+    gene_dict = {i: "G{}".format(i) for i in range(len(dist_matrix))}
+    interactions, _ = compute_interactions(dist_matrix, gene_dict, dimensions=1, filter_persistence=100)
+    interactions.loc[interactions.index[0], "death"] += 1e-3
+
+    with pytest.raises(RuntimeError, match="no matching bar"):
+        extract_representatives(dist_matrix, interactions, gene_dict, dimensions=1)